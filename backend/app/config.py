@@ -19,10 +19,77 @@ class Settings(BaseSettings):
         default="sqlite:///./protocolito.db",
         alias="DATABASE_URL",
     )
+    db_pool_size: int = Field(default=5, alias="DB_POOL_SIZE")
+    db_max_overflow: int = Field(default=10, alias="DB_MAX_OVERFLOW")
+    db_pool_timeout: float = Field(default=30.0, alias="DB_POOL_TIMEOUT")
+    db_pool_recycle: int = Field(default=1800, alias="DB_POOL_RECYCLE")
+    db_pool_pre_ping: bool = Field(default=True, alias="DB_POOL_PRE_PING")
+    db_auto_migrate: bool = Field(default=True, alias="DB_AUTO_MIGRATE")
     storage_dir: Path = Field(default=Path("storage"), alias="STORAGE_DIR")
     ollama_host: str = Field(default="http://ollama:11434", alias="OLLAMA_HOST")
     whisper_model: str = Field(default="base", alias="WHISPER_MODEL")
     summary_model: str = Field(default="llama3", alias="SUMMARY_MODEL")
+    ollama_connect_timeout: float = Field(default=10.0, alias="OLLAMA_CONNECT_TIMEOUT")
+    ollama_read_timeout: float = Field(default=120.0, alias="OLLAMA_READ_TIMEOUT")
+    ollama_max_connections: int = Field(default=8, alias="OLLAMA_MAX_CONNECTIONS")
+    summary_chunk_tokens: int = Field(default=3000, alias="SUMMARY_CHUNK_TOKENS")
+    summary_chars_per_token: float = Field(default=3.5, alias="SUMMARY_CHARS_PER_TOKEN")
+    summary_concurrency: int = Field(default=2, alias="SUMMARY_CONCURRENCY")
+    result_cache: bool = Field(default=True, alias="RESULT_CACHE")
+    result_cache_memory_items: int = Field(default=32, alias="RESULT_CACHE_MEMORY_ITEMS")
+    result_cache_max_mb: float = Field(default=512.0, alias="RESULT_CACHE_MAX_MB")
+    live_transcription: bool = Field(default=True, alias="LIVE_TRANSCRIPTION")
+    live_window_seconds: float = Field(default=30.0, alias="LIVE_WINDOW_SECONDS")
+    live_overlap_seconds: float = Field(default=2.0, alias="LIVE_OVERLAP_SECONDS")
+    audio_archive_format: str = Field(default="flac", alias="AUDIO_ARCHIVE_FORMAT")
+    audio_pcm_retention_hours: float = Field(default=0.0, alias="AUDIO_PCM_RETENTION_HOURS")
+    audio_clip_max_seconds: float = Field(default=600.0, alias="AUDIO_CLIP_MAX_SECONDS")
+    ingest_flush_bytes: int = Field(default=256 * 1024, alias="INGEST_FLUSH_BYTES")
+    ingest_flush_interval: float = Field(default=1.0, alias="INGEST_FLUSH_INTERVAL")
+    ingest_ack_bytes: int = Field(default=256 * 1024, alias="INGEST_ACK_BYTES")
+    ingest_ack_interval: float = Field(default=2.0, alias="INGEST_ACK_INTERVAL")
+    ingest_formats: str = Field(default="webm_opus,ogg_opus,pcm_s16le", alias="INGEST_FORMATS")
+    ingest_takeover_timeout: float = Field(default=5.0, alias="INGEST_TAKEOVER_TIMEOUT")
+    job_workers: int = Field(default=1, alias="JOB_WORKERS")
+    job_queue_limit: int = Field(default=20, alias="JOB_QUEUE_LIMIT")
+    job_poll_interval: float = Field(default=1.0, alias="JOB_POLL_INTERVAL")
+    job_partial_interval: float = Field(default=1.0, alias="JOB_PARTIAL_INTERVAL")
+    job_requeue_interval: float = Field(default=30.0, alias="JOB_REQUEUE_INTERVAL")
+    job_max_attempts: int = Field(default=3, alias="JOB_MAX_ATTEMPTS")
+    api_job_workers: bool = Field(default=True, alias="API_JOB_WORKERS")
+    backfill_whisper_concurrency: int = Field(default=1, alias="BACKFILL_WHISPER_CONCURRENCY")
+    backfill_ollama_concurrency: int = Field(default=2, alias="BACKFILL_OLLAMA_CONCURRENCY")
+    backfill_commit_size: int = Field(default=20, alias="BACKFILL_COMMIT_SIZE")
+    app_settings_cache_ttl: float = Field(default=5.0, alias="SETTINGS_CACHE_TTL")
+    whisper_cpu_threads: int = Field(default=0, alias="WHISPER_CPU_THREADS")
+    whisper_num_workers: int = Field(default=1, alias="WHISPER_NUM_WORKERS")
+    whisper_compute_type: str = Field(default="default", alias="WHISPER_COMPUTE_TYPE")
+    whisper_models: str = Field(default="", alias="WHISPER_MODELS")
+    whisper_live_model: str = Field(default="", alias="WHISPER_LIVE_MODEL")
+    whisper_preload: bool = Field(default=True, alias="WHISPER_PRELOAD")
+    inference_address: str = Field(default="", alias="INFERENCE_ADDRESS")
+    inference_authkey: str = Field(default="", alias="INFERENCE_AUTHKEY")
+    inference_authkey_file: str = Field(default="", alias="INFERENCE_AUTHKEY_FILE")
+    inference_concurrency: int = Field(default=1, alias="INFERENCE_CONCURRENCY")
+    transcribe_workers: int = Field(default=0, alias="TRANSCRIBE_WORKERS")
+    transcribe_chunk_seconds: float = Field(default=600.0, alias="TRANSCRIBE_CHUNK_SECONDS")
+    transcribe_chunk_overlap_seconds: float = Field(default=1.0, alias="TRANSCRIBE_CHUNK_OVERLAP_SECONDS")
+    postprocess_min_words: int = Field(default=3, alias="POSTPROCESS_MIN_WORDS")
+    postprocess_merge_gap_seconds: float = Field(default=1.5, alias="POSTPROCESS_MERGE_GAP_SECONDS")
+    postprocess_extra_characters: str = Field(default="", alias="POSTPROCESS_EXTRA_CHARACTERS")
+    diarization: bool = Field(default=False, alias="DIARIZATION")
+    diarization_max_speakers: int = Field(default=8, alias="DIARIZATION_MAX_SPEAKERS")
+    diarization_threshold: float = Field(default=3.5, alias="DIARIZATION_THRESHOLD")
+    diarization_window_seconds: float = Field(default=1.5, alias="DIARIZATION_WINDOW_SECONDS")
+    diarization_hop_seconds: float = Field(default=0.75, alias="DIARIZATION_HOP_SECONDS")
+    diarization_budget_ratio: float = Field(default=0.1, alias="DIARIZATION_BUDGET_RATIO")
+    diarization_min_budget_seconds: float = Field(default=2.0, alias="DIARIZATION_MIN_BUDGET_SECONDS")
+    vad_enabled: bool = Field(default=True, alias="VAD_ENABLED")
+    vad_threshold_db: float = Field(default=-50.0, alias="VAD_THRESHOLD_DB")
+    vad_margin_db: float = Field(default=10.0, alias="VAD_MARGIN_DB")
+    vad_max_threshold_db: float = Field(default=-35.0, alias="VAD_MAX_THRESHOLD_DB")
+    vad_min_silence_seconds: float = Field(default=0.8, alias="VAD_MIN_SILENCE_SECONDS")
+    vad_padding_seconds: float = Field(default=0.25, alias="VAD_PADDING_SECONDS")
 
 
 @lru_cache(maxsize=1)
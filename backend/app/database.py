@@ -1,16 +1,51 @@
 ﻿from __future__ import annotations
 
+from typing import Any, AsyncIterator
+
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import declarative_base, sessionmaker
 
 from .config import get_settings
 
 settings = get_settings()
 
-engine = create_engine(settings.database_url, future=True)
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def _engine_options(url: str) -> dict[str, Any]:
+    options: dict[str, Any] = {"pool_pre_ping": settings.db_pool_pre_ping}
+    if make_url(url).get_backend_name() == "sqlite":
+        return options
+    return {
+        **options,
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_recycle": settings.db_pool_recycle,
+    }
+
+
+def async_database_url(url: str) -> str:
+    parsed = make_url(url)
+    driver = ASYNC_DRIVERS.get(parsed.get_backend_name())
+    if driver is None:
+        return url
+    return parsed.set(drivername=driver).render_as_string(hide_password=False)
+
+
+engine = create_engine(settings.database_url, future=True, **_engine_options(settings.database_url))
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
 Base = declarative_base()
 
+_async_url = async_database_url(settings.database_url)
+async_engine = create_async_engine(_async_url, **_engine_options(_async_url))
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 
 def get_session():
     session = SessionLocal()
@@ -19,3 +54,7 @@ def get_session():
     finally:
         session.close()
 
+
+async def get_async_session() -> AsyncIterator[AsyncSession]:
+    async with AsyncSessionLocal() as session:
+        yield session
@@ -0,0 +1,230 @@
+from __future__ import annotations
+
+import argparse
+import datetime as dt
+import logging
+from typing import Callable
+
+from sqlalchemy import (
+    JSON,
+    Column,
+    DateTime,
+    Float,
+    Integer,
+    LargeBinary,
+    MetaData,
+    String,
+    Table,
+    Text,
+    inspect,
+    select,
+    text,
+)
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.engine import Connection
+
+from .database import engine
+from .services.locks import AdvisoryLock
+from .services.search import ensure_search_schema
+
+logger = logging.getLogger(__name__)
+
+MIGRATION_LOCK = "migrate"
+
+Migration = Callable[[Connection], None]
+
+_metadata = MetaData()
+schema_migrations = Table(
+    "schema_migrations",
+    _metadata,
+    Column("version", Integer, primary_key=True),
+    Column("name", String(128), nullable=False),
+    Column("applied_at", DateTime(timezone=True), nullable=False),
+)
+
+
+# Frozen snapshots of each table as its migration first created it. They must
+# never follow models.py: later changes get their own numbered migration.
+_JSON = JSON().with_variant(JSONB(), "postgresql")
+
+_baseline = MetaData()
+Table(
+    "recording_sessions",
+    _baseline,
+    Column("id", String(36), primary_key=True),
+    Column("created_at", DateTime(timezone=True), nullable=False),
+    Column("updated_at", DateTime(timezone=True)),
+    Column("status", String(32), nullable=False),
+    Column("title", String(255)),
+    Column("language", String(16), nullable=False),
+    Column("audio_path", String(512)),
+    Column("audio_bytes", LargeBinary),
+    Column("transcript_text", Text),
+    Column("transcript_json", _JSON),
+    Column("summary_json", _JSON),
+    Column("settings_snapshot", _JSON),
+)
+Table(
+    "app_settings",
+    _baseline,
+    Column("id", String(36), primary_key=True),
+    Column("data", _JSON, nullable=False),
+)
+
+_jobs = MetaData()
+Table(
+    "processing_jobs",
+    _jobs,
+    Column("id", String(36), primary_key=True),
+    Column("session_id", String(36), nullable=False, index=True),
+    Column("kind", String(32), nullable=False),
+    Column("status", String(32), nullable=False, index=True),
+    Column("progress", Float, nullable=False),
+    Column("stage", String(64)),
+    Column("error", Text),
+    Column("attempts", Integer, nullable=False),
+    Column("worker", String(64)),
+    Column("created_at", DateTime(timezone=True), nullable=False),
+    Column("updated_at", DateTime(timezone=True)),
+    Column("started_at", DateTime(timezone=True)),
+    Column("finished_at", DateTime(timezone=True)),
+)
+
+_batches = MetaData()
+Table(
+    "processing_batches",
+    _batches,
+    Column("id", String(36), primary_key=True),
+    Column("mode", String(32), nullable=False),
+    Column("status", String(32), nullable=False, index=True),
+    Column("filters", _JSON),
+    Column("settings_snapshot", _JSON),
+    Column("total", Integer, nullable=False),
+    Column("completed", Integer, nullable=False),
+    Column("failed", Integer, nullable=False),
+    Column("worker", String(64)),
+    Column("created_at", DateTime(timezone=True), nullable=False),
+    Column("updated_at", DateTime(timezone=True)),
+    Column("finished_at", DateTime(timezone=True)),
+)
+
+
+def _add_columns(connection: Connection, table: str, columns: dict[str, str]) -> None:
+    existing = {column["name"] for column in inspect(connection).get_columns(table)}
+    for name, ddl in columns.items():
+        if name not in existing:
+            connection.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {ddl}"))
+
+
+def _create_tables(connection: Connection) -> None:
+    _baseline.create_all(bind=connection)
+
+
+def _legacy_columns(connection: Connection) -> None:
+    json_ddl = "JSONB" if connection.dialect.name == "postgresql" else "JSON"
+    _jobs.create_all(bind=connection)
+    _add_columns(
+        connection,
+        "recording_sessions",
+        {
+            "title": "VARCHAR(255)",
+            "audio_format": "VARCHAR(16)",
+            "audio_size": "BIGINT",
+            "audio_sha256": "VARCHAR(64)",
+            "search_text": "TEXT",
+        },
+    )
+    _add_columns(connection, "processing_jobs", {"partial_summary": json_ddl})
+
+
+def _session_indexes(connection: Connection) -> None:
+    connection.execute(
+        text("CREATE INDEX IF NOT EXISTS ix_recording_sessions_created_at_id ON recording_sessions (created_at, id)")
+    )
+    connection.execute(
+        text(
+            "CREATE INDEX IF NOT EXISTS ix_recording_sessions_status_created_at "
+            "ON recording_sessions (status, created_at)"
+        )
+    )
+
+
+def _batch_jobs(connection: Connection) -> None:
+    _batches.create_all(bind=connection)
+    _add_columns(connection, "processing_jobs", {"batch_id": "VARCHAR(36)"})
+    connection.execute(
+        text("CREATE INDEX IF NOT EXISTS ix_processing_jobs_batch_id ON processing_jobs (batch_id)")
+    )
+
+
+def _settings_updated_at(connection: Connection) -> None:
+    timestamp_ddl = "TIMESTAMP WITH TIME ZONE" if connection.dialect.name == "postgresql" else "DATETIME"
+    _add_columns(connection, "app_settings", {"updated_at": timestamp_ddl})
+
+
+def _backfill_search_text(connection: Connection) -> None:
+    connection.execute(
+        text(
+            "UPDATE recording_sessions SET search_text = transcript_text "
+            "WHERE search_text IS NULL AND transcript_text IS NOT NULL"
+        )
+    )
+
+
+MIGRATIONS: list[tuple[int, str, Migration]] = [
+    (1, "create_tables", _create_tables),
+    (2, "legacy_columns", _legacy_columns),
+    (3, "session_indexes", _session_indexes),
+    (4, "search_index", ensure_search_schema),
+    (5, "batch_jobs", _batch_jobs),
+    (6, "settings_updated_at", _settings_updated_at),
+    (7, "backfill_search_text", _backfill_search_text),
+]
+
+
+def applied_versions(connection: Connection) -> set[int]:
+    if not inspect(connection).has_table(schema_migrations.name):
+        return set()
+    return set(connection.scalars(select(schema_migrations.c.version)).all())
+
+
+def pending_migrations() -> list[tuple[int, str, Migration]]:
+    with engine.connect() as connection:
+        applied = applied_versions(connection)
+    return [migration for migration in MIGRATIONS if migration[0] not in applied]
+
+
+def migrate() -> list[str]:
+    if not pending_migrations():
+        return []
+    applied_names: list[str] = []
+    with AdvisoryLock(MIGRATION_LOCK):
+        _metadata.create_all(bind=engine)
+        for version, name, migration in MIGRATIONS:
+            with engine.begin() as connection:
+                if version in applied_versions(connection):
+                    continue
+                logger.info("Migration %s (%s) wird ausgefuehrt", version, name)
+                migration(connection)
+                connection.execute(
+                    schema_migrations.insert().values(version=version, name=name, applied_at=dt.datetime.utcnow())
+                )
+            applied_names.append(f"{version:03d}_{name}")
+    return applied_names
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Fuehrt ausstehende Datenbank-Migrationen aus.")
+    parser.add_argument("--status", action="store_true", help="nur ausstehende Migrationen anzeigen")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    if args.status:
+        for version, name, _ in pending_migrations():
+            print(f"{version:03d}_{name}")
+        return
+    applied = migrate()
+    print("\n".join(applied) if applied else "Datenbank ist aktuell")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,8 +4,9 @@ import datetime as dt
 import json
 from typing import Any
 
-from sqlalchemy import Column, DateTime, LargeBinary, String, Text, JSON
+from sqlalchemy import BigInteger, Column, DateTime, Float, Index, Integer, LargeBinary, String, Text, JSON, and_
 from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import column_property, deferred
 
 from .database import Base, engine
 
@@ -26,11 +27,25 @@ class RecordingSession(Base):
     title = Column(String(255), nullable=True)
     language = Column(String(16), default="de", nullable=False)
     audio_path = Column(String(512), nullable=True)
-    audio_bytes = Column(LargeBinary, nullable=True)
-    transcript_text = Column(Text, nullable=True)
-    transcript_json = Column(_json_column(), nullable=True)
-    summary_json = Column(_json_column(), nullable=True)
-    settings_snapshot = Column(_json_column(), nullable=True)
+    audio_bytes = deferred(Column(LargeBinary, nullable=True))
+    audio_format = Column(String(16), nullable=True)
+    audio_size = Column(BigInteger, nullable=True)
+    audio_sha256 = Column(String(64), nullable=True)
+    transcript_text = deferred(Column(Text, nullable=True))
+    transcript_json = deferred(Column(_json_column(), nullable=True))
+    summary_json = deferred(Column(_json_column(), nullable=True))
+    settings_snapshot = deferred(Column(_json_column(), nullable=True))
+    search_text = deferred(Column(Text, nullable=True))
+
+    has_transcript = column_property(
+        and_(transcript_text.columns[0].isnot(None), transcript_text.columns[0] != "")
+    )
+    has_audio_blob = column_property(audio_bytes.columns[0].isnot(None), deferred=True)
+
+    __table_args__ = (
+        Index("ix_recording_sessions_created_at_id", "created_at", "id"),
+        Index("ix_recording_sessions_status_created_at", "status", "created_at"),
+    )
 
     def to_dict(self) -> dict[str, Any]:
         return {
@@ -41,8 +56,11 @@ class RecordingSession(Base):
             "title": self.title,
             "language": self.language,
             "audio_path": self.audio_path,
-            "has_audio_blob": self.audio_bytes is not None,
-            "has_transcript": self.transcript_text is not None,
+            "audio_format": self.audio_format,
+            "audio_size": self.audio_size,
+            "audio_sha256": self.audio_sha256,
+            "has_audio_blob": self.has_audio_blob,
+            "has_transcript": self.has_transcript,
             "summary": self.summary_json,
         }
 
@@ -52,6 +70,7 @@ class AppSettings(Base):
 
     id = Column(String(36), primary_key=True, default="default")
     data = Column(_json_column(), nullable=False, default=dict)
+    updated_at = Column(DateTime(timezone=True), default=dt.datetime.utcnow, onupdate=dt.datetime.utcnow)
 
     def get_data(self) -> dict[str, Any]:
         if isinstance(self.data, (bytes, str)):
@@ -61,3 +80,39 @@ class AppSettings(Base):
     def set_data(self, value: dict[str, Any]) -> None:
         self.data = value
 
+
+class ProcessingJob(Base):
+    __tablename__ = "processing_jobs"
+
+    id = Column(String(36), primary_key=True)
+    session_id = Column(String(36), nullable=False, index=True)
+    kind = Column(String(32), default="finalize", nullable=False)
+    status = Column(String(32), default="queued", nullable=False, index=True)
+    progress = Column(Float, default=0.0, nullable=False)
+    stage = Column(String(64), nullable=True)
+    error = Column(Text, nullable=True)
+    partial_summary = Column(_json_column(), nullable=True)
+    attempts = Column(Integer, default=0, nullable=False)
+    worker = Column(String(64), nullable=True)
+    batch_id = Column(String(36), nullable=True, index=True)
+    created_at = Column(DateTime(timezone=True), default=dt.datetime.utcnow, nullable=False)
+    updated_at = Column(DateTime(timezone=True), default=dt.datetime.utcnow, onupdate=dt.datetime.utcnow)
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+
+class ProcessingBatch(Base):
+    __tablename__ = "processing_batches"
+
+    id = Column(String(36), primary_key=True)
+    mode = Column(String(32), nullable=False)
+    status = Column(String(32), default="queued", nullable=False, index=True)
+    filters = Column(_json_column(), nullable=True)
+    settings_snapshot = Column(_json_column(), nullable=True)
+    total = Column(Integer, default=0, nullable=False)
+    completed = Column(Integer, default=0, nullable=False)
+    failed = Column(Integer, default=0, nullable=False)
+    worker = Column(String(64), nullable=True)
+    created_at = Column(DateTime(timezone=True), default=dt.datetime.utcnow, nullable=False)
+    updated_at = Column(DateTime(timezone=True), default=dt.datetime.utcnow, onupdate=dt.datetime.utcnow)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Any, AsyncIterator
+
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+from ..database import AsyncSessionLocal, get_session
+from ..models import ProcessingBatch
+from ..schemas import BatchCreateRequest, BatchResponse
+from ..services.app_settings import current_app_settings
+from ..services.backfill import batch_state
+from ..services.jobs import enqueue_batch
+from .jobs import EVENT_POLL_INTERVAL, _sse
+
+router = APIRouter(prefix="/api/batches", tags=["batches"])
+
+
+def _response(batch: ProcessingBatch) -> BatchResponse:
+    return BatchResponse(
+        **batch_state(batch),
+        created_at=batch.created_at,
+        updated_at=batch.updated_at,
+        finished_at=batch.finished_at,
+    )
+
+
+async def _load_batch(batch_id: str) -> dict[str, Any] | None:
+    async with AsyncSessionLocal() as db:
+        batch = await db.get(ProcessingBatch, batch_id)
+        return batch_state(batch) if batch else None
+
+
+async def _batch_events(batch_id: str) -> AsyncIterator[str]:
+    last_state: dict[str, Any] | None = None
+    while True:
+        state = await _load_batch(batch_id)
+        if state is None:
+            yield _sse("error", {"detail": "Stapelauftrag nicht gefunden"})
+            return
+        if state != last_state:
+            last_state = state
+            yield _sse("progress", state)
+        if state["status"] == "completed":
+            yield _sse("done", state)
+            return
+        await asyncio.sleep(EVENT_POLL_INTERVAL)
+
+
+@router.post("", response_model=BatchResponse, status_code=202)
+def create_batch(payload: BatchCreateRequest, db: Session = Depends(get_session)) -> BatchResponse:
+    filters = payload.model_dump(exclude={"mode", "use_current_settings"}, exclude_none=True)
+    batch = enqueue_batch(
+        db,
+        payload.mode,
+        filters,
+        settings_snapshot=current_app_settings(db)[0] if payload.use_current_settings else None,
+    )
+    if batch is None:
+        raise HTTPException(status_code=400, detail="Keine passenden Sitzungen gefunden")
+    return _response(batch)
+
+
+@router.get("/{batch_id}", response_model=BatchResponse)
+def get_batch(batch_id: str, db: Session = Depends(get_session)) -> BatchResponse:
+    batch = db.get(ProcessingBatch, batch_id)
+    if not batch:
+        raise HTTPException(status_code=404, detail="Stapelauftrag nicht gefunden")
+    return _response(batch)
+
+
+@router.get("/{batch_id}/events")
+async def batch_events(batch_id: str) -> StreamingResponse:
+    if await _load_batch(batch_id) is None:
+        raise HTTPException(status_code=404, detail="Stapelauftrag nicht gefunden")
+    return StreamingResponse(
+        _batch_events(batch_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
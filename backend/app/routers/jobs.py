@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+import asyncio
+import json
+from typing import Any, AsyncIterator
+
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+from ..database import AsyncSessionLocal, get_session
+from ..models import ProcessingJob
+from ..schemas import JobResponse
+
+router = APIRouter(prefix="/api/jobs", tags=["jobs"])
+
+EVENT_POLL_INTERVAL = 0.5
+FINISHED_STATUSES = {"completed", "failed"}
+
+
+async def _load_job(job_id: str) -> dict[str, Any] | None:
+    async with AsyncSessionLocal() as db:
+        job = await db.get(ProcessingJob, job_id)
+        if not job:
+            return None
+        return JobResponse.model_validate(job, from_attributes=True).model_dump(mode="json")
+
+
+def _sse(event: str, data: dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def _job_events(job_id: str) -> AsyncIterator[str]:
+    last_progress: tuple[Any, ...] | None = None
+    sent_sections: dict[str, str] = {}
+    while True:
+        job = await _load_job(job_id)
+        if job is None:
+            yield _sse("error", {"detail": "Auftrag nicht gefunden"})
+            return
+        progress = (job["status"], job["progress"], job["stage"])
+        if progress != last_progress:
+            last_progress = progress
+            yield _sse("progress", {key: job[key] for key in ("id", "status", "progress", "stage")})
+        for section, content in (job.get("partial_summary") or {}).items():
+            if sent_sections.get(section) != content:
+                sent_sections[section] = content
+                yield _sse("section", {"section": section, "text": content})
+        if job["status"] in FINISHED_STATUSES:
+            yield _sse("done", {"status": job["status"], "error": job["error"]})
+            return
+        await asyncio.sleep(EVENT_POLL_INTERVAL)
+
+
+@router.get("/{job_id}", response_model=JobResponse)
+def get_job(job_id: str, db: Session = Depends(get_session)) -> JobResponse:
+    job = db.get(ProcessingJob, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Auftrag nicht gefunden")
+    return JobResponse.model_validate(job, from_attributes=True)
+
+
+@router.get("/{job_id}/events")
+async def job_events(job_id: str) -> StreamingResponse:
+    if await _load_job(job_id) is None:
+        raise HTTPException(status_code=404, detail="Auftrag nicht gefunden")
+    return StreamingResponse(
+        _job_events(job_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,27 @@
+from __future__ import annotations
+
+from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from ..database import get_session
+from ..models import ProcessingJob
+from ..services.jobs import ACTIVE_STATUSES
+from ..services.metrics import JOB_QUEUE, render
+
+router = APIRouter(tags=["metrics"])
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def metrics(db: Session = Depends(get_session)) -> PlainTextResponse:
+    counts = dict(
+        db.execute(
+            select(ProcessingJob.status, func.count())
+            .where(ProcessingJob.status.in_(ACTIVE_STATUSES))
+            .group_by(ProcessingJob.status)
+        ).all()
+    )
+    for status in ACTIVE_STATUSES:
+        JOB_QUEUE.set(counts.get(status, 0), status=status)
+    return PlainTextResponse(render(), media_type="text/plain; version=0.0.4; charset=utf-8")
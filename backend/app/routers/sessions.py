@@ -1,90 +1,66 @@
 ﻿from __future__ import annotations
 
+import asyncio
+import base64
 import datetime as dt
-import re
 import uuid
 from pathlib import Path
-from typing import Any
+from typing import Optional
 
-from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisconnect
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from sqlalchemy import and_, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, load_only, undefer
 
 from ..config import get_settings
-from ..database import SessionLocal, get_session
-from ..models import AppSettings, RecordingSession
+from ..database import AsyncSessionLocal, get_async_session, get_session
+from ..models import RecordingSession
 from ..schemas import (
-    FinalizeResponse,
+    JobResponse,
+    SessionCreateRequest,
     SessionCreateResponse,
     SessionDetail,
     SessionListItem,
-    SettingsPayload,
+    SessionPage,
+    SessionSearchHit,
+    SessionSearchResponse,
     TranscriptResponse,
 )
-from ..services.audio import append_audio_chunk, ensure_storage_dir
-from ..services.summarizer import summarize
-from ..services.transcribe import transcribe_file
+from ..services.app_settings import current_app_settings
+from ..services.audio import INGEST_FILENAME, ensure_storage_dir
+from ..services.decoder import PCM_FORMAT, negotiate_format, supported_formats
+from ..services.ingest import (
+    IngestGapError,
+    IngestWriter,
+    StreamBusyError,
+    acquire_ingest_lock,
+    parse_frame,
+    register_stream,
+    release_stream,
+    take_over_stream,
+    watch_takeover,
+)
+from ..services.jobs import QueueFullError, active_job, enqueue_job
+from ..services.live import detach_live_transcription, start_live_transcription
+from ..services.metrics import WS_ACTIVE, WS_BYTES, WS_FRAMES
+from ..services.pipeline import fallback_title
+from ..services.playback import RangeNotSatisfiable, audio_body, parse_range
+from ..services.search import search_sessions
+from ..services.transcribe import configured_profiles, profile_key
 
 router = APIRouter(prefix="/api/sessions", tags=["sessions"])
 settings = get_settings()
 
-
-def _get_db_settings(db: Session) -> dict:
-    settings_row = db.get(AppSettings, "default")
-    if not settings_row:
-        settings_row = AppSettings(id="default", data=SettingsPayload().model_dump())
-        db.add(settings_row)
-        db.commit()
-        db.refresh(settings_row)
-    data = settings_row.get_data() or {}
-    if not data.get("sections"):
-        defaults = SettingsPayload().model_dump()
-        data = {**defaults, **data}
-        settings_row.set_data(data)
-        db.add(settings_row)
-        db.commit()
-        db.refresh(settings_row)
-    return data
-
-
-def _fallback_title(created_at: dt.datetime | None) -> str:
-    if not created_at:
-        return "Unbenannte Sitzung"
-    return f"Sitzung vom {created_at.strftime('%d.%m.%Y %H:%M')}"
-
-
-def _generate_session_title(transcript: str, summary: dict[str, Any] | None, created_at: dt.datetime | None) -> str:
-    candidates: list[str] = []
-    if summary:
-        sections = summary.get("sections") or {}
-        if isinstance(sections, dict):
-            for value in sections.values():
-                if isinstance(value, str):
-                    snippet = value.strip().splitlines()[0].strip()
-                    if snippet:
-                        candidates.append(snippet)
-        raw = summary.get("raw")
-        if isinstance(raw, str) and raw.strip():
-            candidates.append(raw.strip().splitlines()[0].strip())
-    transcript = transcript.strip()
-    if transcript:
-        sentences = re.split(r"(?<=[.!?])\s+", transcript)
-        if sentences:
-            candidates.append(sentences[0].strip())
-    for candidate in candidates:
-        text = candidate.strip().strip(" -–—")
-        if not text:
-            continue
-        lowered = text.lower()
-        if lowered.startswith("keine inhalte"):
-            continue
-        return (text[:120] + "…") if len(text) > 120 else text
-    return _fallback_title(created_at)
+CLOSED_STREAM_STATUSES = {"queued", "processing", "completed"}
 
 
 @router.post("", response_model=SessionCreateResponse, status_code=201)
-def create_session(db: Session = Depends(get_session)) -> SessionCreateResponse:
+def create_session(
+    payload: Optional[SessionCreateRequest] = None, db: Session = Depends(get_session)
+) -> SessionCreateResponse:
     session_id = str(uuid.uuid4())
-    app_settings = _get_db_settings(db)
+    app_settings, _ = current_app_settings(db)
     session_obj = RecordingSession(
         id=session_id,
         status="recording",
@@ -92,46 +68,127 @@ def create_session(db: Session = Depends(get_session)) -> SessionCreateResponse:
         settings_snapshot=app_settings,
     )
     storage_dir = ensure_storage_dir(settings.storage_dir, session_id)
-    session_obj.audio_path = str(storage_dir / "audio.raw")
+    session_obj.audio_path = str(storage_dir / INGEST_FILENAME)
     db.add(session_obj)
     db.commit()
     db.refresh(session_obj)
     ws_url = f"/api/sessions/{session_id}/stream"
-    return SessionCreateResponse(id=session_id, websocket_url=ws_url, created_at=session_obj.created_at)
+    return SessionCreateResponse(
+        id=session_id,
+        websocket_url=ws_url,
+        created_at=session_obj.created_at,
+        audio_format=negotiate_format(payload.audio_formats if payload else []),
+        audio_formats=supported_formats(),
+    )
 
 
-@router.get("", response_model=list[SessionListItem])
-def list_sessions(db: Session = Depends(get_session)) -> list[SessionListItem]:
-    sessions = (
-        db.query(RecordingSession)
-        .order_by(RecordingSession.created_at.desc())
-        .all()
+_LIST_COLUMNS = (
+    RecordingSession.id,
+    RecordingSession.created_at,
+    RecordingSession.updated_at,
+    RecordingSession.status,
+    RecordingSession.title,
+    RecordingSession.has_transcript,
+)
+
+
+def _list_item(s: RecordingSession) -> SessionListItem:
+    return SessionListItem(
+        id=s.id,
+        created_at=s.created_at,
+        updated_at=s.updated_at,
+        status=s.status,
+        has_transcript=bool(s.has_transcript),
+        title=s.title or fallback_title(s.created_at),
     )
-    return [
-        SessionListItem(
-            id=s.id,
-            created_at=s.created_at,
-            updated_at=s.updated_at,
-            status=s.status,
-            has_transcript=bool(s.transcript_text),
-            title=s.title or _fallback_title(s.created_at),
+
+
+def _encode_cursor(created_at: dt.datetime, session_id: str) -> str:
+    raw = f"{created_at.isoformat()}|{session_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> tuple[dt.datetime, str]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_raw, session_id = base64.urlsafe_b64decode(padded).decode("utf-8").split("|", 1)
+        return dt.datetime.fromisoformat(created_raw), session_id
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Ungueltiger Cursor")
+
+
+@router.get("", response_model=SessionPage)
+def list_sessions(
+    limit: int = Query(default=50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    status: Optional[str] = None,
+    language: Optional[str] = None,
+    created_from: Optional[dt.datetime] = None,
+    created_to: Optional[dt.datetime] = None,
+    db: Session = Depends(get_session),
+) -> SessionPage:
+    query = select(RecordingSession).options(load_only(*_LIST_COLUMNS))
+    if status:
+        query = query.where(RecordingSession.status == status)
+    if language:
+        query = query.where(RecordingSession.language == language)
+    if created_from:
+        query = query.where(RecordingSession.created_at >= created_from)
+    if created_to:
+        query = query.where(RecordingSession.created_at < created_to)
+    if cursor:
+        cursor_created_at, cursor_id = _decode_cursor(cursor)
+        query = query.where(
+            or_(
+                RecordingSession.created_at < cursor_created_at,
+                and_(RecordingSession.created_at == cursor_created_at, RecordingSession.id < cursor_id),
+            )
         )
-        for s in sessions
+    sessions = db.scalars(
+        query.order_by(RecordingSession.created_at.desc(), RecordingSession.id.desc()).limit(limit + 1)
+    ).all()
+    next_cursor = None
+    if len(sessions) > limit:
+        sessions = sessions[:limit]
+        next_cursor = _encode_cursor(sessions[-1].created_at, sessions[-1].id)
+    return SessionPage(items=[_list_item(s) for s in sessions], next_cursor=next_cursor)
+
+
+@router.get("/search", response_model=SessionSearchResponse)
+def search(
+    q: str = Query(min_length=1, max_length=200),
+    limit: int = Query(default=20, ge=1, le=100),
+    db: Session = Depends(get_session),
+) -> SessionSearchResponse:
+    hits = search_sessions(db, q, limit)
+    if not hits:
+        return SessionSearchResponse(query=q, items=[])
+    rows = db.scalars(
+        select(RecordingSession)
+        .options(load_only(*_LIST_COLUMNS))
+        .where(RecordingSession.id.in_([hit["id"] for hit in hits]))
+    ).all()
+    by_id = {row.id: row for row in rows}
+    items = [
+        SessionSearchHit(**_list_item(by_id[hit["id"]]).model_dump(), rank=hit["rank"], snippet=hit["snippet"])
+        for hit in hits
+        if hit["id"] in by_id
     ]
+    return SessionSearchResponse(query=q, items=items)
 
 
 @router.get("/{session_id}", response_model=SessionDetail)
 def get_session_detail(session_id: str, db: Session = Depends(get_session)) -> SessionDetail:
-    session_obj = db.get(RecordingSession, session_id)
+    session_obj = db.get(
+        RecordingSession,
+        session_id,
+        options=[load_only(*_LIST_COLUMNS, RecordingSession.language, RecordingSession.summary_json)],
+    )
     if not session_obj:
         raise HTTPException(status_code=404, detail="Sitzung nicht gefunden")
+    item = _list_item(session_obj)
     return SessionDetail(
-        id=session_obj.id,
-        created_at=session_obj.created_at,
-        updated_at=session_obj.updated_at,
-        status=session_obj.status,
-        has_transcript=bool(session_obj.transcript_text),
-        title=session_obj.title or _fallback_title(session_obj.created_at),
+        **item.model_dump(),
         language=session_obj.language,
         summary=session_obj.summary_json,
     )
@@ -139,15 +196,23 @@ def get_session_detail(session_id: str, db: Session = Depends(get_session)) -> S
 
 @router.get("/{session_id}/transcript", response_model=TranscriptResponse)
 def get_transcript(session_id: str, db: Session = Depends(get_session)) -> TranscriptResponse:
-    session_obj = db.get(RecordingSession, session_id)
+    session_obj = db.get(
+        RecordingSession,
+        session_id,
+        options=[load_only(RecordingSession.id, RecordingSession.transcript_text, RecordingSession.summary_json)],
+    )
     if not session_obj or not session_obj.transcript_text:
         raise HTTPException(status_code=404, detail="Transkript nicht gefunden")
     return TranscriptResponse(transcript=session_obj.transcript_text, summary=session_obj.summary_json or {})
 
 
-@router.post("/{session_id}/finalize", response_model=FinalizeResponse)
-async def finalize_session(session_id: str, db: Session = Depends(get_session)) -> FinalizeResponse:
-    session_obj = db.get(RecordingSession, session_id)
+@router.post("/{session_id}/finalize", response_model=JobResponse, status_code=202)
+async def finalize_session(
+    session_id: str,
+    model: Optional[str] = Query(default=None),
+    db: AsyncSession = Depends(get_async_session),
+) -> JobResponse:
+    session_obj = await db.get(RecordingSession, session_id, options=[undefer(RecordingSession.settings_snapshot)])
     if not session_obj:
         raise HTTPException(status_code=404, detail="Sitzung nicht gefunden")
     if not session_obj.audio_path:
@@ -155,61 +220,173 @@ async def finalize_session(session_id: str, db: Session = Depends(get_session))
     audio_path = Path(session_obj.audio_path)
     if not audio_path.exists():
         raise HTTPException(status_code=400, detail="Audiodatei fehlt")
+    if model:
+        if profile_key(model) not in configured_profiles():
+            raise HTTPException(status_code=400, detail="Unbekanntes Transkriptionsmodell")
+        if await active_job(db, session_id):
+            raise HTTPException(status_code=409, detail="Sitzung wird bereits verarbeitet")
+        session_obj.settings_snapshot = {**(session_obj.settings_snapshot or {}), "transcription_model": model}
+        db.add(session_obj)
+
+    detach_live_transcription(session_id)
+    try:
+        job = await enqueue_job(db, session_id)
+    except QueueFullError as exc:
+        raise HTTPException(status_code=503, detail=str(exc), headers={"Retry-After": "30"})
+    return JobResponse.model_validate(job, from_attributes=True)
 
-    transcription = await transcribe_file(audio_path, language=session_obj.language)
-    summary_input = transcription.get("clean_text") or transcription.get("text", "")
-    summary = await summarize(summary_input, session_obj.settings_snapshot or {})
 
-    session_obj.status = "completed"
-    session_obj.title = _generate_session_title(summary_input, summary, session_obj.created_at)
-    session_obj.transcript_text = transcription["text"]
-    session_obj.transcript_json = transcription
-    session_obj.summary_json = summary
+SEGMENT_PADDING_SECONDS = 0.25
+
+
+def _segment_bounds(transcript: dict | None, segment_id: int) -> tuple[float, float]:
+    for segment in (transcript or {}).get("segments") or []:
+        if segment.get("id") == segment_id:
+            return max(0.0, segment["start"] - SEGMENT_PADDING_SECONDS), segment["end"] + SEGMENT_PADDING_SECONDS
+    raise HTTPException(status_code=404, detail="Segment nicht gefunden")
+
+
+@router.get("/{session_id}/audio")
+async def get_session_audio(
+    session_id: str,
+    request: Request,
+    start: Optional[float] = Query(default=None, ge=0),
+    end: Optional[float] = Query(default=None, gt=0),
+    segment: Optional[int] = Query(default=None, ge=1),
+    db: AsyncSession = Depends(get_async_session),
+) -> StreamingResponse:
+    options = [load_only(RecordingSession.id, RecordingSession.audio_path)]
+    if segment is not None:
+        options.append(undefer(RecordingSession.transcript_json))
+    session_obj = await db.get(RecordingSession, session_id, options=options)
+    if not session_obj:
+        raise HTTPException(status_code=404, detail="Sitzung nicht gefunden")
+    if segment is not None:
+        start, end = _segment_bounds(session_obj.transcript_json, segment)
+    if start is not None and end is not None and end <= start:
+        raise HTTPException(status_code=400, detail="Ungueltiger Zeitbereich")
+    body = await audio_body(Path(session_obj.audio_path), start, end) if session_obj.audio_path else None
+    if body is None:
+        raise HTTPException(status_code=404, detail="Audiodatei fehlt")
     try:
-        session_obj.audio_bytes = audio_path.read_bytes()
-    except Exception:
-        session_obj.audio_bytes = None
-    db.add(session_obj)
-    db.commit()
-    db.refresh(session_obj)
-    return FinalizeResponse(
-        id=session_obj.id,
-        status=session_obj.status,
-        transcript=session_obj.transcript_text,
-        summary=session_obj.summary_json or {},
-        title=session_obj.title,
+        byte_range = parse_range(request.headers.get("range"), body.size)
+    except RangeNotSatisfiable as exc:
+        raise HTTPException(status_code=416, detail=str(exc), headers={"Content-Range": f"bytes */{exc.size}"})
+    first, last = byte_range or (0, body.size)
+    headers = {"Accept-Ranges": "bytes", "Content-Length": str(last - first)}
+    if byte_range:
+        headers["Content-Range"] = f"bytes {first}-{last - 1}/{body.size}"
+    return StreamingResponse(
+        body.iter_range(first, last),
+        status_code=206 if byte_range else 200,
+        media_type=body.media_type,
+        headers=headers,
     )
 
 
+async def _load_stream_target(session_id: str) -> tuple[Path, str, str] | None:
+    async with AsyncSessionLocal() as db:
+        session_obj = await db.get(RecordingSession, session_id)
+        if not session_obj:
+            return None
+        return Path(session_obj.audio_path), session_obj.language, session_obj.status
+
+
 @router.websocket("/{session_id}/stream")
-async def stream_audio(websocket: WebSocket, session_id: str):
+async def stream_audio(
+    websocket: WebSocket, session_id: str, protocol: str = "raw", audio_format: str = PCM_FORMAT
+):
     await websocket.accept()
-    with SessionLocal() as db:
-        session_obj = db.get(RecordingSession, session_id)
-        if not session_obj:
-            await websocket.send_json({"error": "Sitzung nicht gefunden"})
-            await websocket.close(code=1008)
-            return
-        audio_path = Path(session_obj.audio_path)
+    target = await _load_stream_target(session_id)
+    if target is None:
+        await websocket.send_json({"error": "Sitzung nicht gefunden"})
+        await websocket.close(code=1008)
+        return
+    audio_path, language, status = target
+    if status in CLOSED_STREAM_STATUSES:
+        await websocket.send_json({"error": "Aufnahme bereits abgeschlossen"})
+        await websocket.close(code=1008)
+        return
+    if audio_format not in supported_formats():
+        await websocket.send_json({"error": "Audioformat wird nicht unterstuetzt"})
+        await websocket.close(code=1003)
+        return
+    framed = protocol == "framed"
 
+    await take_over_stream(session_id)
     try:
+        lock = await acquire_ingest_lock(audio_path.parent)
+    except StreamBusyError as exc:
+        await websocket.send_json({"error": str(exc)})
+        await websocket.close(code=1013)
+        return
+    try:
+        writer = IngestWriter(audio_path, audio_format, lock)
+    except ValueError as exc:
+        lock.release()
+        await websocket.send_json({"error": str(exc)})
+        await websocket.close(code=1008)
+        return
+    try:
+        await writer.open()
+    except Exception:
+        await writer.close()
+        raise
+    register_stream(session_id, websocket, writer)
+    watcher = asyncio.create_task(watch_takeover(session_id, audio_path.parent))
+    live = start_live_transcription(session_id, audio_path, language, websocket.send_json)
+    WS_ACTIVE.inc()
+    gap_reported = False
+    try:
+        await websocket.send_json({**writer.ack(), "event": "resume", "offset": writer.committed_bytes})
         while True:
             message = await websocket.receive()
             if message.get("type") == "websocket.disconnect":
                 break
             if "bytes" in message and message["bytes"]:
-                append_audio_chunk(audio_path, message["bytes"])
-                await websocket.send_json({"ok": True, "bytes": len(message["bytes"])} )
+                data = message["bytes"]
+                WS_FRAMES.inc()
+                WS_BYTES.inc(len(data))
+                if framed:
+                    try:
+                        offset, payload = parse_frame(data)
+                        data = writer.accept(offset, payload)
+                    except IngestGapError as exc:
+                        if not gap_reported:
+                            gap_reported = True
+                            await websocket.send_json({"event": "gap", "expected": exc.expected})
+                        continue
+                    except ValueError as exc:
+                        await websocket.send_json({"error": str(exc)})
+                        continue
+                    gap_reported = False
+                if await writer.write(data) and live:
+                    live.feed(writer.stored_bytes)
+                if writer.ack_due():
+                    await websocket.send_json(writer.ack())
             elif "text" in message:
                 data = message["text"]
                 if data == "stop":
-                    await websocket.send_json({"ok": True, "event": "stopped"})
+                    await writer.close()
+                    if live:
+                        await live.flush()
+                    await websocket.send_json({**writer.ack(), "event": "stopped"})
                     break
                 await websocket.send_json({"ok": True})
     except WebSocketDisconnect:
         pass
     except Exception as exc:
-        await websocket.send_json({"error": str(exc)})
+        try:
+            await websocket.send_json({"error": str(exc)})
+        except Exception:
+            pass
     finally:
-        await websocket.close()
-
+        WS_ACTIVE.dec()
+        watcher.cancel()
+        await writer.close()
+        if release_stream(session_id, websocket):
+            detach_live_transcription(session_id)
+        try:
+            await websocket.close()
+        except Exception:
+            pass
@@ -1,37 +1,40 @@
 ﻿from __future__ import annotations
 
-from fastapi import APIRouter, Depends
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, Response
 from sqlalchemy.orm import Session
 
 from ..database import get_session
-from ..models import AppSettings
 from ..schemas import SettingsPayload, SettingsResponse
+from ..services.app_settings import current_app_settings, save_app_settings
 
 router = APIRouter(prefix="/api/settings", tags=["settings"])
 
 
-def _get_settings_row(db: Session) -> AppSettings:
-    row = db.get(AppSettings, "default")
-    if not row:
-        row = AppSettings(id="default", data=SettingsPayload().model_dump())
-        db.add(row)
-        db.commit()
-        db.refresh(row)
-    return row
+def _matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = {value.strip().removeprefix("W/") for value in if_none_match.split(",")}
+    return "*" in candidates or etag in candidates
 
 
 @router.get("", response_model=SettingsResponse)
-def get_settings(db: Session = Depends(get_session)) -> SettingsResponse:
-    row = _get_settings_row(db)
-    return SettingsResponse(data=SettingsPayload(**row.get_data()))
+def get_settings(
+    response: Response,
+    if_none_match: Optional[str] = Header(default=None),
+    db: Session = Depends(get_session),
+):
+    data, etag = current_app_settings(db)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return SettingsResponse(data=SettingsPayload(**data))
 
 
 @router.put("", response_model=SettingsResponse)
-def update_settings(payload: SettingsPayload, db: Session = Depends(get_session)) -> SettingsResponse:
-    row = _get_settings_row(db)
-    row.set_data(payload.model_dump())
-    db.add(row)
-    db.commit()
-    db.refresh(row)
-    return SettingsResponse(data=SettingsPayload(**row.get_data()))
-
+def update_settings(payload: SettingsPayload, response: Response, db: Session = Depends(get_session)) -> SettingsResponse:
+    data, etag = save_app_settings(db, payload.model_dump())
+    response.headers.update({"ETag": etag, "Cache-Control": "no-cache"})
+    return SettingsResponse(data=SettingsPayload(**data))
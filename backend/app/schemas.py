@@ -1,7 +1,7 @@
 ﻿from __future__ import annotations
 
 import datetime as dt
-from typing import Any, Optional
+from typing import Any, Literal, Optional
 
 from pydantic import BaseModel, Field
 
@@ -24,16 +24,23 @@ class SettingsPayload(BaseModel):
     audience: Optional[str] = None
     objectives: Optional[str] = None
     notes: Optional[str] = None
+    transcription_model: Optional[str] = None
 
 
 class SettingsResponse(BaseModel):
     data: SettingsPayload
 
 
+class SessionCreateRequest(BaseModel):
+    audio_formats: list[str] = Field(default_factory=list)
+
+
 class SessionCreateResponse(BaseModel):
     id: str
     websocket_url: str
     created_at: dt.datetime
+    audio_format: str = "pcm_s16le"
+    audio_formats: list[str] = Field(default_factory=list)
 
 
 class SessionListItem(BaseModel):
@@ -45,6 +52,21 @@ class SessionListItem(BaseModel):
     title: Optional[str] = None
 
 
+class SessionPage(BaseModel):
+    items: list[SessionListItem]
+    next_cursor: Optional[str] = None
+
+
+class SessionSearchHit(SessionListItem):
+    rank: float
+    snippet: Optional[str] = None
+
+
+class SessionSearchResponse(BaseModel):
+    query: str
+    items: list[SessionSearchHit]
+
+
 class SessionDetail(SessionListItem):
     language: str
     summary: Optional[dict[str, Any]] = None
@@ -55,9 +77,38 @@ class TranscriptResponse(BaseModel):
     summary: dict[str, Any]
 
 
-class FinalizeResponse(BaseModel):
+class JobResponse(BaseModel):
     id: str
+    session_id: str
+    kind: str
     status: str
-    transcript: str
-    summary: dict[str, Any]
-    title: Optional[str] = None
+    progress: float
+    stage: Optional[str] = None
+    error: Optional[str] = None
+    partial_summary: Optional[dict[str, Any]] = None
+    created_at: Optional[dt.datetime] = None
+    updated_at: Optional[dt.datetime] = None
+    finished_at: Optional[dt.datetime] = None
+
+
+class BatchCreateRequest(BaseModel):
+    mode: Literal["resummarize", "retranscribe"] = "resummarize"
+    session_ids: Optional[list[str]] = None
+    status: Optional[str] = "completed"
+    created_from: Optional[dt.datetime] = None
+    created_to: Optional[dt.datetime] = None
+    limit: Optional[int] = Field(default=None, ge=1)
+    use_current_settings: bool = True
+
+
+class BatchResponse(BaseModel):
+    id: str
+    mode: str
+    status: str
+    total: int
+    completed: int
+    failed: int
+    progress: float
+    created_at: Optional[dt.datetime] = None
+    updated_at: Optional[dt.datetime] = None
+    finished_at: Optional[dt.datetime] = None
@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+import copy
+import datetime as dt
+import hashlib
+import json
+import threading
+import time
+from typing import Any
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from ..config import get_settings
+from ..models import AppSettings
+from ..schemas import SettingsPayload
+
+settings = get_settings()
+
+SETTINGS_ROW_ID = "default"
+
+_lock = threading.Lock()
+_cached: dict[str, Any] | None = None
+_checked_at = 0.0
+
+
+def _etag(data: dict[str, Any]) -> str:
+    digest = hashlib.sha256(json.dumps(data, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def _normalize(data: dict[str, Any]) -> dict[str, Any]:
+    if data.get("sections"):
+        return data
+    return {**SettingsPayload().model_dump(), **data, "sections": SettingsPayload().sections}
+
+
+def _store(data: dict[str, Any], updated_at: dt.datetime | None) -> dict[str, Any]:
+    global _cached, _checked_at
+    data = _normalize(data)
+    _cached = {"data": data, "etag": _etag(data), "updated_at": updated_at}
+    _checked_at = time.monotonic()
+    return _cached
+
+
+def _load_row(db: Session) -> dict[str, Any]:
+    row = db.get(AppSettings, SETTINGS_ROW_ID)
+    if row is None:
+        row = AppSettings(id=SETTINGS_ROW_ID, data=SettingsPayload().model_dump(), updated_at=dt.datetime.utcnow())
+        db.add(row)
+        db.commit()
+        db.refresh(row)
+    return _store(row.get_data() or {}, row.updated_at)
+
+
+def _is_stale(db: Session) -> bool:
+    global _checked_at
+    if _cached is None:
+        return True
+    if time.monotonic() - _checked_at < settings.app_settings_cache_ttl:
+        return False
+    updated_at = db.scalar(select(AppSettings.updated_at).where(AppSettings.id == SETTINGS_ROW_ID))
+    if updated_at is None or updated_at != _cached["updated_at"]:
+        return True
+    _checked_at = time.monotonic()
+    return False
+
+
+def current_app_settings(db: Session) -> tuple[dict[str, Any], str]:
+    with _lock:
+        state = _load_row(db) if _is_stale(db) else _cached
+        return copy.deepcopy(state["data"]), state["etag"]
+
+
+def save_app_settings(db: Session, data: dict[str, Any]) -> tuple[dict[str, Any], str]:
+    with _lock:
+        row = db.get(AppSettings, SETTINGS_ROW_ID)
+        if row is None:
+            row = AppSettings(id=SETTINGS_ROW_ID)
+        row.set_data(data)
+        row.updated_at = dt.datetime.utcnow()
+        db.add(row)
+        db.commit()
+        db.refresh(row)
+        state = _store(row.get_data() or {}, row.updated_at)
+        return copy.deepcopy(state["data"]), state["etag"]
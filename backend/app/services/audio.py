@@ -1,7 +1,52 @@
 ﻿from __future__ import annotations
 
+import hashlib
+import time
 from pathlib import Path
 
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+PCM_SAMPLE_RATE = 48000
+PCM_SAMPLE_WIDTH = 2
+WHISPER_SAMPLE_RATE = 16000
+INGEST_FILENAME = "audio.pcm"
+ARCHIVE_FORMATS = {
+    "flac": ("flac", "flac", ".flac"),
+    "opus": ("ogg", "libopus", ".opus"),
+}
+PCM_SUFFIXES = {".raw": PCM_SAMPLE_RATE, ".pcm": WHISPER_SAMPLE_RATE}
+DECIMATION_FACTOR = PCM_SAMPLE_RATE // WHISPER_SAMPLE_RATE
+RESAMPLE_CHUNK_SECONDS = 10.0
+_FILTER_TAPS = 63
+
+
+def _lowpass_kernel(taps: int = _FILTER_TAPS, factor: int = DECIMATION_FACTOR) -> np.ndarray:
+    cutoff = 0.45 / factor
+    n = np.arange(taps) - (taps - 1) / 2
+    kernel = 2 * cutoff * np.sinc(2 * cutoff * n) * np.hamming(taps)
+    return (kernel / kernel.sum()).astype(np.float32)
+
+
+_KERNEL = _lowpass_kernel()
+
+
+def is_pcm_file(path: Path) -> bool:
+    return path.suffix.lower() in PCM_SUFFIXES
+
+
+def pcm_sample_rate(path: Path) -> int:
+    return PCM_SUFFIXES.get(path.suffix.lower(), PCM_SAMPLE_RATE)
+
+
+def pcm_seconds_to_bytes(seconds: float, sample_rate: int = PCM_SAMPLE_RATE) -> int:
+    frames = int(seconds * sample_rate)
+    return frames * PCM_SAMPLE_WIDTH
+
+
+def pcm_bytes_to_seconds(size: int, sample_rate: int = PCM_SAMPLE_RATE) -> float:
+    return size / (sample_rate * PCM_SAMPLE_WIDTH)
+
 
 def ensure_storage_dir(base: Path, session_id: str) -> Path:
     session_dir = base / session_id
@@ -9,11 +54,171 @@ def ensure_storage_dir(base: Path, session_id: str) -> Path:
     return session_dir
 
 
-def append_audio_chunk(path: Path, data: bytes) -> None:
-    with path.open("ab") as f:
-        f.write(data)
+class StreamingResampler:
+    def __init__(self) -> None:
+        half = (_KERNEL.shape[0] - 1) // 2
+        self._buffer = np.zeros(half, dtype=np.float32)
+        self._carry = b""
+        self._samples_in = 0
+        self._samples_out = 0
+
+    def push(self, data: bytes) -> np.ndarray:
+        data = self._carry + data
+        usable = len(data) - (len(data) % PCM_SAMPLE_WIDTH)
+        self._carry = data[usable:]
+        samples = np.frombuffer(data[:usable], dtype="<i2").astype(np.float32) * (1.0 / 32768.0)
+        self._samples_in += samples.shape[0]
+        self._buffer = np.concatenate((self._buffer, samples))
+        return self._drain()
+
+    def flush(self) -> np.ndarray:
+        half = (_KERNEL.shape[0] - 1) // 2
+        self._buffer = np.concatenate((self._buffer, np.zeros(half, dtype=np.float32)))
+        self._carry = b""
+        return self._drain(final=True)
+
+    def _drain(self, final: bool = False) -> np.ndarray:
+        if self._buffer.shape[0] < _KERNEL.shape[0]:
+            return np.zeros(0, dtype=np.float32)
+        limit = (self._samples_in + DECIMATION_FACTOR - 1) // DECIMATION_FACTOR - self._samples_out
+        count = (self._buffer.shape[0] - _KERNEL.shape[0]) // DECIMATION_FACTOR + 1
+        if final:
+            count = min(count, limit)
+        output = _decimate(self._buffer, count)
+        self._buffer = self._buffer[count * DECIMATION_FACTOR:]
+        self._samples_out += output.shape[0]
+        return output
+
+
+def _to_int16_bytes(samples: np.ndarray) -> bytes:
+    scaled = np.clip(np.rint(samples * 32768.0), -32768, 32767)
+    return scaled.astype("<i2").tobytes()
+
+
+class AudioIngest:
+    def __init__(self, path: Path):
+        self.path = path
+        self._resampler = StreamingResampler() if pcm_sample_rate(path) != PCM_SAMPLE_RATE else None
+        self._file = path.open("ab")
+
+    def _append(self, data: bytes) -> int:
+        if data:
+            self._file.write(data)
+            self._file.flush()
+        return len(data)
+
+    def write(self, data: bytes) -> int:
+        if self._resampler is None:
+            return self._append(data)
+        return self._append(_to_int16_bytes(self._resampler.push(data)))
+
+    def close(self) -> int:
+        written = 0
+        if self._resampler is not None:
+            written = self._append(_to_int16_bytes(self._resampler.flush()))
+            self._resampler = StreamingResampler()
+        self._file.close()
+        return written
+
+
+def _decimate(window: np.ndarray, count: int) -> np.ndarray:
+    frames = sliding_window_view(window, _KERNEL.shape[0])[::DECIMATION_FACTOR]
+    return frames[:count] @ _KERNEL
+
+
+def pcm_view(path: Path, start_byte: int = 0, end_byte: int | None = None) -> np.ndarray:
+    size = path.stat().st_size
+    end = size if end_byte is None else min(end_byte, size)
+    start = min(start_byte - (start_byte % PCM_SAMPLE_WIDTH), end)
+    count = (end - start) // PCM_SAMPLE_WIDTH
+    if count <= 0:
+        return np.zeros(0, dtype="<i2")
+    return np.memmap(path, dtype="<i2", mode="r", offset=start, shape=(count,))
+
+
+def resample_to_whisper(samples: np.ndarray, chunk_seconds: float = RESAMPLE_CHUNK_SECONDS) -> np.ndarray:
+    total = samples.shape[0]
+    output = np.empty((total + DECIMATION_FACTOR - 1) // DECIMATION_FACTOR, dtype=np.float32)
+    if total == 0:
+        return output
+    half = (_KERNEL.shape[0] - 1) // 2
+    chunk = max(DECIMATION_FACTOR, int(chunk_seconds * PCM_SAMPLE_RATE) // DECIMATION_FACTOR * DECIMATION_FACTOR)
+    for begin in range(0, total, chunk):
+        end = min(begin + chunk, total)
+        lo = max(0, begin - half)
+        hi = min(total, end + half)
+        window = samples[lo:hi].astype(np.float32) * (1.0 / 32768.0)
+        window = np.pad(window, (half - (begin - lo), half - (hi - end)))
+        filtered = _decimate(window, (end - begin + DECIMATION_FACTOR - 1) // DECIMATION_FACTOR)
+        out_begin = begin // DECIMATION_FACTOR
+        output[out_begin:out_begin + filtered.shape[0]] = filtered
+    return output
+
+
+def _to_float(samples: np.ndarray, chunk_seconds: float = RESAMPLE_CHUNK_SECONDS) -> np.ndarray:
+    output = np.empty(samples.shape[0], dtype=np.float32)
+    chunk = int(chunk_seconds * WHISPER_SAMPLE_RATE)
+    for begin in range(0, samples.shape[0], chunk):
+        np.multiply(samples[begin:begin + chunk], 1.0 / 32768.0, out=output[begin:begin + chunk], casting="unsafe")
+    return output
+
+
+def load_whisper_audio(path: Path, start_byte: int = 0, end_byte: int | None = None) -> np.ndarray:
+    samples = pcm_view(path, start_byte, end_byte)
+    if pcm_sample_rate(path) == WHISPER_SAMPLE_RATE:
+        return _to_float(samples)
+    return resample_to_whisper(samples)
+
+
+def file_sha256(path: Path, block_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def archive_audio(path: Path, fmt: str, chunk_seconds: float = RESAMPLE_CHUNK_SECONDS) -> Path:
+    import av
 
+    container_format, codec_name, suffix = ARCHIVE_FORMATS[fmt]
+    sample_rate = pcm_sample_rate(path)
+    target = path.with_suffix(suffix)
+    temp_target = target.with_name(target.name + ".tmp")
+    samples = pcm_view(path)
+    chunk = int(chunk_seconds * sample_rate)
+    with av.open(str(temp_target), mode="w", format=container_format) as container:
+        stream = container.add_stream(codec_name, rate=48000 if codec_name == "libopus" else sample_rate)
+        stream.layout = "mono"
+        resampler = av.AudioResampler(format=stream.format.name, layout="mono", rate=stream.rate)
+        for begin in range(0, samples.shape[0], chunk):
+            block = np.ascontiguousarray(samples[begin:begin + chunk]).reshape(1, -1)
+            frame = av.AudioFrame.from_ndarray(block, format="s16", layout="mono")
+            frame.sample_rate = sample_rate
+            for resampled in resampler.resample(frame):
+                for packet in stream.encode(resampled):
+                    container.mux(packet)
+        for resampled in resampler.resample(None):
+            for packet in stream.encode(resampled):
+                container.mux(packet)
+        for packet in stream.encode(None):
+            container.mux(packet)
+    temp_target.replace(target)
+    return target
 
-def write_audio_blob(path: Path, data: bytes) -> None:
-    path.write_bytes(data)
 
+def purge_expired_pcm(storage_dir: Path, retention_hours: float) -> int:
+    cutoff = time.time() - retention_hours * 3600
+    removed = 0
+    for suffix in PCM_SUFFIXES:
+        for pcm_path in storage_dir.glob(f"*/audio{suffix}"):
+            has_archive = any(pcm_path.with_suffix(ext).exists() for _, _, ext in ARCHIVE_FORMATS.values())
+            if not has_archive:
+                continue
+            try:
+                if pcm_path.stat().st_mtime < cutoff:
+                    pcm_path.unlink()
+                    removed += 1
+            except OSError:
+                continue
+    return removed
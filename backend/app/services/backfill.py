@@ -0,0 +1,248 @@
+from __future__ import annotations
+
+import asyncio
+import datetime as dt
+from pathlib import Path
+from typing import Any, Awaitable, Callable
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import undefer
+
+from ..config import get_settings
+from ..database import SessionLocal
+from ..models import ProcessingBatch, ProcessingJob, RecordingSession
+from .locks import AdvisoryLock
+from .metrics import timed
+from .pipeline import PipelineError, apply_results, summary_input, transcribe_audio
+from .summarizer import FAILED_FALLBACKS, summarize
+from .transcribe import resolve_profile
+
+settings = get_settings()
+
+BATCH_MODES = ("resummarize", "retranscribe")
+
+BatchCallback = Callable[[dict[str, Any]], Awaitable[None]]
+
+
+def _now() -> dt.datetime:
+    return dt.datetime.utcnow()
+
+
+def batch_state(batch: ProcessingBatch) -> dict[str, Any]:
+    done = batch.completed + batch.failed
+    return {
+        "id": batch.id,
+        "mode": batch.mode,
+        "status": batch.status,
+        "total": batch.total,
+        "completed": batch.completed,
+        "failed": batch.failed,
+        "progress": round(done / batch.total, 4) if batch.total else 1.0,
+    }
+
+
+def _claim_items(batch_id: str, worker: str, limit: int) -> list[tuple[str, str]]:
+    with SessionLocal() as db:
+        candidates = db.scalars(
+            select(ProcessingJob.id)
+            .where(ProcessingJob.batch_id == batch_id, ProcessingJob.status == "queued")
+            .order_by(ProcessingJob.created_at, ProcessingJob.id)
+            .limit(limit)
+        ).all()
+        if not candidates:
+            return []
+        db.execute(
+            update(ProcessingJob)
+            .where(ProcessingJob.id.in_(candidates), ProcessingJob.status == "queued")
+            .values(
+                status="running",
+                worker=worker,
+                started_at=_now(),
+                updated_at=_now(),
+                attempts=ProcessingJob.attempts + 1,
+            )
+        )
+        db.commit()
+        return list(
+            db.execute(
+                select(ProcessingJob.id, ProcessingJob.session_id).where(
+                    ProcessingJob.id.in_(candidates),
+                    ProcessingJob.status == "running",
+                    ProcessingJob.worker == worker,
+                )
+            ).all()
+        )
+
+
+def _load_items(session_ids: list[str]) -> dict[str, dict[str, Any]]:
+    with SessionLocal() as db:
+        rows = db.scalars(
+            select(RecordingSession)
+            .where(RecordingSession.id.in_(session_ids))
+            .options(undefer(RecordingSession.transcript_json), undefer(RecordingSession.settings_snapshot))
+        ).all()
+        return {
+            row.id: {
+                "audio_path": row.audio_path,
+                "language": row.language,
+                "settings_snapshot": row.settings_snapshot or {},
+                "transcript_json": row.transcript_json,
+            }
+            for row in rows
+        }
+
+
+async def _process_item(
+    item: dict[str, Any] | None,
+    mode: str,
+    batch_settings: dict[str, Any] | None,
+    whisper: asyncio.Semaphore,
+    ollama: asyncio.Semaphore,
+) -> dict[str, Any]:
+    if item is None:
+        raise PipelineError("Sitzung nicht gefunden")
+    session_settings = batch_settings or item["settings_snapshot"]
+    transcription = item["transcript_json"]
+    if mode == "retranscribe":
+        if not item["audio_path"] or not Path(item["audio_path"]).exists():
+            raise PipelineError("Audiodatei fehlt")
+        model_profile = resolve_profile(session_settings.get("transcription_model"))
+        async with whisper:
+            transcription, _ = await transcribe_audio(
+                Path(item["audio_path"]), item["language"], model_profile, use_live_state=False, refresh=True
+            )
+    elif not transcription:
+        raise PipelineError("Kein Transkript vorhanden")
+    async with ollama:
+        summary = await summarize(
+            summary_input(transcription),
+            session_settings,
+            segments=transcription.get("segments"),
+            language=transcription.get("language"),
+        )
+    if summary.get("fallback") in FAILED_FALLBACKS:
+        raise PipelineError("Zusammenfassung fehlgeschlagen")
+    return {"transcription": transcription, "summary": summary, "settings": session_settings}
+
+
+def _commit_results(batch_id: str, outcomes: dict[str, tuple[str, dict[str, Any] | BaseException]]) -> None:
+    with SessionLocal() as db:
+        jobs = {job.id: job for job in db.scalars(select(ProcessingJob).where(ProcessingJob.id.in_(outcomes))).all()}
+        session_ids = [session_id for session_id, _ in outcomes.values()]
+        sessions = {
+            session_obj.id: session_obj
+            for session_obj in db.scalars(
+                select(RecordingSession).where(RecordingSession.id.in_(session_ids))
+            ).all()
+        }
+        completed = failed = 0
+        for job_id, (session_id, outcome) in outcomes.items():
+            job = jobs.get(job_id)
+            if job is None:
+                continue
+            session_obj = sessions.get(session_id)
+            if isinstance(outcome, BaseException) or session_obj is None:
+                job.status = "failed"
+                job.error = str(outcome) if isinstance(outcome, BaseException) else "Sitzung nicht gefunden"
+                failed += 1
+            else:
+                apply_results(db, session_obj, outcome["transcription"], outcome["summary"])
+                session_obj.settings_snapshot = outcome["settings"]
+                job.status = "completed"
+                job.progress = 1.0
+                job.error = None
+                completed += 1
+            job.finished_at = _now()
+        db.execute(
+            update(ProcessingBatch)
+            .where(ProcessingBatch.id == batch_id)
+            .values(
+                completed=ProcessingBatch.completed + completed,
+                failed=ProcessingBatch.failed + failed,
+                updated_at=_now(),
+            )
+        )
+        with timed("db_commit"):
+            db.commit()
+
+
+def _release_batch(batch_id: str) -> dict[str, Any] | None:
+    with SessionLocal() as db:
+        batch = db.get(ProcessingBatch, batch_id)
+        if batch is None:
+            return None
+        remaining = db.scalar(
+            select(ProcessingJob.id)
+            .where(ProcessingJob.batch_id == batch_id, ProcessingJob.status.in_(("queued", "running")))
+            .limit(1)
+        )
+        if remaining is None:
+            batch.status = "completed"
+            batch.finished_at = _now()
+        else:
+            batch.status = "queued"
+        batch.worker = None
+        db.commit()
+        return batch_state(batch)
+
+
+def batch_lock(batch_id: str) -> AdvisoryLock:
+    return AdvisoryLock(f"batch-{batch_id}")
+
+
+async def run_batch(
+    batch_id: str,
+    worker: str,
+    max_items: int | None = None,
+    on_progress: BatchCallback | None = None,
+) -> dict[str, Any] | None:
+    lock = batch_lock(batch_id)
+    if not lock.acquire(blocking=False):
+        return None
+    try:
+        with SessionLocal() as db:
+            batch = db.get(ProcessingBatch, batch_id)
+            if batch is None or batch.status != "running" or batch.worker != worker:
+                return None
+            mode, batch_settings = batch.mode, batch.settings_snapshot
+        return await _run_slices(batch_id, worker, mode, batch_settings, max_items, on_progress)
+    finally:
+        lock.release()
+
+
+async def _run_slices(
+    batch_id: str,
+    worker: str,
+    mode: str,
+    batch_settings: dict[str, Any] | None,
+    max_items: int | None,
+    on_progress: BatchCallback | None,
+) -> dict[str, Any] | None:
+    whisper = asyncio.Semaphore(max(1, settings.backfill_whisper_concurrency))
+    ollama = asyncio.Semaphore(max(1, settings.backfill_ollama_concurrency))
+    slice_size = max(1, settings.backfill_commit_size)
+    processed = 0
+    try:
+        while max_items is None or processed < max_items:
+            claimed = await asyncio.to_thread(_claim_items, batch_id, worker, slice_size)
+            if not claimed:
+                break
+            items = await asyncio.to_thread(_load_items, [session_id for _, session_id in claimed])
+            results = await asyncio.gather(
+                *(_process_item(items.get(session_id), mode, batch_settings, whisper, ollama) for _, session_id in claimed),
+                return_exceptions=True,
+            )
+            outcomes = {
+                job_id: (session_id, result) for (job_id, session_id), result in zip(claimed, results)
+            }
+            await asyncio.to_thread(_commit_results, batch_id, outcomes)
+            processed += len(claimed)
+            if on_progress:
+                with SessionLocal() as db:
+                    batch = db.get(ProcessingBatch, batch_id)
+                    state = batch_state(batch) if batch else None
+                if state:
+                    await on_progress(state)
+    finally:
+        state = await asyncio.to_thread(_release_batch, batch_id)
+    return state
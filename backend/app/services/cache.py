@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+import copy
+import hashlib
+import json
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any
+
+from ..config import get_settings
+from .metrics import CACHE_LOOKUPS
+
+settings = get_settings()
+
+CACHE_DIRNAME = "cache"
+
+
+def cache_key(*parts: Any) -> str:
+    payload = json.dumps(parts, ensure_ascii=False, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+TRANSCRIPT_SETTINGS = (
+    "transcribe_workers",
+    "transcribe_chunk_seconds",
+    "transcribe_chunk_overlap_seconds",
+    "postprocess_min_words",
+    "postprocess_merge_gap_seconds",
+    "postprocess_extra_characters",
+    "diarization",
+    "diarization_max_speakers",
+    "diarization_threshold",
+    "diarization_window_seconds",
+    "diarization_hop_seconds",
+    "diarization_budget_ratio",
+    "diarization_min_budget_seconds",
+    "vad_enabled",
+    "vad_threshold_db",
+    "vad_margin_db",
+    "vad_max_threshold_db",
+    "vad_min_silence_seconds",
+    "vad_padding_seconds",
+)
+
+
+def transcript_cache_key(audio_sha256: str, model: str, language: str | None) -> str:
+    options = {name: getattr(settings, name) for name in TRANSCRIPT_SETTINGS}
+    return cache_key("transcript", audio_sha256, model, language or "auto", options)
+
+
+def summary_cache_key(
+    transcript: str,
+    sections: list[str],
+    session_settings: dict[str, Any],
+    model: str,
+) -> str:
+    return cache_key("summary", transcript, sections, session_settings, model)
+
+
+class ResultCache:
+    def __init__(self, name: str, directory: Path, memory_items: int, max_bytes: int):
+        self.name = name
+        self.directory = directory / name
+        self.memory_items = memory_items
+        self.max_bytes = max_bytes
+        self._memory: OrderedDict[str, dict[str, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_bytes: int | None = None
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.json"
+
+    def get(self, key: str) -> dict[str, Any] | None:
+        with self._lock:
+            value = self._memory.get(key)
+            if value is not None:
+                self._memory.move_to_end(key)
+                CACHE_LOOKUPS.inc(cache=self.name, result="memory")
+                return copy.deepcopy(value)
+        if self.max_bytes <= 0:
+            return None
+        path = self._path(key)
+        try:
+            value = json.loads(path.read_text(encoding="utf-8"))
+            os.utime(path)
+        except (OSError, ValueError):
+            CACHE_LOOKUPS.inc(cache=self.name, result="miss")
+            return None
+        CACHE_LOOKUPS.inc(cache=self.name, result="disk")
+        self._remember(key, value)
+        return copy.deepcopy(value)
+
+    def set(self, key: str, value: dict[str, Any]) -> None:
+        self._remember(key, value)
+        if self.max_bytes <= 0:
+            return
+        path = self._path(key)
+        data = json.dumps(value, ensure_ascii=False).encode("utf-8")
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path = path.with_name(f"{path.name}.{uuid.uuid4().hex}.tmp")
+            temp_path.write_bytes(data)
+            temp_path.replace(path)
+        except OSError:
+            return
+        with self._lock:
+            if self._disk_bytes is not None:
+                self._disk_bytes += len(data)
+        self._evict()
+
+    def _remember(self, key: str, value: dict[str, Any]) -> None:
+        if self.memory_items <= 0:
+            return
+        with self._lock:
+            self._memory[key] = copy.deepcopy(value)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_items:
+                self._memory.popitem(last=False)
+
+    def _evict(self) -> None:
+        with self._lock:
+            if self._disk_bytes is not None and self._disk_bytes <= self.max_bytes:
+                return
+            entries = []
+            for path in self.directory.glob("*/*.json"):
+                try:
+                    stat = path.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+            total = sum(size for _, size, _ in entries)
+            if total > self.max_bytes:
+                target = int(self.max_bytes * 0.9)
+                for _, size, path in sorted(entries):
+                    if total <= target:
+                        break
+                    try:
+                        path.unlink()
+                    except OSError:
+                        continue
+                    self._memory.pop(path.stem, None)
+                    total -= size
+            self._disk_bytes = total
+
+
+def _create_cache(name: str) -> ResultCache:
+    enabled = settings.result_cache
+    return ResultCache(
+        name,
+        settings.storage_dir / CACHE_DIRNAME,
+        memory_items=settings.result_cache_memory_items if enabled else 0,
+        max_bytes=int(settings.result_cache_max_mb * 1024 * 1024) if enabled else 0,
+    )
+
+
+transcript_cache = _create_cache("transcripts")
+summary_cache = _create_cache("summaries")
@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import importlib.util
+import io
+import queue
+import threading
+
+from ..config import get_settings
+from .audio import PCM_SAMPLE_RATE
+
+settings = get_settings()
+
+PCM_FORMAT = "pcm_s16le"
+COMPRESSED_FORMATS = {
+    "webm_opus": ("matroska", ".webm"),
+    "ogg_opus": ("ogg", ".ogg"),
+}
+DECODER_JOIN_TIMEOUT = 30.0
+
+
+def decoder_available() -> bool:
+    return importlib.util.find_spec("av") is not None
+
+
+def supported_formats() -> list[str]:
+    configured = [item.strip() for item in settings.ingest_formats.split(",") if item.strip()]
+    formats = [
+        fmt for fmt in configured if fmt == PCM_FORMAT or (fmt in COMPRESSED_FORMATS and decoder_available())
+    ]
+    return formats if PCM_FORMAT in formats else [*formats, PCM_FORMAT]
+
+
+def negotiate_format(requested: list[str]) -> str:
+    supported = supported_formats()
+    return next((fmt for fmt in requested if fmt in supported), PCM_FORMAT)
+
+
+class DecoderError(Exception):
+    pass
+
+
+class _ChunkReader(io.RawIOBase):
+    def __init__(self) -> None:
+        self._queue: queue.Queue[bytes | None] = queue.Queue()
+        self._buffer = b""
+        self._eof = False
+
+    def readable(self) -> bool:
+        return True
+
+    def put(self, data: bytes | None) -> None:
+        self._queue.put(data)
+
+    def readinto(self, target) -> int:
+        while not self._buffer:
+            if self._eof:
+                return 0
+            chunk = self._queue.get()
+            if chunk is None:
+                self._eof = True
+                return 0
+            self._buffer = chunk
+        size = min(len(target), len(self._buffer))
+        target[:size] = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        return size
+
+
+class StreamDecoder:
+    def __init__(self, fmt: str, skip_bytes: int = 0):
+        self.container_format, _ = COMPRESSED_FORMATS[fmt]
+        self._reader = _ChunkReader()
+        self._lock = threading.Lock()
+        self._output: list[bytes] = []
+        self._skip = skip_bytes
+        self._error: BaseException | None = None
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name=f"decoder-{fmt}", daemon=True)
+        self._thread.start()
+
+    def _emit(self, data: bytes) -> None:
+        if self._skip:
+            dropped = min(self._skip, len(data))
+            self._skip -= dropped
+            data = data[dropped:]
+        if data:
+            with self._lock:
+                self._output.append(data)
+
+    def _run(self) -> None:
+        import av
+
+        try:
+            with av.open(self._reader, mode="r", format=self.container_format) as container:
+                stream = container.streams.audio[0]
+                resampler = av.AudioResampler(format="s16", layout="mono", rate=PCM_SAMPLE_RATE)
+                for packet in container.demux(stream):
+                    for frame in packet.decode():
+                        for resampled in resampler.resample(frame):
+                            self._emit(resampled.to_ndarray().tobytes())
+                for resampled in resampler.resample(None):
+                    self._emit(resampled.to_ndarray().tobytes())
+        except Exception as exc:
+            self._error = exc
+
+    def _check(self) -> None:
+        if self._error is not None and not isinstance(self._error, EOFError):
+            raise DecoderError(f"Audiostrom konnte nicht dekodiert werden: {self._error}")
+
+    def feed(self, data: bytes) -> None:
+        if data and not self._closed:
+            self._reader.put(data)
+
+    def _take(self) -> bytes:
+        with self._lock:
+            data = b"".join(self._output)
+            self._output.clear()
+        return data
+
+    def read(self) -> bytes:
+        data = self._take()
+        if not data:
+            self._check()
+        return data
+
+    def close(self) -> bytes:
+        if not self._closed:
+            self._closed = True
+            self._reader.put(None)
+            self._thread.join(DECODER_JOIN_TIMEOUT)
+        return self._take()
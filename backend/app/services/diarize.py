@@ -0,0 +1,322 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache
+from typing import Any, Callable
+
+import numpy as np
+
+from ..config import get_settings
+from .audio import WHISPER_SAMPLE_RATE
+from .vad import detect_speech
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+FRAME_SAMPLES = 400
+HOP_SAMPLES = 160
+FFT_SIZE = 1024
+MEL_BANDS = 40
+CEPSTRA = 20
+PITCH_LAGS = (40, 230)
+VOICING_THRESHOLD = 0.45
+PITCH_WEIGHT = 3.0
+BLOCK_FRAMES = 4000
+MICRO_CLUSTERS = 32
+KMEANS_ITERATIONS = 12
+MIN_SPEECH_FRACTION = 0.5
+MIN_SPEAKER_SHARE = 0.04
+STABLE_QUANTILE = 0.8
+PRIOR_POINTS = 2.0
+SIZE_PENALTY = 1.0
+SPEAKER_LABEL = "Sprecher {index}"
+
+_pool: ThreadPoolExecutor | None = None
+_pool_lock = threading.Lock()
+
+
+class DiarizationCancelled(Exception):
+    pass
+
+
+def speaker_label(index: int) -> str:
+    return SPEAKER_LABEL.format(index=index + 1)
+
+
+@lru_cache(maxsize=1)
+def _mel_filterbank() -> np.ndarray:
+    def _mel(hz: np.ndarray) -> np.ndarray:
+        return 2595.0 * np.log10(1.0 + hz / 700.0)
+
+    points = 700.0 * (10 ** (np.linspace(_mel(np.array(60.0)), _mel(np.array(7600.0)), MEL_BANDS + 2) / 2595.0) - 1)
+    bins = np.fft.rfftfreq(FFT_SIZE, 1.0 / WHISPER_SAMPLE_RATE)
+    lower, center, upper = points[:-2, None], points[1:-1, None], points[2:, None]
+    rising = (bins - lower) / (center - lower)
+    falling = (upper - bins) / (upper - center)
+    return np.maximum(0.0, np.minimum(rising, falling)).astype(np.float32)
+
+
+@lru_cache(maxsize=1)
+def _dct_matrix() -> np.ndarray:
+    n = np.arange(MEL_BANDS)
+    k = np.arange(1, CEPSTRA + 1)[:, None]
+    return (np.cos(np.pi * k * (2 * n + 1) / (2 * MEL_BANDS)) * np.sqrt(2.0 / MEL_BANDS)).astype(np.float32)
+
+
+@lru_cache(maxsize=1)
+def _window() -> tuple[np.ndarray, np.ndarray]:
+    window = np.hanning(FRAME_SAMPLES).astype(np.float32)
+    correlation = np.fft.irfft(np.abs(np.fft.rfft(window, n=FFT_SIZE)) ** 2, n=FFT_SIZE)
+    return window, (correlation / correlation[0])[PITCH_LAGS[0]:PITCH_LAGS[1]].astype(np.float32)
+
+
+def _check(cancel: threading.Event | None) -> None:
+    if cancel is not None and cancel.is_set():
+        raise DiarizationCancelled()
+
+
+def frame_features(audio: np.ndarray, cancel: threading.Event | None = None) -> np.ndarray:
+    count = max(0, (audio.size - FRAME_SAMPLES) // HOP_SAMPLES + 1)
+    features = np.empty((count, CEPSTRA + 2), dtype=np.float32)
+    window, window_correlation = _window()
+    projection = _mel_filterbank().T
+    dct = _dct_matrix().T
+    lo, hi = PITCH_LAGS
+    for first in range(0, count, BLOCK_FRAMES):
+        _check(cancel)
+        last = min(count, first + BLOCK_FRAMES)
+        block = audio[first * HOP_SAMPLES:(last - 1) * HOP_SAMPLES + FRAME_SAMPLES]
+        frames = np.lib.stride_tricks.sliding_window_view(block, FRAME_SAMPLES)[::HOP_SAMPLES] * window
+        power = (np.abs(np.fft.rfft(frames, n=FFT_SIZE)) ** 2).astype(np.float32)
+        features[first:last, :CEPSTRA] = np.log(power @ projection + 1e-8) @ dct
+        correlation = np.fft.irfft(power, n=FFT_SIZE)[:, :hi].astype(np.float32)
+        normalized = correlation[:, lo:] / (correlation[:, :1] + 1e-9) / window_correlation
+        lag = np.argmax(normalized, axis=1)
+        voiced = normalized[np.arange(lag.size), lag] > VOICING_THRESHOLD
+        features[first:last, CEPSTRA] = np.log(WHISPER_SAMPLE_RATE / (lag + lo)) * voiced
+        features[first:last, CEPSTRA + 1] = voiced
+    return features
+
+
+def _speech_mask(audio: np.ndarray, frames: int) -> np.ndarray:
+    mask = np.zeros(frames + 1, dtype=np.int32)
+    for start, end in detect_speech(audio):
+        mask[min(frames, start // HOP_SAMPLES)] += 1
+        mask[min(frames, end // HOP_SAMPLES)] -= 1
+    return np.cumsum(mask[:-1]) > 0
+
+
+def _window_sums(values: np.ndarray, starts: np.ndarray, size: int) -> np.ndarray:
+    total = np.concatenate((np.zeros((1,) + values.shape[1:]), np.cumsum(values, axis=0, dtype=np.float64)))
+    return total[starts + size] - total[starts]
+
+
+def window_embeddings(
+    audio: np.ndarray, cancel: threading.Event | None = None
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    features = frame_features(audio, cancel)
+    frame_seconds = HOP_SAMPLES / WHISPER_SAMPLE_RATE
+    size = max(1, int(settings.diarization_window_seconds / frame_seconds))
+    hop = max(1, int(settings.diarization_hop_seconds / frame_seconds))
+    empty = np.zeros(0), np.zeros((0, 2 * CEPSTRA + 1), dtype=np.float32), np.zeros(0, dtype=bool)
+    if features.shape[0] < size:
+        return empty
+    _check(cancel)
+    mask = _speech_mask(audio, features.shape[0])
+    starts = np.arange(0, features.shape[0] - size + 1, hop)
+    frames = _window_sums(mask, starts, size)
+    keep = frames >= MIN_SPEECH_FRACTION * size
+    if not keep.any():
+        return empty
+    starts, frames = starts[keep], frames[keep][:, None]
+    cepstra = (features[:, :CEPSTRA] - features[mask, :CEPSTRA].mean(axis=0)) * mask[:, None]
+    mean = _window_sums(cepstra, starts, size) / frames
+    spread = np.sqrt(np.maximum(_window_sums(cepstra**2, starts, size) / frames - mean**2, 0.0))
+    voiced = features[:, CEPSTRA + 1] * mask
+    log_pitch = features[:, CEPSTRA] * mask
+    pitch_frames = _window_sums(voiced, starts, size)
+    pitch = _window_sums(log_pitch, starts, size) / np.maximum(pitch_frames, 1.0)
+    half = size // 2
+    head_frames = _window_sums(voiced, starts, half)
+    tail_frames = _window_sums(voiced, starts + size - half, half)
+    drift = np.abs(
+        _window_sums(log_pitch, starts, half) / np.maximum(head_frames, 1.0)
+        - _window_sums(log_pitch, starts + size - half, half) / np.maximum(tail_frames, 1.0)
+    )
+    drift[(head_frames == 0) | (tail_frames == 0)] = 0.0
+    voiced_windows = pitch_frames > 0
+    if voiced_windows.any():
+        pitch[~voiced_windows] = np.median(pitch[voiced_windows])
+        stable = drift <= np.quantile(drift[voiced_windows], STABLE_QUANTILE)
+    else:
+        stable = np.ones(pitch.size, dtype=bool)
+    embeddings = np.hstack((mean, spread, pitch[:, None]))
+    embeddings = (embeddings - embeddings.mean(axis=0)) / (embeddings.std(axis=0) + 1e-6)
+    embeddings[:, -1] *= PITCH_WEIGHT
+    centers = (starts + size / 2) * frame_seconds
+    return centers, embeddings.astype(np.float32), stable
+
+
+def _kmeans(points: np.ndarray, k: int, rng: np.random.Generator) -> np.ndarray:
+    chosen = [int(rng.integers(points.shape[0]))]
+    distance = ((points - points[chosen[0]]) ** 2).sum(axis=1)
+    for _ in range(1, k):
+        chosen.append(int(np.argmax(distance)))
+        distance = np.minimum(distance, ((points - points[chosen[-1]]) ** 2).sum(axis=1))
+    centroids = points[chosen]
+    for _ in range(KMEANS_ITERATIONS):
+        labels = _nearest(points, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, points)
+        sizes = np.bincount(labels, minlength=k)[:, None]
+        centroids = np.where(sizes > 0, sums / np.maximum(sizes, 1), centroids)
+    return _nearest(points, centroids)
+
+
+def _nearest(points: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    distance = (centroids**2).sum(axis=1)[None, :] - 2.0 * points @ centroids.T
+    return np.argmin(distance, axis=1)
+
+
+def cluster(
+    embeddings: np.ndarray, stable: np.ndarray | None = None, cancel: threading.Event | None = None
+) -> np.ndarray:
+    if embeddings.shape[0] == 0:
+        return np.zeros(0, dtype=np.int64)
+    points = embeddings.astype(np.float64)
+    if stable is not None and stable.any():
+        points = points[stable]
+    labels = _kmeans(points, min(MICRO_CLUSTERS, points.shape[0]), np.random.default_rng(0))
+    k = int(labels.max()) + 1
+    count = np.bincount(labels, minlength=k).astype(np.float64)
+    first = np.zeros((k, points.shape[1]))
+    second = np.zeros((k, points.shape[1], points.shape[1]))
+    np.add.at(first, labels, points)
+    np.add.at(second, labels, points[:, :, None] * points[:, None, :])
+    alive = count > 0
+    max_speakers = max(1, settings.diarization_max_speakers)
+    while alive.sum() > 1:
+        _check(cancel)
+        index = np.flatnonzero(alive)
+        centroid = first[index] / count[index][:, None]
+        scatter = second[index] - count[index][:, None, None] * centroid[:, :, None] * centroid[:, None, :]
+        direction = centroid[:, None] - centroid[None]
+        distance = np.linalg.norm(direction, axis=-1)
+        np.fill_diagonal(distance, 1.0)
+        direction /= distance[..., None]
+        spread = np.einsum("ijd,ide,ije->ij", direction, scatter, direction)
+        spread = (spread + spread.T + PRIOR_POINTS) / (count[index][:, None] + count[index][None, :] + PRIOR_POINTS)
+        smaller = np.minimum(count[index][:, None], count[index][None, :])
+        separation = distance / np.sqrt(np.maximum(spread, 1e-9)) / (1.0 + SIZE_PENALTY / np.sqrt(smaller))
+        np.fill_diagonal(separation, np.inf)
+        a, b = np.unravel_index(int(np.argmin(separation)), separation.shape)
+        if separation[a, b] > settings.diarization_threshold and index.size <= max_speakers:
+            break
+        keep, drop = index[min(a, b)], index[max(a, b)]
+        count[keep] += count[drop]
+        first[keep] += first[drop]
+        second[keep] += second[drop]
+        alive[drop] = False
+    alive &= (count >= MIN_SPEAKER_SHARE * count.sum()) | (count == count.max())
+    index = np.flatnonzero(alive)
+    labels = _nearest(embeddings.astype(np.float64), first[index] / count[index][:, None])
+    if labels.size > 2:
+        inner = labels[1:-1]
+        flip = (labels[:-2] == labels[2:]) & (inner != labels[:-2])
+        inner[flip] = labels[:-2][flip]
+    _, first_seen = np.unique(labels, return_index=True)
+    appearance = labels[np.sort(first_seen)]
+    ranks = np.zeros(index.size, dtype=np.int64)
+    ranks[appearance] = np.arange(appearance.size)
+    return ranks[labels]
+
+
+def diarize(audio: np.ndarray, cancel: threading.Event | None = None) -> tuple[np.ndarray, np.ndarray]:
+    centers, embeddings, stable = window_embeddings(audio, cancel)
+    return centers, cluster(embeddings, stable, cancel)
+
+
+def speaker_turns(centers: np.ndarray, labels: np.ndarray) -> list[dict[str, Any]]:
+    if labels.size == 0:
+        return []
+    half = settings.diarization_hop_seconds / 2
+    changes = np.flatnonzero(np.diff(labels)) + 1
+    firsts = np.concatenate(([0], changes))
+    lasts = np.concatenate((changes, [labels.size])) - 1
+    return [
+        {
+            "start": round(max(0.0, float(centers[first]) - half), 2),
+            "end": round(float(centers[last]) + half, 2),
+            "speaker": speaker_label(int(labels[first])),
+        }
+        for first, last in zip(firsts.tolist(), lasts.tolist())
+    ]
+
+
+def assign_speakers(segments: list[dict[str, Any]], centers: np.ndarray, labels: np.ndarray) -> None:
+    if not segments or labels.size == 0:
+        return
+    starts = np.array([segment["start"] for segment in segments], dtype=np.float64)
+    ends = np.array([segment["end"] for segment in segments], dtype=np.float64)
+    onehot = np.zeros((labels.size + 1, int(labels.max()) + 1), dtype=np.int32)
+    onehot[np.arange(1, labels.size + 1), labels] = 1
+    votes = np.cumsum(onehot, axis=0)
+    lo = np.searchsorted(centers, starts, side="left")
+    hi = np.searchsorted(centers, ends, side="right")
+    counts = votes[hi] - votes[lo]
+    middle = (starts + ends) / 2
+    after = np.minimum(np.searchsorted(centers, middle), centers.size - 1)
+    before = np.maximum(after - 1, 0)
+    nearest = np.where(np.abs(centers[before] - middle) < np.abs(centers[after] - middle), before, after)
+    chosen = np.where(counts.sum(axis=1) > 0, np.argmax(counts, axis=1), labels[nearest])
+    for segment, speaker in zip(segments, chosen.tolist()):
+        segment["speaker"] = speaker_label(speaker)
+
+
+def _get_pool() -> ThreadPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=max(1, settings.inference_concurrency), thread_name_prefix="diarize")
+        return _pool
+
+
+def _run(load_audio: Callable[[], np.ndarray], cancel: threading.Event) -> tuple[np.ndarray, np.ndarray, float]:
+    started = time.perf_counter()
+    centers, labels = diarize(load_audio(), cancel)
+    return centers, labels, time.perf_counter() - started
+
+
+def submit_diarization(load_audio: Callable[[], np.ndarray]) -> tuple[Future, threading.Event]:
+    cancel = threading.Event()
+    return _get_pool().submit(_run, load_audio, cancel), cancel
+
+
+def diarization_budget(transcription_seconds: float) -> float:
+    return max(settings.diarization_min_budget_seconds, settings.diarization_budget_ratio * transcription_seconds)
+
+
+def finish_diarization(
+    job: tuple[Future, threading.Event], segments: list[dict[str, Any]], transcription_seconds: float
+) -> dict[str, Any]:
+    future, cancel = job
+    budget = diarization_budget(transcription_seconds)
+    try:
+        centers, labels, seconds = future.result(timeout=budget)
+    except TimeoutError:
+        cancel.set()
+        logger.warning("Sprechererkennung nach %.1f s Wartezeit abgebrochen", budget)
+        return {"status": "uebersprungen", "budget_seconds": round(budget, 3)}
+    except Exception:
+        logger.exception("Sprechererkennung fehlgeschlagen")
+        return {"status": "fehler"}
+    assign_speakers(segments, centers, labels)
+    return {
+        "status": "ok",
+        "speakers": int(labels.max()) + 1 if labels.size else 0,
+        "seconds": round(seconds, 3),
+        "turns": speaker_turns(centers, labels),
+    }
@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import secrets
+import threading
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Connection, Listener
+from pathlib import Path
+from typing import Any, Callable, Union
+
+from ..config import get_settings
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+Address = Union[str, tuple[str, int]]
+
+INSECURE_AUTHKEYS = {"", "protocolito", "change-me"}
+WILDCARD_HOSTS = {"", "0.0.0.0", "::"}
+
+_idle: list[Connection] = []
+_idle_lock = threading.Lock()
+
+
+class InferenceError(RuntimeError):
+    pass
+
+
+def inference_enabled() -> bool:
+    return bool(settings.inference_address.strip())
+
+
+def parse_address(address: str) -> Address:
+    address = address.strip()
+    if address.startswith("unix:"):
+        return address[len("unix:"):]
+    host, _, port = address.rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+
+def _family(address: Address) -> str:
+    return "AF_UNIX" if isinstance(address, str) else "AF_INET"
+
+
+def _configured_authkey() -> str:
+    authkey = settings.inference_authkey.strip()
+    if authkey or not settings.inference_authkey_file:
+        return authkey
+    try:
+        return Path(settings.inference_authkey_file).read_text(encoding="utf-8").strip()
+    except OSError:
+        return ""
+
+
+def ensure_authkey_file() -> None:
+    if settings.inference_authkey.strip() or not settings.inference_authkey_file:
+        return
+    path = Path(settings.inference_authkey_file)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if path.exists():
+        return
+    temp_path = path.with_name(f".{path.name}.{os.getpid()}")
+    fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(secrets.token_hex(32))
+    try:
+        os.link(temp_path, path)
+        logger.info("Neuer Inferenz-Schluessel in %s erzeugt", path)
+    except FileExistsError:
+        pass
+    finally:
+        temp_path.unlink(missing_ok=True)
+
+
+def require_authkey() -> bytes:
+    authkey = _configured_authkey()
+    if authkey in INSECURE_AUTHKEYS:
+        raise InferenceError(
+            "INFERENCE_AUTHKEY muss auf einen eigenen geheimen Wert gesetzt sein (oder INFERENCE_AUTHKEY_FILE)"
+        )
+    return authkey.encode("utf-8")
+
+
+def _connect() -> Connection:
+    address = parse_address(settings.inference_address)
+    try:
+        return Client(address, family=_family(address), authkey=require_authkey())
+    except Exception as exc:
+        raise InferenceError(f"Inferenzdienst nicht erreichbar: {exc}") from exc
+
+
+def call(method: str, *args: Any, timeout: float | None = None, **kwargs: Any) -> Any:
+    with _idle_lock:
+        connection = _idle.pop() if _idle else None
+    for attempt in range(2):
+        fresh = connection is None
+        if connection is None:
+            connection = _connect()
+        try:
+            connection.send((method, args, kwargs))
+            if timeout is not None and not connection.poll(timeout):
+                connection.close()
+                raise InferenceError("Inferenzdienst antwortet nicht")
+            ok, payload = connection.recv()
+        except (EOFError, OSError) as exc:
+            connection.close()
+            connection = None
+            if fresh or attempt:
+                raise InferenceError(f"Verbindung zum Inferenzdienst abgebrochen: {exc}") from exc
+            continue
+        with _idle_lock:
+            _idle.append(connection)
+        if ok:
+            return payload
+        kind, message = payload
+        raise (ValueError if kind == "ValueError" else InferenceError)(message)
+
+
+async def remote_call(method: str, *args: Any, **kwargs: Any) -> Any:
+    return await asyncio.to_thread(call, method, *args, **kwargs)
+
+
+def close_connections() -> None:
+    with _idle_lock:
+        connections = list(_idle)
+        _idle.clear()
+    for connection in connections:
+        connection.close()
+
+
+def _handle(connection: Connection, handlers: dict[str, Callable[..., Any]], slots: threading.Semaphore) -> None:
+    with connection:
+        while True:
+            try:
+                method, args, kwargs = connection.recv()
+            except (EOFError, OSError):
+                return
+            try:
+                handler = handlers.get(method)
+                if handler is None:
+                    raise InferenceError(f"Unbekannte Methode: {method}")
+                if method == "model_status":
+                    reply = (True, handler())
+                else:
+                    with slots:
+                        reply = (True, handler(*args, **kwargs))
+            except Exception as exc:
+                logger.exception("Inferenzaufruf %s fehlgeschlagen", method)
+                reply = (False, (type(exc).__name__, str(exc)))
+            try:
+                connection.send(reply)
+            except (EOFError, OSError):
+                return
+
+
+def serve(handlers: dict[str, Callable[..., Any]], address: str | None = None) -> None:
+    parsed = parse_address(address or settings.inference_address)
+    ensure_authkey_file()
+    authkey = require_authkey()
+    if isinstance(parsed, str):
+        Path(parsed).unlink(missing_ok=True)
+    elif parsed[0] in WILDCARD_HOSTS:
+        logger.warning("Inferenzdienst lauscht auf allen Schnittstellen; nur in abgeschotteten Netzen verwenden")
+    slots = threading.BoundedSemaphore(max(1, settings.inference_concurrency))
+    with Listener(parsed, family=_family(parsed), authkey=authkey) as listener:
+        logger.info("Inferenzdienst lauscht auf %s", parsed)
+        while True:
+            try:
+                connection = listener.accept()
+            except (AuthenticationError, EOFError, OSError) as exc:
+                logger.warning("Verbindung zum Inferenzdienst abgelehnt: %s", exc)
+                continue
+            threading.Thread(target=_handle, args=(connection, handlers, slots), daemon=True).start()
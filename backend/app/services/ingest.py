@@ -0,0 +1,272 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+from pathlib import Path
+from typing import Any
+
+from ..config import get_settings
+from .audio import PCM_SAMPLE_RATE, PCM_SAMPLE_WIDTH, AudioIngest, pcm_sample_rate
+from .decoder import COMPRESSED_FORMATS, PCM_FORMAT, StreamDecoder
+from .locks import FileLock
+from .metrics import timed
+
+settings = get_settings()
+
+INGEST_STATE_FILENAME = "ingest_state.json"
+INGEST_LOCK_FILENAME = "ingest.lock"
+TAKEOVER_FILENAME = "ingest.takeover"
+TAKEOVER_POLL_SECONDS = 0.1
+TAKEOVER_WATCH_SECONDS = 0.5
+FRAME_HEADER_SIZE = 8
+
+_streams: dict[str, tuple[Any, "IngestWriter"]] = {}
+
+
+class IngestGapError(Exception):
+    def __init__(self, expected: int):
+        super().__init__("Luecke im Audiostrom")
+        self.expected = expected
+
+
+class StreamBusyError(Exception):
+    pass
+
+
+def parse_frame(frame: bytes) -> tuple[int, bytes]:
+    if len(frame) < FRAME_HEADER_SIZE:
+        raise ValueError("Ungueltiger Audioframe")
+    return int.from_bytes(frame[:FRAME_HEADER_SIZE], "little"), frame[FRAME_HEADER_SIZE:]
+
+
+class IngestWriter:
+    def __init__(self, path: Path, fmt: str = PCM_FORMAT, lock: FileLock | None = None):
+        self.path = path
+        self.format = fmt
+        self.lock = lock
+        self.state_path = path.parent / INGEST_STATE_FILENAME
+        self.source_path = path.with_suffix(COMPRESSED_FORMATS[fmt][1]) if fmt in COMPRESSED_FORMATS else None
+        self.stored_bytes = path.stat().st_size if path.exists() else 0
+        self.decoded_bytes = 0
+        self._decoder: StreamDecoder | None = None
+        self.committed_bytes = self._load_committed()
+        self.received_bytes = self.committed_bytes
+        self._ingest: AudioIngest | None = None
+        self._closed = False
+        self._io_lock = asyncio.Lock()
+        self._inflight: asyncio.Future | None = None
+        self._close_task: asyncio.Future | None = None
+        self._pending: list[bytes] = []
+        self._pending_size = 0
+        self._last_flush = time.monotonic()
+        self._acked_bytes = self.received_bytes
+        self._last_ack = time.monotonic()
+
+    def _load_committed(self) -> int:
+        try:
+            state = json.loads(self.state_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            state = {}
+        if state.get("format", PCM_FORMAT) != self.format and (self.stored_bytes or state.get("offset")):
+            raise ValueError("Audioformat passt nicht zur laufenden Aufnahme")
+        ratio = PCM_SAMPLE_RATE // pcm_sample_rate(self.path)
+        derived = (self.stored_bytes // PCM_SAMPLE_WIDTH) * ratio * PCM_SAMPLE_WIDTH
+        if self.source_path is not None:
+            consistent = state.get("stored") == self.stored_bytes
+            self.decoded_bytes = int(state.get("decoded", derived)) if consistent else derived
+            return self.source_path.stat().st_size if self.source_path.exists() else 0
+        if state.get("stored") == self.stored_bytes and "offset" in state:
+            return int(state["offset"])
+        return derived
+
+    def _write_state(self) -> None:
+        temp_path = self.state_path.with_suffix(".tmp")
+        temp_path.write_text(
+            json.dumps(
+                {
+                    "offset": self.committed_bytes,
+                    "stored": self.stored_bytes,
+                    "format": self.format,
+                    "decoded": self.decoded_bytes,
+                }
+            ),
+            encoding="utf-8",
+        )
+        temp_path.replace(self.state_path)
+
+    def _open_sync(self) -> AudioIngest:
+        if self.source_path is not None:
+            self._decoder = StreamDecoder(self.format, skip_bytes=self.decoded_bytes)
+            if self.committed_bytes:
+                with self.source_path.open("rb") as f:
+                    for block in iter(lambda: f.read(1 << 20), b""):
+                        self._decoder.feed(block)
+        return AudioIngest(self.path)
+
+    async def open(self) -> None:
+        self._ingest = await asyncio.to_thread(self._open_sync)
+
+    def accept(self, offset: int, data: bytes) -> bytes:
+        if offset > self.received_bytes:
+            raise IngestGapError(self.received_bytes)
+        skip = self.received_bytes - offset
+        return data[skip:] if skip < len(data) else b""
+
+    async def write(self, data: bytes) -> bool:
+        if self._closed or not data:
+            return False
+        self._pending.append(data)
+        self._pending_size += len(data)
+        self.received_bytes += len(data)
+        if (
+            self._pending_size >= settings.ingest_flush_bytes
+            or time.monotonic() - self._last_flush >= settings.ingest_flush_interval
+        ):
+            await self.flush()
+            return True
+        return False
+
+    def _store(self, ingest: AudioIngest, pcm: bytes) -> None:
+        self.decoded_bytes += len(pcm)
+        self.stored_bytes += ingest.write(pcm)
+
+    def _flush_sync(self, ingest: AudioIngest, blob: bytes, committed: int) -> None:
+        if self._decoder is not None:
+            with self.source_path.open("ab") as f:
+                f.write(blob)
+            self._decoder.feed(blob)
+            blob = self._decoder.read()
+        self._store(ingest, blob)
+        self.committed_bytes = committed
+        self._write_state()
+
+    async def _run_io(self, func: Any, *args: Any) -> None:
+        # The worker thread keeps running when the awaiting task is cancelled,
+        # so the future is kept and shielded until close() has waited for it.
+        self._inflight = asyncio.ensure_future(asyncio.to_thread(func, *args))
+        await asyncio.shield(self._inflight)
+
+    async def _wait_inflight(self) -> None:
+        inflight, self._inflight = self._inflight, None
+        if inflight is None:
+            return
+        try:
+            await inflight
+        except Exception:
+            pass
+
+    async def _flush_locked(self) -> None:
+        self._last_flush = time.monotonic()
+        if not self._pending or self._ingest is None:
+            return
+        blob = b"".join(self._pending)
+        self._pending.clear()
+        self._pending_size = 0
+        with timed("ingest_flush"):
+            await self._run_io(self._flush_sync, self._ingest, blob, self.received_bytes)
+
+    async def flush(self) -> None:
+        async with self._io_lock:
+            await self._wait_inflight()
+            await self._flush_locked()
+
+    def _close_sync(self, ingest: AudioIngest) -> None:
+        try:
+            if self._decoder is not None:
+                decoder, self._decoder = self._decoder, None
+                self._store(ingest, decoder.close())
+            self.stored_bytes += ingest.close()
+            self._write_state()
+        finally:
+            if self.lock is not None:
+                self.lock.release()
+
+    async def _close(self) -> None:
+        async with self._io_lock:
+            try:
+                await self._wait_inflight()
+                await self._flush_locked()
+            finally:
+                await self._wait_inflight()
+                if self._ingest is not None:
+                    ingest, self._ingest = self._ingest, None
+                    await asyncio.to_thread(self._close_sync, ingest)
+                elif self.lock is not None:
+                    self.lock.release()
+                self._pending.clear()
+                self._pending_size = 0
+                self.received_bytes = self.committed_bytes
+
+    async def close(self) -> None:
+        if self._close_task is None:
+            self._closed = True
+            self._close_task = asyncio.ensure_future(self._close())
+        await asyncio.shield(self._close_task)
+
+    def ack_due(self) -> bool:
+        if settings.ingest_ack_bytes <= 0:
+            return True
+        if self.received_bytes - self._acked_bytes >= settings.ingest_ack_bytes:
+            return True
+        return time.monotonic() - self._last_ack >= settings.ingest_ack_interval
+
+    def ack(self) -> dict[str, int | bool]:
+        self._acked_bytes = self.received_bytes
+        self._last_ack = time.monotonic()
+        return {
+            "ok": True,
+            "bytes": self.received_bytes,
+            "committed": self.committed_bytes,
+            "stored": self.stored_bytes,
+        }
+
+
+async def acquire_ingest_lock(session_dir: Path) -> FileLock:
+    lock = FileLock(session_dir / INGEST_LOCK_FILENAME)
+    marker = session_dir / TAKEOVER_FILENAME
+    if lock.acquire(blocking=False):
+        marker.unlink(missing_ok=True)
+        return lock
+    marker.touch()
+    deadline = time.monotonic() + settings.ingest_takeover_timeout
+    try:
+        while time.monotonic() < deadline:
+            await asyncio.sleep(TAKEOVER_POLL_SECONDS)
+            if lock.acquire(blocking=False):
+                return lock
+    finally:
+        marker.unlink(missing_ok=True)
+    lock.release()
+    raise StreamBusyError("Aufnahme wird bereits von einer anderen Verbindung geschrieben")
+
+
+async def watch_takeover(session_id: str, session_dir: Path) -> None:
+    marker = session_dir / TAKEOVER_FILENAME
+    while not marker.exists():
+        await asyncio.sleep(TAKEOVER_WATCH_SECONDS)
+    await take_over_stream(session_id)
+
+
+async def take_over_stream(session_id: str) -> None:
+    previous = _streams.pop(session_id, None)
+    if previous is None:
+        return
+    websocket, writer = previous
+    await writer.close()
+    try:
+        await websocket.close(code=4409)
+    except Exception:
+        pass
+
+
+def register_stream(session_id: str, websocket: Any, writer: IngestWriter) -> None:
+    _streams[session_id] = (websocket, writer)
+
+
+def release_stream(session_id: str, websocket: Any) -> bool:
+    current = _streams.get(session_id)
+    if current is None or current[0] is not websocket:
+        return False
+    del _streams[session_id]
+    return True
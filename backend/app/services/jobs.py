@@ -0,0 +1,383 @@
+from __future__ import annotations
+
+import asyncio
+import datetime as dt
+import multiprocessing
+import os
+import time
+import uuid
+from typing import Any
+
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from ..config import get_settings
+from ..database import SessionLocal
+from ..models import ProcessingBatch, ProcessingJob, RecordingSession
+from .audio import purge_expired_pcm
+from .backfill import batch_lock, run_batch
+from .inference import inference_enabled
+from .locks import AdvisoryLock
+from .metrics import STAGE_SECONDS, reset_snapshots, write_snapshot
+from .pipeline import run_finalize
+from .summarizer import close_http_client
+from .transcribe import configured_profiles, preload_models, shutdown_chunk_pool
+
+settings = get_settings()
+
+ACTIVE_STATUSES = ("queued", "running")
+OPEN_SESSION_STATUSES = ("recording", "queued", "processing")
+RUNNER_LOCK = "job-runners"
+
+_processes: list[Any] = []
+_stop_event: Any = None
+_runner_lock: AdvisoryLock | None = None
+
+
+class QueueFullError(Exception):
+    pass
+
+
+def _now() -> dt.datetime:
+    return dt.datetime.utcnow()
+
+
+async def queue_depth(db: AsyncSession) -> int:
+    return await db.scalar(
+        select(func.count())
+        .select_from(ProcessingJob)
+        .where(ProcessingJob.status.in_(ACTIVE_STATUSES), ProcessingJob.batch_id.is_(None))
+    ) or 0
+
+
+async def active_job(db: AsyncSession, session_id: str) -> ProcessingJob | None:
+    return (
+        await db.scalars(
+            select(ProcessingJob)
+            .where(
+                ProcessingJob.session_id == session_id,
+                ProcessingJob.status.in_(ACTIVE_STATUSES),
+            )
+            .order_by(ProcessingJob.created_at.desc())
+        )
+    ).first()
+
+
+async def enqueue_job(db: AsyncSession, session_id: str, kind: str = "finalize") -> ProcessingJob:
+    existing = await active_job(db, session_id)
+    if existing:
+        return existing
+    if await queue_depth(db) >= settings.job_queue_limit:
+        raise QueueFullError("Warteschlange ist voll")
+    job = ProcessingJob(id=str(uuid.uuid4()), session_id=session_id, kind=kind, status="queued")
+    db.add(job)
+    session_obj = await db.get(RecordingSession, session_id)
+    if session_obj:
+        session_obj.status = "queued"
+        db.add(session_obj)
+    await db.commit()
+    await db.refresh(job)
+    return job
+
+
+def claim_next_job(db: Session, worker: str) -> ProcessingJob | None:
+    candidates = db.scalars(
+        select(ProcessingJob.id)
+        .where(ProcessingJob.status == "queued", ProcessingJob.batch_id.is_(None))
+        .order_by(ProcessingJob.created_at)
+        .limit(5)
+    ).all()
+    for job_id in candidates:
+        result = db.execute(
+            update(ProcessingJob)
+            .where(ProcessingJob.id == job_id, ProcessingJob.status == "queued")
+            .values(
+                status="running",
+                worker=worker,
+                started_at=_now(),
+                updated_at=_now(),
+                attempts=ProcessingJob.attempts + 1,
+            )
+        )
+        db.commit()
+        if result.rowcount == 1:
+            return db.get(ProcessingJob, job_id)
+    return None
+
+
+def enqueue_batch(
+    db: Session,
+    mode: str,
+    filters: dict[str, Any],
+    settings_snapshot: dict[str, Any] | None = None,
+    worker: str | None = None,
+) -> ProcessingBatch | None:
+    busy = select(ProcessingJob.session_id).where(ProcessingJob.status.in_(ACTIVE_STATUSES))
+    query = select(RecordingSession.id).where(
+        RecordingSession.id.not_in(busy), RecordingSession.status.not_in(OPEN_SESSION_STATUSES)
+    )
+    if filters.get("session_ids"):
+        query = query.where(RecordingSession.id.in_(filters["session_ids"]))
+    if filters.get("status"):
+        query = query.where(RecordingSession.status == filters["status"])
+    if filters.get("created_from"):
+        query = query.where(RecordingSession.created_at >= filters["created_from"])
+    if filters.get("created_to"):
+        query = query.where(RecordingSession.created_at < filters["created_to"])
+    query = query.order_by(RecordingSession.created_at, RecordingSession.id)
+    if filters.get("limit"):
+        query = query.limit(filters["limit"])
+    session_ids = db.scalars(query).all()
+    if not session_ids:
+        return None
+    batch = ProcessingBatch(
+        id=str(uuid.uuid4()),
+        mode=mode,
+        status="running" if worker else "queued",
+        worker=worker,
+        filters={key: (value.isoformat() if isinstance(value, dt.datetime) else value) for key, value in filters.items()},
+        settings_snapshot=settings_snapshot,
+        total=len(session_ids),
+    )
+    db.add(batch)
+    now = _now()
+    db.execute(
+        insert(ProcessingJob),
+        [
+            {
+                "id": str(uuid.uuid4()),
+                "session_id": session_id,
+                "kind": mode,
+                "status": "queued",
+                "progress": 0.0,
+                "attempts": 0,
+                "batch_id": batch.id,
+                "created_at": now,
+                "updated_at": now,
+            }
+            for session_id in session_ids
+        ],
+    )
+    db.commit()
+    db.refresh(batch)
+    return batch
+
+
+def claim_next_batch(db: Session, worker: str, batch_id: str | None = None) -> str | None:
+    query = select(ProcessingBatch.id).where(ProcessingBatch.status == "queued")
+    if batch_id:
+        query = query.where(ProcessingBatch.id == batch_id)
+    for candidate in db.scalars(query.order_by(ProcessingBatch.created_at).limit(5)).all():
+        result = db.execute(
+            update(ProcessingBatch)
+            .where(ProcessingBatch.id == candidate, ProcessingBatch.status == "queued")
+            .values(status="running", worker=worker, updated_at=_now())
+        )
+        db.commit()
+        if result.rowcount == 1:
+            return candidate
+    return None
+
+
+def job_lock(job_id: str) -> AdvisoryLock:
+    return AdvisoryLock(f"job-{job_id}")
+
+
+def _requeue_running(db: Session, *criteria: Any) -> int:
+    exhausted = (ProcessingJob.status == "running", ProcessingJob.attempts >= settings.job_max_attempts, *criteria)
+    failed = db.execute(
+        update(ProcessingJob)
+        .where(*exhausted)
+        .values(
+            status="failed",
+            worker=None,
+            error="Auftrag hat den Worker wiederholt beendet",
+            finished_at=_now(),
+            updated_at=_now(),
+        )
+    ).rowcount
+    db.execute(
+        update(ProcessingJob)
+        .where(ProcessingJob.status == "running", *criteria)
+        .values(status="queued", worker=None, updated_at=_now())
+    )
+    return failed
+
+
+def requeue_stale_jobs(batch_id: str | None = None) -> bool:
+    requeued = True
+    with SessionLocal() as db:
+        if batch_id is None:
+            running = select(ProcessingJob.id, ProcessingJob.session_id).where(
+                ProcessingJob.status == "running", ProcessingJob.batch_id.is_(None)
+            )
+            for candidate, session_id in db.execute(running).all():
+                lock = job_lock(candidate)
+                if not lock.acquire(blocking=False):
+                    continue
+                try:
+                    if _requeue_running(db, ProcessingJob.id == candidate):
+                        db.execute(
+                            update(RecordingSession)
+                            .where(RecordingSession.id == session_id)
+                            .values(status="failed")
+                        )
+                    db.commit()
+                finally:
+                    lock.release()
+        query = select(ProcessingBatch.id).where(ProcessingBatch.status == "running")
+        if batch_id:
+            query = query.where(ProcessingBatch.id == batch_id)
+        else:
+            # A batch is claimed before its runner takes the batch lock; leave fresh claims alone.
+            grace = dt.timedelta(seconds=settings.job_requeue_interval)
+            query = query.where(ProcessingBatch.updated_at < _now() - grace)
+        for candidate in db.scalars(query).all():
+            lock = batch_lock(candidate)
+            if not lock.acquire(blocking=False):
+                requeued = False
+                continue
+            try:
+                failed = _requeue_running(db, ProcessingJob.batch_id == candidate)
+                db.execute(
+                    update(ProcessingBatch)
+                    .where(ProcessingBatch.id == candidate, ProcessingBatch.status == "running")
+                    .values(
+                        status="queued",
+                        worker=None,
+                        failed=ProcessingBatch.failed + failed,
+                        updated_at=_now(),
+                    )
+                )
+                db.commit()
+            finally:
+                lock.release()
+    return requeued
+
+
+async def process_job(job_id: str, worker: str) -> None:
+    lock = job_lock(job_id)
+    await asyncio.to_thread(lock.acquire)
+    try:
+        await _process_locked(job_id, worker)
+    finally:
+        lock.release()
+
+
+async def _process_locked(job_id: str, worker: str) -> None:
+    with SessionLocal() as db:
+        job = db.get(ProcessingJob, job_id)
+        if not job or job.status != "running" or job.worker != worker:
+            return
+        session_obj = db.get(RecordingSession, job.session_id)
+        if job.started_at and job.created_at:
+            STAGE_SECONDS.observe((job.started_at - job.created_at).total_seconds(), stage="queue_wait")
+
+        async def _progress(progress: float, stage: str) -> None:
+            job.progress = progress
+            job.stage = stage
+            db.add(job)
+            db.commit()
+
+        written = 0.0
+
+        async def _section(section: str, content: str) -> None:
+            nonlocal written
+            job.partial_summary = {**(job.partial_summary or {}), section: content}
+            if time.monotonic() - written < settings.job_partial_interval:
+                return
+            written = time.monotonic()
+            db.add(job)
+            db.commit()
+
+        try:
+            if not session_obj:
+                raise ValueError("Sitzung nicht gefunden")
+            await run_finalize(db, session_obj, progress=_progress, on_section=_section)
+        except Exception as exc:
+            db.rollback()
+            job.status = "failed"
+            job.error = str(exc)
+            if session_obj:
+                session_obj.status = "failed"
+                db.add(session_obj)
+        else:
+            job.status = "completed"
+            job.progress = 1.0
+            job.stage = None
+        job.finished_at = _now()
+        db.add(job)
+        db.commit()
+
+
+async def _worker_loop(worker: str, stop_event: Any, snapshot: bool = False) -> None:
+    swept = time.monotonic()
+    while not stop_event.is_set():
+        if time.monotonic() - swept >= settings.job_requeue_interval:
+            swept = time.monotonic()
+            await asyncio.to_thread(requeue_stale_jobs)
+        with SessionLocal() as db:
+            job = claim_next_job(db, worker)
+            job_id = job.id if job else None
+            batch_id = None if job_id else claim_next_batch(db, worker)
+        if job_id is not None:
+            await process_job(job_id, worker)
+        elif batch_id is not None:
+            await run_batch(batch_id, worker, max_items=settings.backfill_commit_size)
+        else:
+            await asyncio.sleep(settings.job_poll_interval)
+            continue
+        if snapshot:
+            write_snapshot()
+
+
+async def _worker_process_loop(worker: str, stop_event: Any) -> None:
+    try:
+        await _worker_loop(worker, stop_event, snapshot=True)
+    finally:
+        write_snapshot()
+        await close_http_client()
+        shutdown_chunk_pool()
+
+
+def worker_main(index: int, stop_event: Any) -> None:
+    if settings.whisper_preload and not inference_enabled():
+        preload_models(configured_profiles())
+    asyncio.run(_worker_process_loop(f"worker-{index}-{os.getpid()}", stop_event))
+
+
+def _register_runner() -> None:
+    global _runner_lock
+    _runner_lock = AdvisoryLock(RUNNER_LOCK)
+    requeue_stale_jobs()
+    if _runner_lock.acquire(blocking=False):
+        reset_snapshots()
+        if settings.audio_pcm_retention_hours > 0:
+            purge_expired_pcm(settings.storage_dir, settings.audio_pcm_retention_hours)
+    _runner_lock.acquire(shared=True)
+
+
+def start_workers() -> None:
+    global _stop_event
+    _register_runner()
+    context = multiprocessing.get_context("spawn")
+    _stop_event = context.Event()
+    for index in range(max(1, settings.job_workers)):
+        process = context.Process(target=worker_main, args=(index, _stop_event), name=f"protocolito-worker-{index}")
+        process.start()
+        _processes.append(process)
+
+
+async def stop_workers() -> None:
+    global _runner_lock
+    if _stop_event is not None:
+        _stop_event.set()
+    await asyncio.gather(*(asyncio.to_thread(process.join, 10) for process in _processes))
+    for process in _processes:
+        if process.is_alive():
+            process.terminate()
+    _processes.clear()
+    if _runner_lock is not None:
+        _runner_lock.release()
+        _runner_lock = None
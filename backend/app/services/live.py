@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+import asyncio
+import json
+from pathlib import Path
+from typing import Any, Awaitable, Callable
+
+from ..config import get_settings
+from .audio import PCM_SAMPLE_WIDTH, pcm_bytes_to_seconds, pcm_sample_rate, pcm_seconds_to_bytes
+from .postprocess import TranscriptCleaner
+from .transcribe import live_profile, transcribe_pcm_range
+
+settings = get_settings()
+
+LIVE_STATE_FILENAME = "live_segments.json"
+MAX_WINDOW_GROWTH = 4
+
+SendCallback = Callable[[dict[str, Any]], Awaitable[None]]
+
+_active: dict[str, "LiveTranscriber"] = {}
+
+
+def live_state_path(audio_path: Path) -> Path:
+    return audio_path.parent / LIVE_STATE_FILENAME
+
+
+def load_live_state(audio_path: Path) -> dict[str, Any]:
+    state_path = live_state_path(audio_path)
+    try:
+        data = json.loads(state_path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {"cursor": 0, "segments": []}
+    return {
+        "cursor": int(data.get("cursor") or 0),
+        "segments": list(data.get("segments") or []),
+    }
+
+
+def _write_live_state(audio_path: Path, state: dict[str, Any]) -> None:
+    state_path = live_state_path(audio_path)
+    temp_path = state_path.with_suffix(".tmp")
+    temp_path.write_text(json.dumps(state, ensure_ascii=False), encoding="utf-8")
+    temp_path.replace(state_path)
+
+
+def _align(size: int) -> int:
+    return size - (size % PCM_SAMPLE_WIDTH)
+
+
+class LiveTranscriber:
+    def __init__(self, session_id: str, audio_path: Path, language: str | None, send: SendCallback | None = None):
+        self.session_id = session_id
+        self.audio_path = audio_path
+        self.language = language
+        self.send = send
+        state = load_live_state(audio_path)
+        self.cursor: int = state["cursor"]
+        self.segments: list[dict[str, Any]] = state["segments"]
+        self.sample_rate = pcm_sample_rate(audio_path)
+        self.window_bytes = _align(pcm_seconds_to_bytes(settings.live_window_seconds, self.sample_rate))
+        self.overlap_bytes = _align(pcm_seconds_to_bytes(settings.live_overlap_seconds, self.sample_rate))
+        self.cleaner = TranscriptCleaner(language)
+        self._growth = 1
+        self._task: asyncio.Task | None = None
+
+    def feed(self, total_bytes: int) -> None:
+        if self._task and not self._task.done():
+            return
+        window_bytes = self.window_bytes * self._growth
+        if total_bytes - self.cursor < window_bytes:
+            return
+        self._task = asyncio.create_task(self._process_window(self.cursor + window_bytes))
+
+    async def drain(self) -> None:
+        if self._task:
+            try:
+                await self._task
+            except Exception:
+                pass
+            self._task = None
+
+    async def flush(self) -> None:
+        await self.drain()
+        await self._send(self.cleaner.finish())
+
+    async def _send(self, cleaned: list[dict[str, Any]]) -> None:
+        if cleaned and self.send:
+            try:
+                await self.send({"event": "segments", "segments": cleaned})
+            except Exception:
+                pass
+
+    async def _process_window(self, end_byte: int) -> None:
+        start_byte = self.cursor
+        try:
+            segments = await transcribe_pcm_range(
+                self.audio_path,
+                start_byte,
+                end_byte,
+                language=self.language,
+                model_profile=live_profile(),
+            )
+        except Exception:
+            return
+
+        stable_until = pcm_bytes_to_seconds(end_byte - self.overlap_bytes, self.sample_rate)
+        accepted = [segment for segment in segments if segment["end"] <= stable_until]
+        if self._growth >= MAX_WINDOW_GROWTH:
+            accepted = segments
+            next_cursor = end_byte
+        elif accepted:
+            next_cursor = _align(pcm_seconds_to_bytes(accepted[-1]["end"], self.sample_rate))
+        elif not segments:
+            next_cursor = end_byte - self.overlap_bytes
+        elif segments[0]["start"] > pcm_bytes_to_seconds(start_byte, self.sample_rate):
+            next_cursor = _align(pcm_seconds_to_bytes(segments[0]["start"], self.sample_rate))
+        else:
+            next_cursor = start_byte
+        if next_cursor > start_byte:
+            self.cursor = next_cursor
+            self._growth = 1
+        else:
+            self._growth = min(MAX_WINDOW_GROWTH, self._growth + 1)
+        self.segments.extend(accepted)
+
+        state = {"cursor": self.cursor, "segments": self.segments}
+        await asyncio.to_thread(_write_live_state, self.audio_path, state)
+        await self._send(self.cleaner.feed(accepted))
+
+
+def start_live_transcription(
+    session_id: str,
+    audio_path: Path,
+    language: str | None,
+    send: SendCallback,
+) -> LiveTranscriber | None:
+    if not settings.live_transcription:
+        return None
+    transcriber = _active.get(session_id)
+    if transcriber is None:
+        transcriber = LiveTranscriber(session_id, audio_path, language)
+        _active[session_id] = transcriber
+    transcriber.send = send
+    return transcriber
+
+
+def detach_live_transcription(session_id: str) -> None:
+    transcriber = _active.get(session_id)
+    if transcriber is None:
+        return
+    transcriber.send = None
+
+    def _forget(_: object = None) -> None:
+        if _active.get(session_id) is transcriber and transcriber.send is None:
+            del _active[session_id]
+
+    if transcriber._task is not None and not transcriber._task.done():
+        transcriber._task.add_done_callback(_forget)
+    else:
+        _forget()
+
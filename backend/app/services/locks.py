@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import os
+import zlib
+from pathlib import Path
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+from ..config import get_settings
+from ..database import engine
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+settings = get_settings()
+
+LOCKS_DIRNAME = ".locks"
+
+
+class FileLock:
+    def __init__(self, path: Path):
+        self.path = path
+        self._fd: int | None = None
+
+    def acquire(self, blocking: bool = True, shared: bool = False) -> bool:
+        fresh = self._fd is None
+        if fresh:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        if fcntl is None:
+            return True
+        flags = fcntl.LOCK_SH if shared else fcntl.LOCK_EX
+        try:
+            fcntl.flock(self._fd, flags if blocking else flags | fcntl.LOCK_NB)
+        except BlockingIOError:
+            if fresh:
+                self.release()
+            return False
+        return True
+
+    def release(self) -> None:
+        if self._fd is not None:
+            fd, self._fd = self._fd, None
+            os.close(fd)
+
+
+def _lock_key(name: str) -> int:
+    return zlib.crc32(f"protocolito:{name}".encode("utf-8"))
+
+
+class AdvisoryLock:
+    def __init__(self, name: str):
+        self.name = name
+        self._connection: Connection | None = None
+        self._held: str | None = None
+        self._file: FileLock | None = None
+        if engine.dialect.name != "postgresql":
+            self._file = FileLock(settings.storage_dir / LOCKS_DIRNAME / f"{name}.lock")
+
+    def acquire(self, blocking: bool = True, shared: bool = False) -> bool:
+        if self._file is not None:
+            return self._file.acquire(blocking, shared)
+        if self._connection is None:
+            self._connection = engine.connect().execution_options(isolation_level="AUTOCOMMIT")
+        suffix = "_shared" if shared else ""
+        if blocking:
+            self._connection.execute(text(f"SELECT pg_advisory_lock{suffix}(:key)"), {"key": _lock_key(self.name)})
+        elif not self._connection.scalar(
+            text(f"SELECT pg_try_advisory_lock{suffix}(:key)"), {"key": _lock_key(self.name)}
+        ):
+            if self._held is None:
+                self.release()
+            return False
+        previous, self._held = self._held, "shared" if shared else "exclusive"
+        if previous is not None and previous != self._held:
+            unlock = "pg_advisory_unlock_shared" if previous == "shared" else "pg_advisory_unlock"
+            self._connection.execute(text(f"SELECT {unlock}(:key)"), {"key": _lock_key(self.name)})
+        return True
+
+    def release(self) -> None:
+        if self._file is not None:
+            self._file.release()
+            return
+        if self._connection is not None:
+            connection, self._connection = self._connection, None
+            self._held = None
+            try:
+                connection.execute(text("SELECT pg_advisory_unlock_all()"))
+            finally:
+                connection.close()
+
+    def __enter__(self) -> "AdvisoryLock":
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.release()
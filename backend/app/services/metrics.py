@@ -0,0 +1,223 @@
+from __future__ import annotations
+
+import asyncio
+import copy
+import json
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Iterator
+
+from ..config import get_settings
+
+settings = get_settings()
+
+METRICS_DIRNAME = "metrics"
+SNAPSHOT_INTERVAL_SECONDS = 15.0
+STALE_GAUGE_SECONDS = 3 * SNAPSHOT_INTERVAL_SECONDS
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+
+_registry: dict[str, "_Metric"] = {}
+_lock = threading.Lock()
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.values: dict[tuple[str, ...], Any] = {}
+        _registry[name] = self
+
+    def _key(self, labels: dict[str, Any]) -> tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = self._key(labels)
+        with _lock:
+            self.values[key] = self.values.get(key, 0.0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = (), aggregate: bool = False):
+        super().__init__(name, documentation, labelnames)
+        self.aggregate = aggregate
+
+    def set(self, value: float, **labels: Any) -> None:
+        with _lock:
+            self.values[self._key(labels)] = float(value)
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = self._key(labels)
+        with _lock:
+            self.values[key] = self.values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: Any) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = buckets
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        with _lock:
+            entry = self.values.get(key)
+            if entry is None:
+                entry = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+                self.values[key] = entry
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry["buckets"][index] += 1
+            entry["sum"] += value
+            entry["count"] += 1
+
+
+STAGE_SECONDS = Histogram("protocolito_stage_seconds", "Dauer einzelner Verarbeitungsschritte", ("stage",))
+REALTIME_FACTOR = Histogram(
+    "protocolito_transcription_realtime_factor",
+    "Audiodauer geteilt durch Transkriptionsdauer",
+    buckets=(0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 50.0, 100.0),
+)
+MODEL_LOAD_SECONDS = Histogram("protocolito_model_load_seconds", "Ladezeit der Whisper-Modelle", ("profile",))
+WS_BYTES = Counter("protocolito_ws_bytes_total", "Per WebSocket empfangene Audiobytes")
+WS_FRAMES = Counter("protocolito_ws_frames_total", "Per WebSocket empfangene Audioframes")
+WS_ACTIVE = Gauge("protocolito_ws_active_streams", "Aktive Audio-Streams", aggregate=True)
+JOB_QUEUE = Gauge("protocolito_jobs", "Verarbeitungsauftraege nach Status", ("status",))
+OLLAMA_REQUESTS = Counter("protocolito_ollama_requests_total", "Anfragen an Ollama", ("outcome",))
+SUMMARY_FALLBACKS = Counter("protocolito_summary_fallbacks_total", "Platzhalter-Zusammenfassungen", ("reason",))
+SUMMARY_MISSING_SECTIONS = Counter(
+    "protocolito_summary_missing_sections_total", "Abschnitte, die in der Modellantwort fehlten"
+)
+CACHE_LOOKUPS = Counter("protocolito_cache_lookups_total", "Ergebnis-Cache-Zugriffe", ("cache", "result"))
+
+
+@contextmanager
+def timed(stage: str, timings: dict[str, float] | None = None) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.observe(elapsed, stage=stage)
+        if timings is not None:
+            timings[stage] = round(timings.get(stage, 0.0) + elapsed, 4)
+
+
+def _metrics_dir() -> Path:
+    return settings.storage_dir / METRICS_DIRNAME
+
+
+def _snapshot() -> dict[str, Any]:
+    with _lock:
+        return {
+            name: [[list(key), value] for key, value in metric.values.items()]
+            for name, metric in _registry.items()
+            if metric.kind != "gauge" or getattr(metric, "aggregate", False)
+        }
+
+
+def write_snapshot() -> None:
+    directory = _metrics_dir()
+    try:
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f"{os.getpid()}.json"
+        temp_path = path.with_suffix(".tmp")
+        temp_path.write_text(json.dumps(_snapshot()), encoding="utf-8")
+        temp_path.replace(path)
+    except OSError:
+        pass
+
+
+async def snapshot_loop() -> None:
+    while True:
+        await asyncio.sleep(SNAPSHOT_INTERVAL_SECONDS)
+        await asyncio.to_thread(write_snapshot)
+
+
+def reset_snapshots() -> None:
+    for path in _metrics_dir().glob("*.json"):
+        try:
+            path.unlink()
+        except OSError:
+            pass
+
+
+def _merged() -> dict[str, dict[tuple[str, ...], Any]]:
+    with _lock:
+        merged = {name: copy.deepcopy(metric.values) for name, metric in _registry.items()}
+    own = f"{os.getpid()}.json"
+    for path in _metrics_dir().glob("*.json"):
+        if path.name == own:
+            continue
+        try:
+            stale = time.time() - path.stat().st_mtime > STALE_GAUGE_SECONDS
+            snapshot = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            continue
+        for name, samples in snapshot.items():
+            if name not in merged or (stale and _registry[name].kind == "gauge"):
+                continue
+            target = merged[name]
+            for key_list, value in samples:
+                key = tuple(key_list)
+                if isinstance(value, dict):
+                    entry = target.setdefault(key, {"buckets": [0] * len(value["buckets"]), "sum": 0.0, "count": 0})
+                    entry["buckets"] = [a + b for a, b in zip(entry["buckets"], value["buckets"])]
+                    entry["sum"] += value["sum"]
+                    entry["count"] += value["count"]
+                else:
+                    target[key] = target.get(key, 0.0) + value
+    return merged
+
+
+def _labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf"
+    return repr(float(value))
+
+
+def render() -> str:
+    merged = _merged()
+    lines: list[str] = []
+    for name, metric in _registry.items():
+        lines.append(f"# HELP {name} {metric.documentation}")
+        lines.append(f"# TYPE {name} {metric.kind}")
+        for key, value in sorted(merged[name].items()):
+            if metric.kind != "histogram":
+                lines.append(f"{name}{_labels(metric.labelnames, key)} {_format(value)}")
+                continue
+            for bound, count in [*zip(metric.buckets, value["buckets"]), (math.inf, value["count"])]:
+                bucket_labels = _labels(metric.labelnames, key, f'le="{_format(bound)}"')
+                lines.append(f"{name}_bucket{bucket_labels} {count}")
+            lines.append(f"{name}_sum{_labels(metric.labelnames, key)} {_format(value['sum'])}")
+            lines.append(f"{name}_count{_labels(metric.labelnames, key)} {value['count']}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,183 @@
+from __future__ import annotations
+
+import asyncio
+import datetime as dt
+import re
+from pathlib import Path
+from typing import Any, Awaitable, Callable
+
+from sqlalchemy.orm import Session
+
+from ..config import get_settings
+from ..models import RecordingSession
+from .audio import ARCHIVE_FORMATS, archive_audio, file_sha256, is_pcm_file
+from .cache import transcript_cache, transcript_cache_key
+from .live import load_live_state
+from .metrics import timed
+from .postprocess import SPEAKER_PREFIX, clean_transcript
+from .search import build_search_text, index_session
+from .summarizer import SectionCallback, summarize
+from .transcribe import live_profile, resolve_profile, transcribe_file
+
+settings = get_settings()
+
+ProgressCallback = Callable[[float, str], Awaitable[None]]
+
+
+class PipelineError(Exception):
+    pass
+
+
+def fallback_title(created_at: dt.datetime | None) -> str:
+    if not created_at:
+        return "Unbenannte Sitzung"
+    return f"Sitzung vom {created_at.strftime('%d.%m.%Y %H:%M')}"
+
+
+def generate_session_title(transcript: str, summary: dict[str, Any] | None, created_at: dt.datetime | None) -> str:
+    candidates: list[str] = []
+    if summary:
+        sections = summary.get("sections") or {}
+        if isinstance(sections, dict):
+            for value in sections.values():
+                if isinstance(value, str):
+                    snippet = value.strip().splitlines()[0].strip()
+                    if snippet:
+                        candidates.append(snippet)
+        raw = summary.get("raw")
+        if isinstance(raw, str) and raw.strip():
+            candidates.append(raw.strip().splitlines()[0].strip())
+    transcript = SPEAKER_PREFIX.sub("", transcript.strip())
+    if transcript:
+        sentences = re.split(r"(?<=[.!?])\s+", transcript)
+        if sentences:
+            candidates.append(sentences[0].strip())
+    for candidate in candidates:
+        text = candidate.strip().strip(" -–—")
+        if not text:
+            continue
+        lowered = text.lower()
+        if lowered.startswith("keine inhalte"):
+            continue
+        return (text[:120] + "…") if len(text) > 120 else text
+    return fallback_title(created_at)
+
+
+def _store_audio(audio_path: Path) -> Path:
+    fmt = settings.audio_archive_format.lower()
+    if fmt not in ARCHIVE_FORMATS or not is_pcm_file(audio_path):
+        return audio_path
+    try:
+        archived = archive_audio(audio_path, fmt)
+    except Exception:
+        return audio_path
+    if settings.audio_pcm_retention_hours <= 0:
+        try:
+            audio_path.unlink()
+        except OSError:
+            pass
+    return archived
+
+
+async def _noop_progress(progress: float, stage: str) -> None:
+    return None
+
+
+async def transcribe_audio(
+    audio_path: Path,
+    language: str,
+    model_profile: str,
+    use_live_state: bool = True,
+    refresh: bool = False,
+) -> tuple[dict[str, Any], str]:
+    source_sha256 = await asyncio.to_thread(file_sha256, audio_path)
+    transcript_key = transcript_cache_key(source_sha256, model_profile, language)
+    transcription = None if refresh else transcript_cache.get(transcript_key)
+    if transcription is not None:
+        transcription["timings"] = {**transcription.get("timings", {}), "cached": True}
+        return transcription, source_sha256
+    live_state = {"cursor": 0, "segments": []}
+    if use_live_state and is_pcm_file(audio_path) and model_profile == live_profile():
+        live_state = load_live_state(audio_path)
+    transcription = await transcribe_file(
+        audio_path,
+        language=language,
+        start_byte=live_state["cursor"],
+        prior_segments=live_state["segments"],
+        model_profile=model_profile,
+    )
+    transcript_cache.set(transcript_key, transcription)
+    return transcription, source_sha256
+
+
+def summary_input(transcription: dict[str, Any]) -> str:
+    if transcription.get("segments"):
+        return clean_transcript(transcription["segments"], transcription.get("language"))
+    return transcription.get("clean_text") or transcription.get("text", "")
+
+
+def apply_results(
+    db: Session,
+    session_obj: RecordingSession,
+    transcription: dict[str, Any],
+    summary: dict[str, Any],
+) -> None:
+    session_obj.status = "completed"
+    session_obj.title = generate_session_title(summary_input(transcription), summary, session_obj.created_at)
+    session_obj.transcript_text = transcription["text"]
+    session_obj.transcript_json = transcription
+    session_obj.summary_json = summary
+    session_obj.search_text = build_search_text(transcription["text"], summary)
+    index_session(db, session_obj)
+
+
+async def run_finalize(
+    db: Session,
+    session_obj: RecordingSession,
+    progress: ProgressCallback | None = None,
+    on_section: SectionCallback | None = None,
+) -> RecordingSession:
+    report = progress or _noop_progress
+    if not session_obj.audio_path:
+        raise PipelineError("Keine Audiodaten")
+    audio_path = Path(session_obj.audio_path)
+    if not audio_path.exists():
+        raise PipelineError("Audiodatei fehlt")
+
+    session_obj.status = "processing"
+    db.add(session_obj)
+    db.commit()
+    await report(0.05, "transkription")
+    model_profile = resolve_profile((session_obj.settings_snapshot or {}).get("transcription_model"))
+    transcription, source_sha256 = await transcribe_audio(audio_path, session_obj.language, model_profile)
+
+    await report(0.6, "zusammenfassung")
+    summary = await summarize(
+        summary_input(transcription),
+        session_obj.settings_snapshot or {},
+        on_section=on_section,
+        segments=transcription.get("segments"),
+        language=transcription.get("language"),
+    )
+
+    await report(0.9, "speichern")
+    apply_results(db, session_obj, transcription, summary)
+    with timed("audio_archive", transcription.setdefault("timings", {})):
+        stored_path = await asyncio.to_thread(_store_audio, audio_path)
+    session_obj.audio_path = str(stored_path)
+    session_obj.audio_format = stored_path.suffix.lstrip(".").lower()
+    session_obj.audio_size = stored_path.stat().st_size
+    session_obj.audio_sha256 = (
+        source_sha256 if stored_path == audio_path else await asyncio.to_thread(file_sha256, stored_path)
+    )
+    if session_obj.audio_sha256 != source_sha256:
+        transcript_cache.set(
+            transcript_cache_key(session_obj.audio_sha256, model_profile, session_obj.language),
+            transcription,
+        )
+    session_obj.audio_bytes = None
+    db.add(session_obj)
+    with timed("db_commit"):
+        db.commit()
+    db.refresh(session_obj)
+    return session_obj
@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+import asyncio
+import struct
+from pathlib import Path
+from typing import AsyncIterator, Union
+
+from ..config import get_settings
+from .audio import ARCHIVE_FORMATS, PCM_SAMPLE_WIDTH, WHISPER_SAMPLE_RATE, is_pcm_file, pcm_sample_rate
+
+settings = get_settings()
+
+STREAM_CHUNK_BYTES = 256 * 1024
+WAV_HEADER_SIZE = 44
+MEDIA_TYPES = {
+    ".wav": "audio/wav",
+    ".flac": "audio/flac",
+    ".opus": "audio/ogg",
+    ".ogg": "audio/ogg",
+    ".webm": "audio/webm",
+}
+
+BodyPart = Union[bytes, tuple[Path, int, int]]
+
+
+class RangeNotSatisfiable(Exception):
+    def __init__(self, size: int):
+        super().__init__("Ungueltiger Byte-Bereich")
+        self.size = size
+
+
+def wav_header(data_size: int, sample_rate: int, channels: int = 1, sample_width: int = PCM_SAMPLE_WIDTH) -> bytes:
+    byte_rate = sample_rate * channels * sample_width
+    return struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF",
+        WAV_HEADER_SIZE - 8 + data_size,
+        b"WAVE",
+        b"fmt ",
+        16,
+        1,
+        channels,
+        sample_rate,
+        byte_rate,
+        channels * sample_width,
+        sample_width * 8,
+        b"data",
+        data_size,
+    )
+
+
+class AudioBody:
+    def __init__(self, parts: list[BodyPart], media_type: str):
+        self.parts = parts
+        self.media_type = media_type
+        self.size = sum(len(part) if isinstance(part, bytes) else part[2] for part in parts)
+
+    async def iter_range(self, start: int, end: int) -> AsyncIterator[bytes]:
+        position = 0
+        for part in self.parts:
+            length = len(part) if isinstance(part, bytes) else part[2]
+            lo, hi = max(start, position), min(end, position + length)
+            position += length
+            if lo >= hi:
+                continue
+            if isinstance(part, bytes):
+                yield part[lo - (position - length):hi - (position - length)]
+                continue
+            path, offset, _ = part
+            with path.open("rb") as f:
+                f.seek(offset + lo - (position - length))
+                remaining = hi - lo
+                while remaining > 0:
+                    chunk = await asyncio.to_thread(f.read, min(STREAM_CHUNK_BYTES, remaining))
+                    if not chunk:
+                        return
+                    remaining -= len(chunk)
+                    yield chunk
+
+
+def parse_range(header: str | None, size: int) -> tuple[int, int] | None:
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    first, _, last = header[6:].strip().partition("-")
+    try:
+        if not first:
+            suffix = int(last)
+            if suffix <= 0:
+                raise RangeNotSatisfiable(size)
+            return max(0, size - suffix), size
+        start = int(first)
+        end = min(int(last) + 1, size) if last else size
+    except ValueError:
+        return None
+    if start >= size or end <= start:
+        raise RangeNotSatisfiable(size)
+    return start, end
+
+
+def playback_path(audio_path: Path) -> Path | None:
+    if is_pcm_file(audio_path):
+        for _, _, suffix in ARCHIVE_FORMATS.values():
+            archived = audio_path.with_suffix(suffix)
+            if archived.exists():
+                return archived
+    return audio_path if audio_path.exists() else None
+
+
+def _pcm_body(path: Path, start: float | None, end: float | None) -> AudioBody:
+    sample_rate = pcm_sample_rate(path)
+    size = path.stat().st_size
+    size -= size % PCM_SAMPLE_WIDTH
+    first = min(size, int((start or 0.0) * sample_rate) * PCM_SAMPLE_WIDTH)
+    last = size if end is None else min(size, int(end * sample_rate) * PCM_SAMPLE_WIDTH)
+    length = max(0, last - first)
+    return AudioBody([wav_header(length, sample_rate), (path, first, length)], MEDIA_TYPES[".wav"])
+
+
+def _decode_clip(path: Path, start: float, end: float, sample_rate: int = WHISPER_SAMPLE_RATE) -> bytes:
+    import av
+
+    wanted = int((end - start) * sample_rate) * PCM_SAMPLE_WIDTH
+    chunks: list[bytes] = []
+    collected = skip = 0
+    first_time: float | None = None
+    with av.open(str(path)) as container:
+        stream = container.streams.audio[0]
+        if start > 0 and stream.time_base:
+            container.seek(int(start / stream.time_base), stream=stream)
+        resampler = av.AudioResampler(format="s16", layout="mono", rate=sample_rate)
+        for frame in container.decode(stream):
+            if first_time is None:
+                first_time = frame.time if frame.time is not None else 0.0
+                skip = max(0, int((start - first_time) * sample_rate)) * PCM_SAMPLE_WIDTH
+            for resampled in resampler.resample(frame):
+                data = resampled.to_ndarray().tobytes()
+                if skip:
+                    dropped = min(skip, len(data))
+                    skip -= dropped
+                    data = data[dropped:]
+                chunks.append(data)
+                collected += len(data)
+            if collected >= wanted:
+                break
+    return b"".join(chunks)[:wanted]
+
+
+async def audio_body(audio_path: Path, start: float | None = None, end: float | None = None) -> AudioBody | None:
+    path = playback_path(audio_path)
+    if path is None:
+        return None
+    if is_pcm_file(path):
+        return await asyncio.to_thread(_pcm_body, path, start, end)
+    media_type = MEDIA_TYPES.get(path.suffix.lower(), "application/octet-stream")
+    if start is None and end is None:
+        return AudioBody([(path, 0, path.stat().st_size)], media_type)
+    clip_start = start or 0.0
+    limit = clip_start + settings.audio_clip_max_seconds
+    clip_end = limit if end is None else min(end, limit)
+    pcm = await asyncio.to_thread(_decode_clip, path, clip_start, clip_end)
+    return AudioBody([wav_header(len(pcm), WHISPER_SAMPLE_RATE), pcm], MEDIA_TYPES[".wav"])
@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import re
+from functools import lru_cache
+from typing import Any, Iterable
+
+from ..config import get_settings
+
+settings = get_settings()
+
+LANGUAGE_LETTERS = {
+    "de": "a-zA-ZäöüÄÖÜß",
+    "en": "a-zA-Z",
+    "fr": "a-zA-ZàâæçéèêëîïôœùûüÿÀÂÆÇÉÈÊËÎÏÔŒÙÛÜŸ",
+    "es": "a-zA-ZáéíñóúüÁÉÍÑÓÚÜ¿¡",
+    "it": "a-zA-ZàèéìíîòóùúÀÈÉÌÍÎÒÓÙÚ",
+    "nl": "a-zA-ZäëïöüéèÄËÏÖÜÉÈ",
+}
+COMMON_CHARACTERS = r"0-9 .,;:?!%&€$§/()'\"+\-–"
+PUNCTUATION = ",.;:?!"
+_SPACING = re.compile(r" (?=[ ,.;:?!\n])")
+_WORD = re.compile(r"[^\W_]")
+SPEAKER_PREFIX = re.compile(r"^Sprecher \d+: ", re.MULTILINE)
+
+
+@lru_cache(maxsize=16)
+def _noise_pattern(language: str | None) -> re.Pattern[str]:
+    letters = LANGUAGE_LETTERS.get((language or "").lower()[:2])
+    extra = re.escape(settings.postprocess_extra_characters)
+    if letters is None:
+        return re.compile(rf"(?:_|[^\w{extra}{COMMON_CHARACTERS}\n])+")
+    return re.compile(rf"[^{letters}{extra}{COMMON_CHARACTERS}\n]+")
+
+
+class TranscriptCleaner:
+    def __init__(
+        self,
+        language: str | None = None,
+        min_words: int | None = None,
+        merge_gap: float | None = None,
+    ):
+        self.noise = _noise_pattern(language)
+        self.min_words = settings.postprocess_min_words if min_words is None else min_words
+        self.merge_gap = settings.postprocess_merge_gap_seconds if merge_gap is None else merge_gap
+        self._pending: tuple[float, float, str, int, str | None] | None = None
+
+    def clean_texts(self, texts: list[str]) -> list[str]:
+        joined = "\n".join(texts)
+        if joined.count("\n") != len(texts) - 1:
+            joined = "\n".join(text.replace("\n", " ") for text in texts)
+        return _SPACING.sub("", self.noise.sub(" ", joined)).split("\n")
+
+    def feed(self, segments: Iterable[dict[str, Any]]) -> list[dict[str, Any]]:
+        segments = list(segments)
+        if not segments:
+            return []
+        output: list[tuple[float, float, str, int, str | None]] = []
+        pending = self._pending
+        has_word = _WORD.search
+        for segment, text in zip(segments, self.clean_texts([segment.get("text") or "" for segment in segments])):
+            text = text.strip()
+            if not has_word(text):
+                continue
+            current = (
+                segment.get("start", 0.0),
+                segment.get("end", 0.0),
+                text,
+                text.count(" ") + 1,
+                segment.get("speaker"),
+            )
+            if pending is not None:
+                if current[0] - pending[1] <= self.merge_gap and current[4] == pending[4]:
+                    current = (pending[0], current[1], f"{pending[2]} {text}", pending[3] + current[3], current[4])
+                else:
+                    output.append(pending)
+                pending = None
+            if current[3] < self.min_words:
+                pending = current
+            else:
+                output.append(current)
+        self._pending = pending
+        return [_public(item) for item in output]
+
+    def finish(self) -> list[dict[str, Any]]:
+        pending, self._pending = self._pending, None
+        return [_public(pending)] if pending is not None else []
+
+    def clean(self, segments: Iterable[dict[str, Any]]) -> list[dict[str, Any]]:
+        return self.feed(segments) + self.finish()
+
+
+def _public(item: tuple[float, float, str, int, str | None]) -> dict[str, Any]:
+    start, end, text, _, speaker = item
+    public = {"start": start, "end": end, "text": text[:1].upper() + text[1:]}
+    if speaker is not None:
+        public["speaker"] = speaker
+    return public
+
+
+def speaker_line(segment: dict[str, Any]) -> str:
+    speaker = segment.get("speaker")
+    return f"{speaker}: {segment['text']}" if speaker else segment["text"]
+
+
+def clean_transcript(segments: Iterable[dict[str, Any]], language: str | None = None) -> str:
+    return "\n".join(speaker_line(segment) for segment in TranscriptCleaner(language).clean(segments))
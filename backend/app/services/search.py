@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import logging
+import re
+from typing import Any
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from ..database import engine
+from ..models import RecordingSession
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = "recording_sessions_fts"
+SEARCH_CONFIG = "german"
+
+_TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+def build_search_text(transcript: str, summary: dict[str, Any] | None) -> str:
+    parts: list[str] = []
+    if summary:
+        sections = summary.get("sections") or {}
+        if isinstance(sections, dict):
+            parts.extend(f"{name}: {value}" for name, value in sections.items() if isinstance(value, str))
+        highlights = summary.get("highlights") or []
+        parts.extend(str(item) for item in highlights if item)
+    if transcript:
+        parts.append(transcript)
+    return "\n".join(parts)
+
+
+def ensure_search_schema(connection: Connection) -> None:
+    if connection.dialect.name == "postgresql":
+        statements = [
+            "ALTER TABLE recording_sessions ADD COLUMN IF NOT EXISTS search_vector tsvector "
+            f"GENERATED ALWAYS AS (to_tsvector('{SEARCH_CONFIG}', coalesce(search_text, ''))) STORED",
+            "CREATE INDEX IF NOT EXISTS ix_recording_sessions_search_vector "
+            "ON recording_sessions USING GIN (search_vector)",
+        ]
+    elif connection.dialect.name == "sqlite":
+        statements = [
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+            "USING fts5(session_id UNINDEXED, content, tokenize = 'unicode61 remove_diacritics 2')",
+            f"INSERT INTO {FTS_TABLE} (session_id, content) "
+            "SELECT id, coalesce(search_text, transcript_text) FROM recording_sessions "
+            f"WHERE coalesce(search_text, transcript_text) IS NOT NULL "
+            f"AND id NOT IN (SELECT session_id FROM {FTS_TABLE})",
+        ]
+    else:
+        return
+    for statement in statements:
+        connection.execute(text(statement))
+
+
+def index_session(db: Session, session_obj: RecordingSession) -> None:
+    if engine.dialect.name != "sqlite":
+        return
+    try:
+        db.execute(text(f"DELETE FROM {FTS_TABLE} WHERE session_id = :id"), {"id": session_obj.id})
+        db.execute(
+            text(f"INSERT INTO {FTS_TABLE} (session_id, content) VALUES (:id, :content)"),
+            {"id": session_obj.id, "content": session_obj.search_text or ""},
+        )
+    except Exception as exc:
+        logger.warning("Suchindex fuer Sitzung %s nicht aktualisiert: %s", session_obj.id, exc)
+
+
+def _fts5_query(query: str) -> str:
+    tokens = _TOKEN_PATTERN.findall(query)
+    return " ".join(f'"{token}"' for token in tokens)
+
+
+def search_sessions(db: Session, query: str, limit: int) -> list[dict[str, Any]]:
+    if not _TOKEN_PATTERN.search(query):
+        return []
+    if engine.dialect.name == "postgresql":
+        rows = db.execute(
+            text(
+                "SELECT id, ts_rank(search_vector, q) AS rank, "
+                f"ts_headline('{SEARCH_CONFIG}', coalesce(search_text, ''), q, "
+                "'MaxFragments=2, MaxWords=18, MinWords=6, StartSel=[, StopSel=]') AS snippet "
+                f"FROM recording_sessions, websearch_to_tsquery('{SEARCH_CONFIG}', :query) AS q "
+                "WHERE search_vector @@ q ORDER BY rank DESC, created_at DESC LIMIT :limit"
+            ),
+            {"query": query, "limit": limit},
+        ).all()
+    elif engine.dialect.name == "sqlite":
+        try:
+            rows = db.execute(
+                text(
+                    f"SELECT session_id AS id, -bm25({FTS_TABLE}) AS rank, "
+                    f"snippet({FTS_TABLE}, 1, '[', ']', '…', 18) AS snippet "
+                    f"FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :query ORDER BY bm25({FTS_TABLE}) LIMIT :limit"
+                ),
+                {"query": _fts5_query(query), "limit": limit},
+            ).all()
+        except Exception:
+            rows = _like_search(db, query, limit)
+    else:
+        rows = _like_search(db, query, limit)
+    return [{"id": row.id, "rank": float(row.rank or 0.0), "snippet": row.snippet} for row in rows]
+
+
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _like_search(db: Session, query: str, limit: int) -> list[Any]:
+    return db.execute(
+        text(
+            "SELECT id, 0.0 AS rank, NULL AS snippet FROM recording_sessions "
+            "WHERE lower(coalesce(search_text, transcript_text)) LIKE :pattern ESCAPE '\\' "
+            "ORDER BY created_at DESC LIMIT :limit"
+        ),
+        {"pattern": f"%{_escape_like(query.lower())}%", "limit": limit},
+    ).all()
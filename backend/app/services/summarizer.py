@@ -1,14 +1,27 @@
 from __future__ import annotations
 
+import asyncio
 import json
+import logging
+import math
 import re
-from typing import Any
+import time
+from functools import lru_cache
+from typing import Any, Awaitable, Callable
 
 import httpx
 
 from ..config import get_settings
+from .cache import summary_cache, summary_cache_key
+from .metrics import OLLAMA_REQUESTS, STAGE_SECONDS, SUMMARY_FALLBACKS, SUMMARY_MISSING_SECTIONS
+from .postprocess import SPEAKER_PREFIX, TranscriptCleaner, speaker_line
 
 settings = get_settings()
+logger = logging.getLogger(__name__)
+
+SectionCallback = Callable[[str, str], Awaitable[None]]
+
+_client: httpx.AsyncClient | None = None
 
 DEFAULT_SECTIONS = ["Agenda-Ueberblick", "Entscheidungen", "Aufgaben", "Offene Punkte"]
 HIGHLIGHT_SECTION = "Highlights"
@@ -20,42 +33,246 @@ SECTION_HINTS = {
     "Highlights": "Bemerkenswerte Aussagen, Zitate oder Stimmungen (optional).",
 }
 PLACEHOLDER_TEXT = "(nicht eindeutig aus Transkript ersichtlich)"
+FAILED_FALLBACKS = {"fehler", "leere_antwort"}
+
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+")
+
+
+def _create_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        base_url=settings.ollama_host,
+        timeout=httpx.Timeout(
+            connect=settings.ollama_connect_timeout,
+            read=settings.ollama_read_timeout,
+            write=30.0,
+            pool=30.0,
+        ),
+        limits=httpx.Limits(
+            max_connections=settings.ollama_max_connections,
+            max_keepalive_connections=settings.ollama_max_connections,
+            keepalive_expiry=60.0,
+        ),
+    )
 
 
-async def summarize(transcript: str, session_settings: dict[str, Any]) -> dict[str, Any]:
-    clean_text = transcript.strip()
-    sections = _effective_sections(session_settings.get("sections"))
-    prompt_sections = sections + ([HIGHLIGHT_SECTION] if HIGHLIGHT_SECTION not in sections else [])
-
-    if not clean_text:
-        return _fallback_summary(sections)
-
-    prompt = _build_prompt(clean_text, prompt_sections, session_settings)
-    url = f"{settings.ollama_host}/api/generate"
+def get_http_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None or _client.is_closed:
+        _client = _create_client()
+    return _client
+
+
+async def close_http_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+class _SectionStream:
+    def __init__(self, template: "SummaryTemplate", on_section: SectionCallback | None):
+        self.template = template
+        self.on_section = on_section
+        self.buffer = ""
+        self.current: str | None = None
+        self.lines: dict[str, list[str]] = {}
+        self.seen: set[str] = set()
+
+    async def feed(self, chunk: str) -> None:
+        self.buffer += chunk
+        if "\n" not in self.buffer:
+            return
+        *lines, self.buffer = self.buffer.split("\n")
+        for line in lines:
+            await self._line(line)
+
+    async def finish(self) -> None:
+        if self.buffer:
+            await self._line(self.buffer)
+            self.buffer = ""
+
+    async def _line(self, raw_line: str) -> None:
+        section = self.consume(raw_line)
+        if section is not None and self.on_section is not None:
+            await self.on_section(section, " ".join(self.lines[section]))
+
+    def consume(self, raw_line: str) -> str | None:
+        line = raw_line.strip()
+        if not line:
+            return None
+        heading = self.template.match_heading(line)
+        if heading:
+            self.current = heading
+            self.seen.add(heading)
+            return None
+        if self.current is None:
+            return None
+        self.lines.setdefault(self.current, []).append(line)
+        return self.current
+
+    def missing(self) -> list[str]:
+        return [section for section in self.template.prompt_sections if section not in self.seen]
+
+    def structured(self) -> dict[str, Any]:
+        highlights = [
+            bullet for bullet in (line.lstrip("-• ").strip() for line in self.lines.get(HIGHLIGHT_SECTION, [])) if bullet
+        ]
+        return {
+            "sections": {
+                section: (
+                    " ".join(self.lines.get(section, []) if section != HIGHLIGHT_SECTION else []).strip()
+                    or PLACEHOLDER_TEXT
+                )
+                for section in self.template.sections
+            },
+            "highlights": highlights,
+        }
+
+
+async def _generate(prompt: str, stream: _SectionStream) -> str:
     payload = {
         "model": settings.summary_model,
         "prompt": prompt,
-        "stream": False,
+        "stream": True,
     }
+    parts: list[str] = []
     try:
-        async with httpx.AsyncClient(timeout=90) as client:
-            response = await client.post(url, json=payload)
+        async with get_http_client().stream("POST", "/api/generate", json=payload) as response:
             response.raise_for_status()
-            data = response.json()
-            content = data.get("response") or data.get("message", {}).get("content", "") or ""
+            async for raw in response.aiter_lines():
+                if not raw.strip():
+                    continue
+                data = json.loads(raw)
+                if data.get("error"):
+                    raise RuntimeError(data["error"])
+                chunk = data.get("response") or data.get("message", {}).get("content", "") or ""
+                if chunk:
+                    parts.append(chunk)
+                    await stream.feed(chunk)
+                if data.get("done"):
+                    break
     except Exception:
-        return _fallback_summary(sections)
+        OLLAMA_REQUESTS.inc(outcome="error")
+        raise
+    OLLAMA_REQUESTS.inc(outcome="ok")
+    await stream.finish()
+    return "".join(parts)
+
+
+async def summarize(
+    transcript: str,
+    session_settings: dict[str, Any],
+    on_section: SectionCallback | None = None,
+    segments: list[dict[str, Any]] | None = None,
+    language: str | None = None,
+) -> dict[str, Any]:
+    clean_text = transcript.strip()
+    template = get_template(session_settings)
+    sections = template.sections
+
+    if not clean_text:
+        return _fallback_summary(sections, "leeres_transkript")
+
+    cache_key = summary_cache_key(clean_text, template.prompt_sections, session_settings, settings.summary_model)
+    cached = summary_cache.get(cache_key)
+    if cached is not None:
+        if on_section:
+            for section, content in cached.get("sections", {}).items():
+                await on_section(section, content)
+        cached["timings"] = {**cached.get("timings", {}), "cached": True}
+        return cached
+
+    budget = max(1, settings.summary_chunk_tokens)
+    chunks = [clean_text]
+    if estimate_tokens(clean_text) > budget:
+        cleaned = TranscriptCleaner(language).clean(segments or [])
+        units = [speaker_line(segment) for segment in cleaned]
+        separator = "\n" if any(segment.get("speaker") for segment in cleaned) else " "
+        chunks = [
+            separator.join(group) for group in _chunk_texts(units or _SENTENCE_SPLIT.split(clean_text), budget)
+        ]
+    stream = _SectionStream(template, on_section)
+    started = time.perf_counter()
+    try:
+        if len(chunks) > 1:
+            content = await _map_reduce(chunks, template, stream)
+        else:
+            content = await _generate(template.prompt(clean_text), stream)
+    except Exception as exc:
+        logger.warning("Zusammenfassung fehlgeschlagen: %s", exc)
+        return _fallback_summary(sections, "fehler")
+    elapsed = time.perf_counter() - started
+    STAGE_SECONDS.observe(elapsed, stage="summarization")
 
     summary_text = content.strip()
     if not summary_text:
-        return _fallback_summary(sections)
+        return _fallback_summary(sections, "leere_antwort")
 
-    _validate_summary(summary_text, prompt_sections)
-    structured = _structure_summary(summary_text, sections, prompt_sections)
+    _validate_summary(stream.missing())
+    structured = stream.structured()
     structured["raw"] = summary_text
+    structured["timings"] = {
+        "summarization": round(elapsed, 4),
+        "mode": "map_reduce" if len(chunks) > 1 else "single",
+        "chunks": len(chunks),
+        "prompt_tokens_estimate": estimate_tokens(clean_text),
+    }
+    summary_cache.set(cache_key, structured)
     return structured
 
 
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / max(settings.summary_chars_per_token, 0.1))
+
+
+def _chunk_texts(units: list[str], budget: int) -> list[list[str]]:
+    groups: list[list[str]] = []
+    current: list[str] = []
+    current_tokens = 0
+    for unit in units:
+        tokens = estimate_tokens(unit) + 1
+        if current and current_tokens + tokens > budget:
+            groups.append(current)
+            current = []
+            current_tokens = 0
+        current.append(unit)
+        current_tokens += tokens
+    if current:
+        groups.append(current)
+    return groups
+
+
+async def _map_reduce(chunks: list[str], template: "SummaryTemplate", stream: _SectionStream) -> str:
+    semaphore = asyncio.Semaphore(max(1, settings.summary_concurrency))
+
+    async def _run(prompt: str) -> str:
+        async with semaphore:
+            return (await _generate(prompt, _SectionStream(template, None))).strip()
+
+    async def _gather(prompts: list[str]) -> list[str]:
+        results = await asyncio.gather(*(_run(prompt) for prompt in prompts), return_exceptions=True)
+        failed = 0
+        for index, result in enumerate(results, start=1):
+            if isinstance(result, BaseException) or not result:
+                failed += 1
+                logger.warning("Teilzusammenfassung %s/%s fehlgeschlagen: %s", index, len(results), result or "leer")
+        if failed:
+            raise RuntimeError(f"{failed} von {len(results)} Teilzusammenfassungen fehlgeschlagen")
+        return results
+
+    partials = await _gather(
+        [template.prompt(chunk, part=(index, len(chunks))) for index, chunk in enumerate(chunks, start=1)]
+    )
+    budget = max(1, settings.summary_chunk_tokens)
+    while len(partials) > 1 and estimate_tokens("\n\n".join(partials)) > budget:
+        groups = _chunk_texts(partials, budget)
+        if len(groups) >= len(partials):
+            break
+        partials = await _gather([template.reduce_prompt(group) for group in groups])
+
+    return await _generate(template.reduce_prompt(partials), stream)
+
+
 def _effective_sections(configured: Any) -> list[str]:
     if not configured:
         return list(DEFAULT_SECTIONS)
@@ -63,82 +280,107 @@ def _effective_sections(configured: Any) -> list[str]:
     return sections or list(DEFAULT_SECTIONS)
 
 
-def _build_prompt(transcript: str, sections: list[str], session_settings: dict[str, Any]) -> str:
+def _section_lines(sections: list[str]) -> str:
     section_lines = []
     for index, section in enumerate(sections, start=1):
         label = _display_label(section)
         hint = SECTION_HINTS.get(section, "Fasse klar strukturiert zusammen und nenne Verantwortliche sowie Fristen.")
         section_lines.append(f"{index}. **{label}** – {hint}")
+    return "\n".join(section_lines)
 
+
+def _context_lines(session_settings: dict[str, Any]) -> str:
     meeting_type = session_settings.get("meeting_type") or PLACEHOLDER_TEXT
     audience = session_settings.get("audience") or PLACEHOLDER_TEXT
     objectives = session_settings.get("objectives") or PLACEHOLDER_TEXT
     notes = session_settings.get("notes") or PLACEHOLDER_TEXT
 
     return (
-        "Du erhaelst ein potenziell fehlerhaftes Transkript eines deutschsprachigen Meetings.\n"
-        "Bereinige offensichtliche Erkennungsfehler, ignoriere unverständliche Sätze und generiere ein kompaktes Ergebnisprotokoll.\n"
-        "Arbeite die folgenden Abschnitte muendlich sauber heraus:\n"
-        f"{chr(10).join(section_lines)}\n\n"
-        "Wichtige Regeln:\n"
-        "- Lasse Grussformeln, Smalltalk und irrelevante Inhalte weg.\n"
-        "- Verwende klare, korrekte deutsche Sprache.\n"
-        "- Wenn Informationen fehlen, schreibe genau: \"(nicht eindeutig aus Transkript ersichtlich)\".\n"
-        "- Erfinde keine Fakten.\n"
-        "- Gib die Antwort strukturiert mit den oben genannten Zwischenueberschriften aus.\n\n"
         f"Kontext:\n"
         f"- Besprechungstyp: {meeting_type}\n"
         f"- Zielgruppe: {audience}\n"
         f"- Ziele: {objectives}\n"
         f"- Notizen: {notes}\n\n"
-        "Transkript (bereinigt):\n\n"
-        f"{transcript}\n"
     )
 
 
-def _structure_summary(summary_text: str, sections: list[str], prompt_sections: list[str]) -> dict[str, Any]:
-    section_map = {section: [] for section in sections}
-    highlights: list[str] = []
-    current_section: str | None = None
-    for raw_line in summary_text.splitlines():
-        line = raw_line.strip()
-        if not line:
-            continue
-
-        header_match = _match_section_heading(line, prompt_sections)
-        if header_match:
-            current_section = header_match
-            continue
-
-        if current_section is None:
-            continue
-
-        if current_section == HIGHLIGHT_SECTION:
-            bullet = line.lstrip("-• ").strip()
-            if bullet:
-                highlights.append(bullet)
-        elif current_section in section_map:
-            section_map[current_section].append(line)
-
-    sections_result = {
-        section: (" ".join(lines).strip() or PLACEHOLDER_TEXT)
-        for section, lines in section_map.items()
-    }
-
-    return {
-        "sections": sections_result,
-        "highlights": highlights,
-    }
-
-
-def _match_section_heading(line: str, sections: list[str]) -> str | None:
-    normalized_line = re.sub(r"^\d+[\).\-\s]*", "", line)
-    normalized_line = normalized_line.strip("*:- ").lower()
-    for section in sections:
-        label = _display_label(section).lower()
-        if normalized_line.startswith(label):
-            return section
-    return None
+class SummaryTemplate:
+    def __init__(self, sections: list[str], context: str):
+        self.sections = sections
+        self.prompt_sections = sections + ([HIGHLIGHT_SECTION] if HIGHLIGHT_SECTION not in sections else [])
+        section_lines = _section_lines(self.prompt_sections)
+        self.labels = {_display_label(section).lower(): section for section in self.prompt_sections}
+        alternation = "|".join(re.escape(label) for label in sorted(self.labels, key=len, reverse=True))
+        self._heading = re.compile(rf"[#*:\-\s]*(?:\d+[\).\-\s]*)?[*:\-\s]*({alternation})", re.IGNORECASE)
+        self._prompt_head = (
+            "Du erhaelst ein potenziell fehlerhaftes Transkript eines deutschsprachigen Meetings.\n"
+            "Bereinige offensichtliche Erkennungsfehler, ignoriere unverständliche Sätze und generiere ein kompaktes Ergebnisprotokoll.\n"
+        )
+        self._prompt_body = (
+            "Arbeite die folgenden Abschnitte muendlich sauber heraus:\n"
+            f"{section_lines}\n\n"
+            "Wichtige Regeln:\n"
+            "- Lasse Grussformeln, Smalltalk und irrelevante Inhalte weg.\n"
+            "- Verwende klare, korrekte deutsche Sprache.\n"
+            "- Wenn Informationen fehlen, schreibe genau: \"(nicht eindeutig aus Transkript ersichtlich)\".\n"
+            "- Erfinde keine Fakten.\n"
+            "- Gib die Antwort strukturiert mit den oben genannten Zwischenueberschriften aus.\n\n"
+            f"{context}"
+            "Transkript (bereinigt):\n\n"
+        )
+        self._reduce_head = (
+            "Du erhaelst Teilzusammenfassungen aufeinanderfolgender Abschnitte eines deutschsprachigen Meetings.\n"
+            "Fuehre sie zu einem einzigen kompakten Ergebnisprotokoll zusammen:\n"
+            f"{section_lines}\n\n"
+            "Wichtige Regeln:\n"
+            "- Entferne Dopplungen, behalte aber alle Entscheidungen, Aufgaben, Verantwortlichen und Fristen.\n"
+            "- Spaetere Teile haben Vorrang, wenn sich Aussagen widersprechen.\n"
+            "- Wenn Informationen fehlen, schreibe genau: \"(nicht eindeutig aus Transkript ersichtlich)\".\n"
+            "- Erfinde keine Fakten.\n"
+            "- Gib die Antwort strukturiert mit den oben genannten Zwischenueberschriften aus.\n\n"
+            f"{context}"
+            "Teilzusammenfassungen:\n\n"
+        )
+
+    def prompt(self, transcript: str, part: tuple[int, int] | None = None) -> str:
+        part_note = ""
+        if part:
+            part_note = (
+                f"Dies ist Teil {part[0]} von {part[1]} eines laengeren Meetings. "
+                "Fasse nur diesen Teil zusammen; die Teile werden spaeter zusammengefuehrt.\n"
+            )
+        if SPEAKER_PREFIX.search(transcript):
+            part_note += (
+                "Jede Zeile beginnt mit dem automatisch erkannten Sprecher (\"Sprecher 1\", \"Sprecher 2\", ...). "
+                "Nutze diese Zuordnung fuer Verantwortliche, erfinde aber keine Namen.\n"
+            )
+        return f"{self._prompt_head}{part_note}{self._prompt_body}{transcript}\n"
+
+    def reduce_prompt(self, partials: list[str]) -> str:
+        parts = "\n\n".join(f"--- Teil {index} ---\n{text}" for index, text in enumerate(partials, start=1))
+        return f"{self._reduce_head}{parts}\n"
+
+    def match_heading(self, line: str) -> str | None:
+        match = self._heading.match(line)
+        if match is None:
+            return None
+        return self.labels.get(match.group(1).lower())
+
+    def structure(self, summary_text: str) -> _SectionStream:
+        stream = _SectionStream(self, None)
+        for line in summary_text.splitlines():
+            stream.consume(line)
+        return stream
+
+
+def get_template(session_settings: dict[str, Any]) -> SummaryTemplate:
+    sections = tuple(_effective_sections(session_settings.get("sections")))
+    return _compile_template(sections, _context_lines(session_settings))
+
+
+@lru_cache(maxsize=64)
+def _compile_template(sections: tuple[str, ...], context: str) -> SummaryTemplate:
+    return SummaryTemplate(list(sections), context)
 
 
 def _display_label(section: str) -> str:
@@ -152,20 +394,20 @@ def _display_label(section: str) -> str:
     )
 
 
-def _validate_summary(summary_text: str, sections: list[str]) -> None:
-    lowered = summary_text.lower()
-    missing = []
-    for section in sections:
-        label = _display_label(section).lower()
-        if label not in lowered:
-            missing.append(label)
+def _validate_summary(missing: list[str]) -> None:
     if missing:
-        print(f"Warnung: Zusammenfassung enthaelt folgende Sektionen nicht eindeutig: {', '.join(missing)}")
+        SUMMARY_MISSING_SECTIONS.inc(len(missing))
+        logger.warning(
+            "Zusammenfassung enthaelt folgende Sektionen nicht eindeutig: %s",
+            ", ".join(_display_label(section).lower() for section in missing),
+        )
 
 
-def _fallback_summary(sections: list[str]) -> dict[str, Any]:
+def _fallback_summary(sections: list[str], reason: str) -> dict[str, Any]:
+    SUMMARY_FALLBACKS.inc(reason=reason)
     return {
         "sections": {section: PLACEHOLDER_TEXT for section in sections},
         "highlights": [],
         "raw": "",
+        "fallback": reason,
     }
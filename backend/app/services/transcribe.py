@@ -1,100 +1,421 @@
 from __future__ import annotations
 
 import asyncio
+import math
+import multiprocessing
 import os
-import re
-import tempfile
-import wave
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Any, Iterable
+from typing import Any, Callable, Iterable
 
-from faster_whisper import WhisperModel
+import numpy as np
+from faster_whisper import WhisperModel, decode_audio
 
 from ..config import get_settings
+from .audio import (
+    PCM_SAMPLE_WIDTH,
+    WHISPER_SAMPLE_RATE,
+    is_pcm_file,
+    load_whisper_audio,
+    pcm_bytes_to_seconds,
+    pcm_sample_rate,
+)
+from .diarize import finish_diarization, submit_diarization
+from .inference import InferenceError, call, inference_enabled, remote_call, require_authkey, serve
+from .metrics import MODEL_LOAD_SECONDS, REALTIME_FACTOR, timed, write_snapshot
+from .postprocess import clean_transcript
+from .vad import FRAME_SECONDS, SpeechMap, frame_levels, trim_silence
 
 settings = get_settings()
-_model_instance: WhisperModel | None = None
-
-_NOISY_CHAR_PATTERN = re.compile(r"[^a-zA-ZäöüÄÖÜß\s,.?!-]")
-
-
-def get_model() -> WhisperModel:
-    global _model_instance
-    if _model_instance is None:
-        _model_instance = WhisperModel(settings.whisper_model, device="auto")
-    return _model_instance
-
-
-def _clean_transcript_segments(segment_texts: Iterable[str]) -> str:
-    cleaned_lines: list[str] = []
-    for raw_line in segment_texts:
-        text = raw_line.strip()
-        if len(text.split()) < 3:
-            continue
-        if _NOISY_CHAR_PATTERN.search(text):
-            continue
-        text = (
-            text.replace(" ,", ",")
-            .replace(" .", ".")
-            .replace(" ?", "?")
-            .replace(" !", "!")
+
+WARMUP_SECONDS = 1.0
+CUT_SEARCH_SECONDS = 10.0
+STATUS_TIMEOUT = 2.0
+
+_models: dict[str, WhisperModel] = {}
+_model_state: dict[str, str] = {}
+_model_locks: dict[str, threading.Lock] = {}
+_registry_lock = threading.Lock()
+_thread_budget = 0
+_chunk_pool: ProcessPoolExecutor | None = None
+_pool_lock = threading.Lock()
+
+
+def _cpu_threads() -> int:
+    if _thread_budget > 0:
+        return _thread_budget
+    if settings.whisper_cpu_threads > 0:
+        return settings.whisper_cpu_threads
+    return max(1, (os.cpu_count() or 1) // max(1, settings.job_workers))
+
+
+def profile_key(spec: str | None = None) -> str:
+    name, _, compute_type = (spec or settings.whisper_model).strip().partition(":")
+    return f"{name.strip()}:{compute_type.strip() or settings.whisper_compute_type}"
+
+
+def live_profile() -> str:
+    return profile_key(settings.whisper_live_model or None)
+
+
+def configured_profiles() -> list[str]:
+    specs = [settings.whisper_model, settings.whisper_live_model, *settings.whisper_models.split(",")]
+    profiles: list[str] = []
+    for spec in specs:
+        if spec and spec.strip():
+            key = profile_key(spec)
+            if key not in profiles:
+                profiles.append(key)
+    return profiles
+
+
+def resolve_profile(spec: str | None) -> str:
+    key = profile_key(spec)
+    return key if key in configured_profiles() else profile_key()
+
+
+def get_model(profile: str | None = None) -> WhisperModel:
+    key = profile_key(profile)
+    model = _models.get(key)
+    if model is not None:
+        return model
+    with _registry_lock:
+        lock = _model_locks.setdefault(key, threading.Lock())
+    with lock:
+        model = _models.get(key)
+        if model is None:
+            name, _, compute_type = key.rpartition(":")
+            _model_state[key] = "laedt"
+            started = time.perf_counter()
+            try:
+                model = WhisperModel(
+                    name,
+                    device="auto",
+                    compute_type=compute_type,
+                    cpu_threads=_cpu_threads(),
+                    num_workers=settings.whisper_num_workers,
+                )
+            except Exception:
+                _model_state[key] = "fehler"
+                raise
+            MODEL_LOAD_SECONDS.observe(time.perf_counter() - started, profile=key)
+            _models[key] = model
+            _model_state[key] = "bereit"
+    return model
+
+
+def warm_up(profile: str | None = None) -> None:
+    model = get_model(profile)
+    segments, _ = model.transcribe(np.zeros(int(WHISPER_SAMPLE_RATE * WARMUP_SECONDS), dtype=np.float32))
+    list(segments)
+
+
+def startup_profiles() -> list[str]:
+    if not settings.whisper_preload or inference_enabled():
+        return []
+    return [live_profile()] if settings.live_transcription else []
+
+
+def preload_models(profiles: list[str]) -> None:
+    for profile in profiles:
+        _model_state.setdefault(profile, "ausstehend")
+    for profile in profiles:
+        try:
+            warm_up(profile)
+        except Exception:
+            _model_state[profile] = "fehler"
+
+
+def _local_model_status() -> dict[str, str]:
+    return dict(_model_state)
+
+
+def model_status() -> dict[str, str]:
+    if not inference_enabled():
+        return _local_model_status()
+    try:
+        return call("model_status", timeout=STATUS_TIMEOUT)
+    except InferenceError:
+        return {"inference": "fehler"}
+
+
+def _segment_dicts(
+    segments: Iterable[Any],
+    offset: float = 0.0,
+    speech_map: SpeechMap | None = None,
+) -> list[dict[str, Any]]:
+    segment_list: list[dict[str, Any]] = []
+    for segment in segments:
+        text = segment.text.strip()
+        start, end = segment.start, segment.end
+        if speech_map is not None:
+            start, end = speech_map.to_original(start), speech_map.to_original(end, end=True)
+        segment_list.append(
+            {
+                "id": segment.id,
+                "start": start + offset,
+                "end": end + offset,
+                "text": text,
+            }
         )
-        if text:
-            text = text[0].upper() + text[1:]
-            cleaned_lines.append(text)
-    return "\n".join(cleaned_lines)
+    return segment_list
+
+
+def _build_result(segment_list: list[dict[str, Any]], language: str | None, duration: float) -> dict[str, Any]:
+    for index, segment in enumerate(segment_list):
+        segment["id"] = index + 1
+    return {
+        "language": language,
+        "duration": duration,
+        "segments": segment_list,
+        "text": " ".join(segment["text"] for segment in segment_list),
+        "clean_text": clean_transcript(segment_list, language),
+    }
+
+
+def _transcribe_speech(
+    model: WhisperModel,
+    audio: Any,
+    language: str | None,
+    offset: float,
+) -> tuple[list[dict[str, Any]], str | None, SpeechMap]:
+    speech, speech_map = trim_silence(audio)
+    if not speech.size:
+        return [], language, speech_map
+    segments, info = model.transcribe(speech, language=language)
+    return _segment_dicts(segments, offset=offset, speech_map=speech_map), info.language, speech_map
 
 
-async def transcribe_file(path: Path, language: str | None = None) -> dict[str, Any]:
-    model = get_model()
+def _transcribe_pcm_range_sync(
+    path: Path,
+    start_byte: int,
+    end_byte: int | None,
+    language: str | None = None,
+    model_profile: str | None = None,
+) -> list[dict[str, Any]]:
+    model = get_model(model_profile)
+    audio = load_whisper_audio(path, start_byte, end_byte)
+    if not audio.size:
+        return []
+    offset = pcm_bytes_to_seconds(start_byte, pcm_sample_rate(path))
+    segment_list, _, _ = _transcribe_speech(model, audio, language, offset)
+    return segment_list
 
-    def _run():
-        audio_input: str
-        temp_path: str | None = None
-        if path.suffix.lower() in {".wav", ".mp3", ".m4a", ".flac", ".ogg"}:
-            audio_input = str(path)
+
+async def transcribe_pcm_range(
+    path: Path,
+    start_byte: int,
+    end_byte: int | None,
+    language: str | None = None,
+    model_profile: str | None = None,
+) -> list[dict[str, Any]]:
+    if inference_enabled():
+        return await remote_call("transcribe_pcm_range", str(path), start_byte, end_byte, language, model_profile)
+    return await asyncio.to_thread(_transcribe_pcm_range_sync, path, start_byte, end_byte, language, model_profile)
+
+
+def _init_chunk_worker(threads: int) -> None:
+    global _thread_budget
+    _thread_budget = threads
+
+
+def _get_chunk_pool() -> ProcessPoolExecutor:
+    global _chunk_pool
+    with _pool_lock:
+        if _chunk_pool is None:
+            workers = max(1, settings.transcribe_workers)
+            _chunk_pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_chunk_worker,
+                initargs=(max(1, _cpu_threads() // workers),),
+            )
+        return _chunk_pool
+
+
+def shutdown_chunk_pool() -> None:
+    global _chunk_pool
+    with _pool_lock:
+        if _chunk_pool is not None:
+            _chunk_pool.shutdown(cancel_futures=True)
+            _chunk_pool = None
+
+
+def chunk_bounds(audio: np.ndarray, chunk_seconds: float, sample_rate: int = WHISPER_SAMPLE_RATE) -> list[int]:
+    count = math.ceil(audio.size / max(1, int(chunk_seconds * sample_rate)))
+    if count <= 1:
+        return [0, audio.size]
+    frame, level = frame_levels(audio, sample_rate)
+    search = int(min(CUT_SEARCH_SECONDS, chunk_seconds / 4) / FRAME_SECONDS)
+    cuts = [0]
+    for index in range(1, count):
+        target = index * level.size // count
+        lo, hi = max(0, target - search), min(level.size, target + search + 1)
+        cut = (lo + int(np.argmin(level[lo:hi]))) * frame + frame // 2
+        if cut > cuts[-1]:
+            cuts.append(cut)
+    cuts.append(audio.size)
+    return cuts
+
+
+def _transcribe_chunk(spec: dict[str, Any]) -> dict[str, Any]:
+    model = get_model(spec["model_profile"])
+    audio = spec.get("audio")
+    if audio is None:
+        audio = load_whisper_audio(Path(spec["path"]), spec["start_byte"], spec["end_byte"])
+    segment_list, language, speech_map = _transcribe_speech(model, audio, spec["language"], spec["offset"])
+    kept = [
+        segment
+        for segment in segment_list
+        if spec["keep_start"] <= (segment["start"] + segment["end"]) / 2 < spec["keep_end"]
+    ]
+    return {"segments": kept, "language": language, "vad": speech_map.stats()}
+
+
+def _use_parallel(audio: np.ndarray) -> bool:
+    return (
+        settings.transcribe_workers > 1
+        and audio.size > settings.transcribe_chunk_seconds * WHISPER_SAMPLE_RATE * 1.5
+    )
+
+
+def _transcribe_parallel(
+    path: Path,
+    audio: np.ndarray,
+    start_byte: int,
+    offset: float,
+    language: str | None,
+    model_profile: str | None,
+) -> tuple[list[dict[str, Any]], str | None, dict[str, float]]:
+    cuts = chunk_bounds(audio, settings.transcribe_chunk_seconds)
+    overlap = int(settings.transcribe_chunk_overlap_seconds * WHISPER_SAMPLE_RATE)
+    pcm = is_pcm_file(path)
+    bytes_per_sample = PCM_SAMPLE_WIDTH * (pcm_sample_rate(path) // WHISPER_SAMPLE_RATE) if pcm else 0
+    specs = []
+    for begin, end in zip(cuts[:-1], cuts[1:]):
+        read_start = max(0, begin - overlap)
+        read_end = min(audio.size, end + overlap)
+        spec: dict[str, Any] = {
+            "model_profile": model_profile,
+            "language": language,
+            "offset": offset + read_start / WHISPER_SAMPLE_RATE,
+            "keep_start": offset + begin / WHISPER_SAMPLE_RATE,
+            "keep_end": offset + end / WHISPER_SAMPLE_RATE if end < audio.size else math.inf,
+        }
+        if pcm:
+            spec["path"] = str(path)
+            spec["start_byte"] = start_byte + read_start * bytes_per_sample
+            spec["end_byte"] = start_byte + read_end * bytes_per_sample
+        else:
+            spec["audio"] = np.ascontiguousarray(audio[read_start:read_end])
+        specs.append(spec)
+
+    results = list(_get_chunk_pool().map(_transcribe_chunk, specs))
+    segment_list = [segment for result in results for segment in result["segments"]]
+    languages = [result["language"] for result in results if result["language"]]
+    detected = language or (max(set(languages), key=languages.count) if languages else None)
+    processed = sum(result["vad"]["processed_seconds"] for result in results)
+    speech = sum(result["vad"]["speech_seconds"] for result in results)
+    stats = {
+        "processed_seconds": round(processed, 3),
+        "speech_seconds": round(speech, 3),
+        "trimmed_ratio": round(1.0 - speech / processed, 4) if processed else 0.0,
+        "chunks": len(specs),
+    }
+    return segment_list, detected, stats
+
+
+def _transcribe_file_sync(
+    path: Path,
+    language: str | None = None,
+    start_byte: int = 0,
+    prior_segments: list[dict[str, Any]] | None = None,
+    model_profile: str | None = None,
+) -> dict[str, Any]:
+    path = Path(path)
+    timings: dict[str, float] = {}
+    offset = 0.0
+    with timed("audio_conversion", timings):
+        if not is_pcm_file(path):
+            audio = decode_audio(str(path), sampling_rate=WHISPER_SAMPLE_RATE)
         else:
-            raw = path.read_bytes()
-            if not raw:
-                raise ValueError("Audiodatei ist leer")
-            temp_file = tempfile.NamedTemporaryFile(suffix=".wav", delete=False)
-            temp_path = temp_file.name
-            temp_file.close()
-            with wave.open(temp_path, "wb") as wav_file:
-                wav_file.setnchannels(1)
-                wav_file.setsampwidth(2)
-                wav_file.setframerate(48000)
-                wav_file.writeframes(raw)
-            audio_input = temp_path
+            audio = load_whisper_audio(path, start_byte)
+            offset = pcm_bytes_to_seconds(start_byte, pcm_sample_rate(path))
+    if not audio.size:
+        if not prior_segments:
+            raise ValueError("Audiodatei ist leer")
+        return _build_result(prior_segments, language, offset)
+    diarization = None
+    if settings.diarization:
+        diarization = submit_diarization(lambda: load_whisper_audio(path) if start_byte else audio)
+    if _use_parallel(audio):
+        with timed("transcription", timings):
+            tail_segments, detected_language, vad_stats = _transcribe_parallel(
+                path, audio, start_byte, offset, language, model_profile
+            )
+    else:
+        model = get_model(model_profile)
+        with timed("transcription", timings):
+            tail_segments, detected_language, speech_map = _transcribe_speech(model, audio, language, offset)
+        vad_stats = speech_map.stats()
+    audio_seconds = audio.size / WHISPER_SAMPLE_RATE
+    if timings["transcription"] > 0:
+        timings["realtime_factor"] = round(audio_seconds / timings["transcription"], 2)
+        REALTIME_FACTOR.observe(timings["realtime_factor"])
+    segment_list = [*(prior_segments or []), *tail_segments]
+    diarization_stats = None
+    if diarization is not None:
+        with timed("diarization", timings):
+            diarization_stats = finish_diarization(diarization, segment_list, timings["transcription"])
+    result = _build_result(segment_list, detected_language, offset + audio_seconds)
+    result["vad"] = vad_stats
+    if diarization_stats is not None:
+        result["diarization"] = diarization_stats
+    result["timings"] = timings
+    return result
+
+
+async def transcribe_file(
+    path: Path,
+    language: str | None = None,
+    start_byte: int = 0,
+    prior_segments: list[dict[str, Any]] | None = None,
+    model_profile: str | None = None,
+) -> dict[str, Any]:
+    if inference_enabled():
+        return await remote_call("transcribe_file", str(path), language, start_byte, prior_segments, model_profile)
+    return await asyncio.to_thread(_transcribe_file_sync, path, language, start_byte, prior_segments, model_profile)
+
+
+def _with_snapshot(handler: Callable[..., Any]) -> Callable[..., Any]:
+    def _run(*args: Any, **kwargs: Any) -> Any:
         try:
-            segments, info = model.transcribe(audio_input, language=language)
+            return handler(*args, **kwargs)
         finally:
-            if temp_path and os.path.exists(temp_path):
-                try:
-                    os.remove(temp_path)
-                except OSError:
-                    pass
-        segment_list: list[dict[str, Any]] = []
-        segment_texts: list[str] = []
-        for segment in segments:
-            text = segment.text.strip()
-            segment_list.append(
-                {
-                    "id": segment.id,
-                    "start": segment.start,
-                    "end": segment.end,
-                    "text": text,
-                }
-            )
-            segment_texts.append(text)
-        raw_text = " ".join(segment_texts)
-        clean_text = _clean_transcript_segments(segment_texts)
-        return {
-            "language": info.language,
-            "duration": info.duration,
-            "segments": segment_list,
-            "text": raw_text,
-            "clean_text": clean_text,
-        }
+            write_snapshot()
 
-    return await asyncio.to_thread(_run)
+    return _run
+
+
+def serve_inference(address: str | None = None) -> None:
+    global _thread_budget
+    require_authkey()
+    if settings.whisper_cpu_threads <= 0:
+        _thread_budget = max(1, (os.cpu_count() or 1) // max(1, settings.inference_concurrency))
+    profiles = configured_profiles() if settings.whisper_preload else []
+    threading.Thread(target=preload_models, args=(profiles,), name="inference-preload", daemon=True).start()
+    try:
+        serve(
+            {
+                "transcribe_file": _with_snapshot(_transcribe_file_sync),
+                "transcribe_pcm_range": _with_snapshot(
+                    lambda path, *args: _transcribe_pcm_range_sync(Path(path), *args)
+                ),
+                "model_status": _local_model_status,
+            },
+            address,
+        )
+    finally:
+        shutdown_chunk_pool()
@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import math
+
+import numpy as np
+
+from ..config import get_settings
+from .audio import WHISPER_SAMPLE_RATE
+
+settings = get_settings()
+
+FRAME_SECONDS = 0.03
+MIN_SPEECH_SECONDS = 0.2
+
+
+class SpeechMap:
+    def __init__(self, regions: list[tuple[int, int]], total_samples: int, sample_rate: int = WHISPER_SAMPLE_RATE):
+        self.regions = regions
+        self.total_samples = total_samples
+        self.sample_rate = sample_rate
+        lengths = np.array([end - start for start, end in regions], dtype=np.int64)
+        self.compact_starts = np.concatenate(([0], np.cumsum(lengths)[:-1])) if regions else np.zeros(0, np.int64)
+        self.speech_samples = int(lengths.sum()) if regions else 0
+
+    def to_original(self, seconds: float, end: bool = False) -> float:
+        if not self.regions:
+            return seconds
+        sample = seconds * self.sample_rate
+        index = int(np.searchsorted(self.compact_starts, sample, side="left" if end else "right")) - 1
+        index = min(max(index, 0), len(self.regions) - 1)
+        return (self.regions[index][0] + sample - self.compact_starts[index]) / self.sample_rate
+
+    def stats(self) -> dict[str, float]:
+        total = self.total_samples / self.sample_rate
+        speech = self.speech_samples / self.sample_rate
+        return {
+            "processed_seconds": round(total, 3),
+            "speech_seconds": round(speech, 3),
+            "trimmed_ratio": round(1.0 - speech / total, 4) if total else 0.0,
+        }
+
+
+def frame_levels(audio: np.ndarray, sample_rate: int = WHISPER_SAMPLE_RATE) -> tuple[int, np.ndarray]:
+    frame = int(sample_rate * FRAME_SECONDS)
+    count = audio.size // frame
+    frames = audio[: count * frame].reshape(count, frame)
+    rms = np.sqrt(np.einsum("ij,ij->i", frames, frames) / frame)
+    return frame, 20.0 * np.log10(np.maximum(rms, 1e-10))
+
+
+def detect_speech(audio: np.ndarray, sample_rate: int = WHISPER_SAMPLE_RATE) -> list[tuple[int, int]]:
+    frame, level = frame_levels(audio, sample_rate)
+    count = level.size
+    if count == 0:
+        return [(0, audio.size)] if audio.size else []
+
+    floor, peak = (float(value) for value in np.percentile(level, [10, 90]))
+    if peak - floor < settings.vad_margin_db:
+        return [(0, audio.size)]
+    threshold = max(settings.vad_threshold_db, min(floor + settings.vad_margin_db, settings.vad_max_threshold_db))
+    speech = np.concatenate(([False], level > threshold, [False]))
+    edges = np.flatnonzero(np.diff(speech.astype(np.int8)))
+
+    min_gap = math.ceil(settings.vad_min_silence_seconds / FRAME_SECONDS)
+    min_speech = math.ceil(MIN_SPEECH_SECONDS / FRAME_SECONDS)
+    padding = math.ceil(settings.vad_padding_seconds / FRAME_SECONDS)
+
+    merged: list[list[int]] = []
+    for start, end in zip(edges[::2].tolist(), edges[1::2].tolist()):
+        if merged and start - merged[-1][1] < min_gap:
+            merged[-1][1] = end
+        else:
+            merged.append([start, end])
+
+    regions: list[tuple[int, int]] = []
+    for start, end in merged:
+        if end - start < min_speech:
+            continue
+        start = max(0, start - padding) * frame
+        end = audio.size if end + padding >= count else (end + padding) * frame
+        if regions and start <= regions[-1][1]:
+            regions[-1] = (regions[-1][0], end)
+        else:
+            regions.append((start, end))
+    return regions
+
+
+def trim_silence(audio: np.ndarray, sample_rate: int = WHISPER_SAMPLE_RATE) -> tuple[np.ndarray, SpeechMap]:
+    if not settings.vad_enabled or audio.size < sample_rate * settings.vad_min_silence_seconds * 2:
+        return audio, SpeechMap([(0, audio.size)] if audio.size else [], audio.size, sample_rate)
+    regions = detect_speech(audio, sample_rate)
+    if not regions or (len(regions) == 1 and regions[0] == (0, audio.size)):
+        return audio, SpeechMap([(0, audio.size)], audio.size, sample_rate)
+    compact = np.concatenate([audio[start:end] for start, end in regions])
+    return compact, SpeechMap(regions, audio.size, sample_rate)
@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import datetime as dt
+import json
+import os
+import sys
+from typing import Any
+
+from app.config import get_settings
+from app.database import SessionLocal
+from app.migrations import migrate
+from app.models import ProcessingBatch
+from app.services.app_settings import current_app_settings
+from app.services.backfill import BATCH_MODES, batch_state, run_batch
+from app.services.jobs import claim_next_batch, enqueue_batch, requeue_stale_jobs
+from app.services.summarizer import close_http_client
+from app.services.transcribe import shutdown_chunk_pool
+
+
+def _worker() -> str:
+    return f"cli-{os.getpid()}"
+
+
+def _create(args: argparse.Namespace) -> str | None:
+    filters: dict[str, Any] = {
+        "session_ids": args.session or None,
+        "status": args.status or None,
+        "created_from": args.created_from,
+        "created_to": args.created_to,
+        "limit": args.limit,
+    }
+    filters = {key: value for key, value in filters.items() if value is not None}
+    with SessionLocal() as db:
+        batch = enqueue_batch(
+            db,
+            args.mode,
+            filters,
+            settings_snapshot=None if args.keep_session_settings else current_app_settings(db)[0],
+            worker=None if args.detach else _worker(),
+        )
+        return batch.id if batch else None
+
+
+async def _print_progress(state: dict[str, Any]) -> None:
+    print(json.dumps(state, ensure_ascii=False), flush=True)
+
+
+async def _run(batch_id: str, claimed: bool) -> dict[str, Any] | None:
+    worker = _worker()
+    try:
+        if not claimed:
+            with SessionLocal() as db:
+                if claim_next_batch(db, worker, batch_id=batch_id) is None:
+                    return None
+        return await run_batch(batch_id, worker, on_progress=_print_progress)
+    finally:
+        await close_http_client()
+        shutdown_chunk_pool()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Erzeugt Protokolle oder Transkripte fuer bestehende Sitzungen neu.")
+    parser.add_argument("--mode", choices=BATCH_MODES, default="resummarize")
+    parser.add_argument("--session", action="append", help="Sitzungs-ID (mehrfach moeglich)")
+    parser.add_argument("--status", default="completed", help="nur Sitzungen mit diesem Status, leer = alle abgeschlossenen")
+    parser.add_argument("--created-from", type=dt.datetime.fromisoformat, default=None)
+    parser.add_argument("--created-to", type=dt.datetime.fromisoformat, default=None)
+    parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument(
+        "--keep-session-settings",
+        action="store_true",
+        help="Einstellungen der jeweiligen Sitzung statt der aktuellen Einstellungen verwenden",
+    )
+    parser.add_argument("--resume", metavar="BATCH_ID", help="abgebrochenen Stapelauftrag fortsetzen")
+    parser.add_argument("--status-only", metavar="BATCH_ID", help="nur den Fortschritt anzeigen")
+    parser.add_argument("--detach", action="store_true", help="nur einreihen, Verarbeitung uebernehmen die Worker")
+    args = parser.parse_args()
+    if get_settings().db_auto_migrate:
+        migrate()
+
+    if args.status_only:
+        with SessionLocal() as db:
+            batch = db.get(ProcessingBatch, args.status_only)
+            if batch is None:
+                print("Stapelauftrag nicht gefunden", file=sys.stderr)
+                return 1
+            print(json.dumps(batch_state(batch), ensure_ascii=False))
+        return 0
+
+    if args.resume:
+        batch_id = args.resume
+        if not requeue_stale_jobs(batch_id):
+            print("Stapelauftrag wird noch von einem anderen Prozess verarbeitet", file=sys.stderr)
+            return 1
+    else:
+        batch_id = _create(args)
+        if batch_id is None:
+            print("Keine passenden Sitzungen gefunden", file=sys.stderr)
+            return 1
+        print(json.dumps({"batch_id": batch_id}), flush=True)
+    if args.detach:
+        return 0
+
+    state = asyncio.run(_run(batch_id, claimed=not args.resume))
+    if state is None:
+        print("Stapelauftrag wird bereits verarbeitet oder existiert nicht", file=sys.stderr)
+        return 1
+    return 0 if state["failed"] == 0 else 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
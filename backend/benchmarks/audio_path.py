@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+import wave
+from pathlib import Path
+
+import numpy as np
+
+from app.services.audio import PCM_SAMPLE_RATE, PCM_SAMPLE_WIDTH, load_whisper_audio
+
+
+def write_synthetic_pcm(path: Path, minutes: float, seed: int = 0) -> None:
+    rng = np.random.default_rng(seed)
+    total = int(minutes * 60 * PCM_SAMPLE_RATE)
+    block = PCM_SAMPLE_RATE * 10
+    with path.open("wb") as f:
+        for begin in range(0, total, block):
+            count = min(block, total - begin)
+            t = (np.arange(count) + begin) / PCM_SAMPLE_RATE
+            tone = 6000 * np.sin(2 * np.pi * 220 * t) * (np.sin(2 * np.pi * 0.3 * t) > 0)
+            noise = rng.normal(0, 300, count)
+            f.write((tone + noise).astype("<i2").tobytes())
+
+
+def _wav_tempfile_path(path: Path) -> np.ndarray:
+    from faster_whisper.audio import decode_audio
+
+    raw = path.read_bytes()
+    temp_file = tempfile.NamedTemporaryFile(suffix=".wav", delete=False)
+    temp_path = temp_file.name
+    temp_file.close()
+    try:
+        with wave.open(temp_path, "wb") as wav_file:
+            wav_file.setnchannels(1)
+            wav_file.setsampwidth(PCM_SAMPLE_WIDTH)
+            wav_file.setframerate(PCM_SAMPLE_RATE)
+            wav_file.writeframes(raw)
+        return decode_audio(temp_path)
+    finally:
+        os.remove(temp_path)
+
+
+def _array_path(path: Path) -> np.ndarray:
+    return load_whisper_audio(path)
+
+
+PATHS = {"wav": _wav_tempfile_path, "array": _array_path}
+
+
+def _measure(name: str, path: str, queue) -> None:
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started = time.perf_counter()
+    audio = PATHS[name](Path(path))
+    elapsed = time.perf_counter() - started
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    queue.put({"path": name, "seconds": elapsed, "peak_rss_mb": (peak - baseline) / 1024, "samples": int(audio.shape[0])})
+
+
+def run(minutes: list[float], repeat: int = 3) -> list[dict]:
+    context = multiprocessing.get_context("spawn")
+    results: list[dict] = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for length in minutes:
+            pcm_path = Path(workdir) / f"bench_{length}.raw"
+            write_synthetic_pcm(pcm_path, length)
+            size_mb = pcm_path.stat().st_size / (1024 * 1024)
+            for name in PATHS:
+                runs = []
+                for _ in range(repeat):
+                    queue = context.Queue()
+                    process = context.Process(target=_measure, args=(name, str(pcm_path), queue))
+                    process.start()
+                    runs.append(queue.get())
+                    process.join()
+                results.append(
+                    {
+                        "minutes": length,
+                        "input_mb": round(size_mb, 1),
+                        "path": name,
+                        "seconds": round(min(r["seconds"] for r in runs), 3),
+                        "peak_rss_mb": round(max(r["peak_rss_mb"] for r in runs), 1),
+                    }
+                )
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Vergleicht WAV-Tempdatei- und NumPy-Pfad fuer Roh-PCM.")
+    parser.add_argument("--minutes", type=float, nargs="+", default=[5, 30, 90])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    print(json.dumps(run(args.minutes, args.repeat), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import itertools
+import json
+import tempfile
+import time
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+from app.config import get_settings
+from app.services import transcribe
+from app.services.audio import WHISPER_SAMPLE_RATE
+from app.services.diarize import assign_speakers, diarize, diarization_budget
+
+settings = get_settings()
+
+_VOWELS = np.array(
+    [[730, 1090, 2440], [530, 1840, 2480], [270, 2290, 3010], [570, 840, 2410], [300, 870, 2240]],
+    dtype=np.float64,
+)
+_VOICES = [(105.0, 1.0), (210.0, 1.17), (140.0, 0.9), (180.0, 1.08), (95.0, 0.95), (240.0, 1.25)]
+
+
+def _syllable(rng: np.random.Generator, f0: float, scale: float, seconds: float) -> np.ndarray:
+    count = int(seconds * WHISPER_SAMPLE_RATE)
+    t = np.arange(count) / WHISPER_SAMPLE_RATE
+    pitch = f0 * (1.0 + 0.03 * np.sin(2 * np.pi * rng.uniform(3, 6) * t) + rng.normal(0, 0.01))
+    harmonics = np.arange(1, int(3800 // f0) + 1)
+    formants = _VOWELS[rng.integers(len(_VOWELS))] * scale
+    frequencies = harmonics * f0
+    bandwidth = 60.0 + 0.06 * formants
+    gain = (1.0 / (1.0 + ((frequencies[:, None] - formants) / bandwidth) ** 2)).sum(axis=1) / np.sqrt(harmonics)
+    phase = np.cumsum(pitch) * 2 * np.pi / WHISPER_SAMPLE_RATE
+    wave = np.sin(np.outer(phase, harmonics) + rng.uniform(0, 2 * np.pi, harmonics.size)) @ gain
+    return wave * np.hanning(count) / max(1e-9, np.abs(wave).max())
+
+
+def synthetic_conversation(
+    minutes: float, speakers: int, seed: int = 0
+) -> tuple[np.ndarray, list[tuple[float, float, int]]]:
+    rng = np.random.default_rng(seed)
+    total = int(minutes * 60 * WHISPER_SAMPLE_RATE)
+    pieces: list[np.ndarray] = []
+    turns: list[tuple[float, float, int]] = []
+    position = 0
+    speaker = 0
+    while position < total:
+        f0, scale = _VOICES[speaker % len(_VOICES)]
+        start = position
+        target = position + int(rng.uniform(2.0, 8.0) * WHISPER_SAMPLE_RATE)
+        while position < target:
+            syllable = _syllable(rng, f0, scale, rng.uniform(0.15, 0.3)) * rng.uniform(0.3, 0.6)
+            gap = np.zeros(int(rng.uniform(0.01, 0.08) * WHISPER_SAMPLE_RATE))
+            pieces.extend((syllable, gap))
+            position += syllable.size + gap.size
+        turns.append((start / WHISPER_SAMPLE_RATE, position / WHISPER_SAMPLE_RATE, speaker))
+        pause = np.zeros(int(rng.uniform(0.3, 0.9) * WHISPER_SAMPLE_RATE))
+        pieces.append(pause)
+        position += pause.size
+        speaker = (speaker + int(rng.integers(1, speakers))) % speakers if speakers > 1 else 0
+    audio = np.concatenate(pieces)[:total]
+    audio = audio + rng.normal(0, 0.003, audio.size)
+    return audio.astype(np.float32), turns
+
+
+def _truth_at(times: np.ndarray, turns: list[tuple[float, float, int]]) -> np.ndarray:
+    truth = np.full(times.size, -1, dtype=np.int64)
+    for start, end, speaker in turns:
+        truth[(times >= start) & (times < end)] = speaker
+    return truth
+
+
+def _accuracy(predicted: np.ndarray, truth: np.ndarray) -> float:
+    mask = truth >= 0
+    if not mask.any():
+        return 1.0
+    predicted, truth = predicted[mask], truth[mask]
+    rows, cols = int(predicted.max()) + 1, int(truth.max()) + 1
+    confusion = np.zeros((rows, cols), dtype=np.int64)
+    np.add.at(confusion, (predicted, truth), 1)
+    size = max(rows, cols)
+    padded = np.zeros((size, size), dtype=np.int64)
+    padded[:rows, :cols] = confusion
+    if size <= 7:
+        best = max(padded[np.arange(size), list(order)].sum() for order in itertools.permutations(range(size)))
+    else:
+        best = padded.max(axis=1).sum()
+    return round(float(best) / predicted.size, 4)
+
+
+def quality(minutes: float, speaker_counts: list[int]) -> list[dict[str, Any]]:
+    results = []
+    for speakers in speaker_counts:
+        audio, turns = synthetic_conversation(minutes, speakers)
+        started = time.perf_counter()
+        centers, labels = diarize(audio)
+        elapsed = time.perf_counter() - started
+        segments = [
+            {"start": float(start), "end": float(min(end, start + 3.0))}
+            for turn_start, turn_end, _ in turns
+            for start, end in [(s, turn_end) for s in np.arange(turn_start, turn_end - 0.5, 3.0)]
+        ]
+        assign_speakers(segments, centers, labels)
+        segment_truth = _truth_at(np.array([(s["start"] + s["end"]) / 2 for s in segments]), turns)
+        labelled = np.array([int(s["speaker"].rsplit(" ", 1)[1]) - 1 for s in segments])
+        audio_seconds = audio.size / WHISPER_SAMPLE_RATE
+        results.append(
+            {
+                "case": "diarization_quality",
+                "variant": f"{minutes:g}min/{speakers}spk",
+                "seconds": round(elapsed, 3),
+                "realtime_factor": round(audio_seconds / elapsed, 1),
+                "speakers_found": int(labels.max()) + 1 if labels.size else 0,
+                "window_accuracy": _accuracy(labels, _truth_at(centers, turns)),
+                "segment_accuracy": _accuracy(labelled, segment_truth),
+            }
+        )
+    return results
+
+
+def _write_pcm(path: Path, audio: np.ndarray) -> None:
+    path.write_bytes((np.clip(audio, -1, 1) * 32767).astype("<i2").tobytes())
+
+
+class _BusyModel:
+    def __init__(self, realtime_factor: float):
+        self.realtime_factor = realtime_factor
+        started = time.perf_counter()
+        self._work(200)
+        self.steps_per_second = 200 / (time.perf_counter() - started)
+
+    @staticmethod
+    def _work(steps: int) -> None:
+        matrix = np.ones((256, 256), dtype=np.float32)
+        for _ in range(steps):
+            matrix = np.tanh(matrix @ matrix)
+
+    def transcribe(self, audio: np.ndarray, language: str | None = None, **kwargs: Any):
+        seconds = audio.size / WHISPER_SAMPLE_RATE
+        self._work(int(self.steps_per_second * seconds / self.realtime_factor))
+        segment = type("Segment", (), {"id": 1, "start": 0.0, "end": seconds, "text": "synthetisch"})
+        return iter([segment]), type("Info", (), {"language": language or "de"})
+
+
+def overhead(minutes: float, speakers: int, model: str | None, whisper_rtf: float | None, repeat: int) -> list[dict[str, Any]]:
+    audio, _ = synthetic_conversation(minutes, speakers)
+    if whisper_rtf:
+        busy = _BusyModel(whisper_rtf)
+        transcribe.get_model = lambda profile=None: busy
+    else:
+        transcribe.get_model(model)
+    settings.vad_enabled = False
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        path = Path(workdir) / "audio.pcm"
+        _write_pcm(path, audio)
+        samples: dict[bool, list[float]] = {False: [], True: []}
+        detail: dict[str, Any] = {}
+        for _ in range(repeat):
+            for enabled in (False, True):
+                settings.diarization = enabled
+                started = time.perf_counter()
+                result = asyncio.run(transcribe.transcribe_file(path, language="de", model_profile=model))
+                samples[enabled].append(time.perf_counter() - started)
+                if enabled:
+                    detail = result.get("diarization", {})
+        plain, diarized = min(samples[False]), min(samples[True])
+        extra = diarized - plain
+        budget = diarization_budget(plain)
+        results.append(
+            {
+                "case": "diarization_overhead",
+                "variant": f"{minutes:g}min/" + (f"stub_rtf{whisper_rtf:g}" if whisper_rtf else str(model or "default")),
+                "transcription_seconds": round(plain, 3),
+                "with_diarization_seconds": round(diarized, 3),
+                "overhead_seconds": round(extra, 3),
+                "overhead_ratio": round(extra / plain, 4) if plain else 0.0,
+                "budget_seconds": round(budget, 3),
+                "within_budget": extra <= budget,
+                "diarization": detail,
+            }
+        )
+    settings.diarization = False
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Qualitaet und Zusatzlaufzeit der Sprechererkennung.")
+    parser.add_argument("--minutes", type=float, default=10.0)
+    parser.add_argument("--speakers", type=int, nargs="+", default=[2, 3, 4])
+    parser.add_argument("--model", default=None, help="Whisper-Profil fuer die Laufzeitmessung, z. B. base:int8")
+    parser.add_argument(
+        "--whisper-rtf",
+        type=float,
+        default=None,
+        help="statt Whisper eine CPU-Last mit diesem Echtzeitfaktor verwenden (ohne Modell-Download)",
+    )
+    parser.add_argument("--repeat", type=int, default=1)
+    args = parser.parse_args()
+    results = quality(args.minutes, args.speakers)
+    results += overhead(args.minutes, max(args.speakers), args.model, args.whisper_rtf, args.repeat)
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
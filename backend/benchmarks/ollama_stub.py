@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SUMMARY_TEXT = """1. **Agenda-Überblick**
+Budgetplanung 2025, Personalbedarf und Zeitplan für den Launch wurden besprochen.
+2. **Entscheidungen**
+Das Budget wird um 10 Prozent erhöht. Der Launch bleibt im dritten Quartal.
+3. **Aufgaben**
+Anna erstellt bis Freitag den Plan. Tom klärt die Lizenzen mit dem Einkauf.
+4. **Verantwortliche**
+Anna (Planung), Tom (Einkauf).
+5. **Fristen**
+Plan bis Freitag, Lizenzen bis Monatsende.
+6. **Risiken**
+Lieferverzug bei der Hardware.
+7. **Offene Punkte**
+Freigabe durch die Geschäftsführung steht aus.
+8. **Highlights**
+- Konstruktive Diskussion zum Zeitplan
+- Einigkeit beim Budget
+"""
+
+
+class OllamaStub:
+    def __init__(
+        self,
+        port: int = 0,
+        first_token_latency: float = 0.2,
+        token_latency: float = 0.005,
+        text: str = SUMMARY_TEXT,
+    ):
+        self.first_token_latency = first_token_latency
+        self.token_latency = token_latency
+        self.text = text
+        self.requests = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args) -> None:
+                pass
+
+            def do_POST(self) -> None:
+                length = int(self.headers.get("content-length", 0))
+                body = json.loads(self.rfile.read(length) or b"{}")
+                stub.requests += 1
+                time.sleep(stub.first_token_latency)
+                if not body.get("stream", True):
+                    data = json.dumps({"response": stub.text, "done": True}).encode()
+                    self.send_response(200)
+                    self.send_header("content-type", "application/json")
+                    self.send_header("content-length", str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                    return
+                self.send_response(200)
+                self.send_header("content-type", "application/x-ndjson")
+                self.send_header("transfer-encoding", "chunked")
+                self.end_headers()
+                for token in stub.text.split(" "):
+                    self._chunk({"response": token + " ", "done": False})
+                    if stub.token_latency:
+                        time.sleep(stub.token_latency)
+                self._chunk({"response": "", "done": True})
+                self.wfile.write(b"0\r\n\r\n")
+
+            def _chunk(self, payload: dict) -> None:
+                data = (json.dumps(payload) + "\n").encode()
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+                self.wfile.flush()
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        self.url = f"http://127.0.0.1:{self.port}"
+
+    def __enter__(self) -> "OllamaStub":
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import tempfile
+import time
+from pathlib import Path
+
+from app.config import get_settings
+from app.services import transcribe
+from app.services.audio import WHISPER_SAMPLE_RATE, is_pcm_file, load_whisper_audio
+
+from .audio_path import write_synthetic_pcm
+
+settings = get_settings()
+
+
+def _duration(path: Path) -> float:
+    if is_pcm_file(path):
+        return load_whisper_audio(path).size / WHISPER_SAMPLE_RATE
+    from faster_whisper import decode_audio
+
+    return decode_audio(str(path), sampling_rate=WHISPER_SAMPLE_RATE).size / WHISPER_SAMPLE_RATE
+
+
+def _run_once(path: Path, language: str | None, model: str | None) -> tuple[float, dict]:
+    started = time.perf_counter()
+    result = asyncio.run(transcribe.transcribe_file(path, language=language, model_profile=model))
+    return time.perf_counter() - started, result
+
+
+def run(path: Path, workers: list[int], language: str | None, model: str | None, repeat: int) -> list[dict]:
+    duration = _duration(path)
+    reports: list[dict] = []
+    baseline: float | None = None
+    for count in workers:
+        transcribe.shutdown_chunk_pool()
+        settings.transcribe_workers = count
+        settings.transcribe_chunk_seconds = duration / count if count > 1 else duration
+        cold, _ = _run_once(path, language, model)
+        timings = []
+        result: dict = {}
+        for _ in range(repeat):
+            elapsed, result = _run_once(path, language, model)
+            timings.append(elapsed)
+        best = min(timings)
+        baseline = baseline or best
+        reports.append(
+            {
+                "workers": count,
+                "chunks": result.get("vad", {}).get("chunks", 1),
+                "audio_seconds": round(duration, 1),
+                "cold_seconds": round(cold, 2),
+                "seconds": round(best, 2),
+                "realtime_factor": round(duration / best, 1),
+                "speedup": round(baseline / best, 2),
+                "segments": len(result.get("segments", [])),
+            }
+        )
+    transcribe.shutdown_chunk_pool()
+    return reports
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Misst die Transkriptionsdauer einer Aufnahme je nach Anzahl paralleler Chunks.")
+    parser.add_argument("--audio", type=Path, default=None, help="Aufnahme (PCM oder Audiodatei), sonst synthetisch")
+    parser.add_argument("--minutes", type=float, default=10.0)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--model", default=None, help="Whisper-Profil, z. B. base:int8")
+    parser.add_argument("--language", default="de")
+    parser.add_argument("--repeat", type=int, default=1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        path = args.audio
+        if path is None:
+            path = Path(workdir) / "audio.raw"
+            write_synthetic_pcm(path, args.minutes)
+        reports = run(path, args.workers, args.language, args.model, args.repeat)
+    print(json.dumps(reports, indent=2))
+
+
+if __name__ == "__main__":
+    main()
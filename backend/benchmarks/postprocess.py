@@ -0,0 +1,179 @@
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import re
+import time
+from typing import Any
+
+from app.services.postprocess import TranscriptCleaner, clean_transcript
+
+_LEGACY_NOISE = re.compile(r"[^a-zA-ZäöüÄÖÜß\s,.?!-]")
+
+_WORDS = (
+    "wir besprechen das budget fuer das naechste quartal und die planung der aufgaben im team "
+    "anna uebernimmt den entwurf bis freitag tom klaert die lizenzen mit dem einkauf "
+    "die entscheidung ueber den launch faellt in der naechsten sitzung risiken sehen wir bei der hardware"
+).split()
+_NUMBERS = ("am 14. März", "bis 30.06.2025", "um 10:30 Uhr", "25.000 €", "3,5 Prozent", "§ 5", "Version 2.1", "12 %")
+_NOISE = ("♪", "#", "[Musik]", "*", "…")
+
+FIXTURES: list[dict[str, Any]] = [
+    {
+        "name": "frist_mit_datum",
+        "segments": [("Die Abgabe ist bis zum 30.06.2025 fällig .", 0.0, 3.0)],
+        "expect": ["30.06.2025"],
+    },
+    {
+        "name": "budget_und_prozent",
+        "segments": [("Das Budget steigt um 12 % auf 25.000 € .", 0.0, 3.0)],
+        "expect": ["12 %", "25.000 €"],
+    },
+    {
+        "name": "uhrzeit_kurzes_fragment",
+        "segments": [("Termin", 0.0, 0.6), ("um 10:30 Uhr im Raum 4 ,", 0.8, 2.0)],
+        "expect": ["Termin um 10:30 Uhr im Raum 4,"],
+    },
+    {
+        "name": "paragraph_und_version",
+        "segments": [("Laut § 5 gilt Version 2.1 ab Q3 .", 0.0, 3.0)],
+        "expect": ["§ 5", "Version 2.1", "Q3"],
+    },
+    {
+        "name": "musik_rauschen",
+        "segments": [("♪ ♪", 0.0, 2.0), ("Anna übernimmt den Entwurf ♪", 2.0, 4.0)],
+        "expect": ["Anna übernimmt den Entwurf"],
+        "reject": ["♪"],
+    },
+    {
+        "name": "englische_zahlen",
+        "language": "en",
+        "segments": [("We ship 3 releases by March 1st , right ?", 0.0, 3.0)],
+        "expect": ["3 releases", "March 1st, right?"],
+    },
+]
+
+
+def _legacy_clean(segment_texts: list[str]) -> str:
+    cleaned_lines: list[str] = []
+    for raw_line in segment_texts:
+        text = raw_line.strip()
+        if len(text.split()) < 3:
+            continue
+        if _LEGACY_NOISE.search(text):
+            continue
+        text = text.replace(" ,", ",").replace(" .", ".").replace(" ?", "?").replace(" !", "!")
+        if text:
+            text = text[0].upper() + text[1:]
+            cleaned_lines.append(text)
+    return "\n".join(cleaned_lines)
+
+
+def synthetic_segments(count: int, seed: int = 0) -> list[dict[str, Any]]:
+    rng = random.Random(seed)
+    segments = []
+    position = 0.0
+    for _ in range(count):
+        words = rng.choices(_WORDS, k=rng.randint(1, 16))
+        if rng.random() < 0.2:
+            words.insert(rng.randrange(len(words) + 1), rng.choice(_NUMBERS))
+        if rng.random() < 0.05:
+            words.append(rng.choice(_NOISE))
+        duration = 0.3 * len(words)
+        segments.append(
+            {
+                "start": round(position, 2),
+                "end": round(position + duration, 2),
+                "text": " ".join(words) + rng.choice([".", " .", "?", " ,", ""]),
+            }
+        )
+        position += duration + rng.choice([0.1, 0.4, 2.5])
+    return segments
+
+
+def quality() -> list[dict[str, Any]]:
+    results = []
+    for fixture in FIXTURES:
+        segments = [{"start": start, "end": end, "text": text} for text, start, end in fixture["segments"]]
+        language = fixture.get("language", "de")
+        outputs = {
+            "postprocess": clean_transcript(segments, language),
+            "legacy": _legacy_clean([segment["text"] for segment in segments]),
+        }
+        for variant, output in outputs.items():
+            retained = sum(expected in output for expected in fixture["expect"])
+            rejected = sum(marker in output for marker in fixture.get("reject", []))
+            results.append(
+                {
+                    "case": "postprocess_quality",
+                    "variant": f"{fixture['name']}/{variant}",
+                    "retained": f"{retained}/{len(fixture['expect'])}",
+                    "passed": retained == len(fixture["expect"]) and not rejected,
+                }
+            )
+    return results
+
+
+def _numbers_retained(text: str, segments: list[dict[str, Any]]) -> float:
+    text = text.lower()
+    numbers = [number.lower() for number in _NUMBERS]
+    expected = sum(segment["text"].lower().count(number) for segment in segments for number in numbers)
+    return round(sum(text.count(number) for number in numbers) / expected, 4) if expected else 1.0
+
+
+def throughput(counts: list[int], repeat: int = 5) -> list[dict[str, Any]]:
+    results = []
+    for count in counts:
+        segments = synthetic_segments(count)
+        texts = [segment["text"] for segment in segments]
+        variants = {
+            "postprocess": lambda: clean_transcript(segments, "de"),
+            "legacy": lambda: _legacy_clean(texts),
+        }
+        for variant, call in variants.items():
+            samples = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                output = call()
+                samples.append(time.perf_counter() - started)
+            best = min(samples)
+            results.append(
+                {
+                    "case": "postprocess_throughput",
+                    "variant": f"{count}/{variant}",
+                    "seconds": round(best, 5),
+                    "segments_per_second": round(count / best),
+                    "lines": output.count("\n") + 1 if output else 0,
+                    "numbers_retained": _numbers_retained(output, segments),
+                }
+            )
+        streaming = TranscriptCleaner("de")
+        started = time.perf_counter()
+        lines = 0
+        for index in range(0, count, 20):
+            lines += len(streaming.feed(segments[index:index + 20]))
+        lines += len(streaming.finish())
+        elapsed = time.perf_counter() - started
+        results.append(
+            {
+                "case": "postprocess_throughput",
+                "variant": f"{count}/streaming",
+                "seconds": round(elapsed, 5),
+                "segments_per_second": round(count / elapsed),
+                "lines": lines,
+            }
+        )
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Durchsatz und Qualitaet der Transkript-Nachbearbeitung.")
+    parser.add_argument("--segments", type=int, nargs="+", default=[10000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    print(json.dumps(quality() + throughput(args.segments, args.repeat), indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,380 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import datetime as dt
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import statistics
+import subprocess
+import tempfile
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Callable
+
+from .audio_path import write_synthetic_pcm
+from .ollama_stub import SUMMARY_TEXT, OllamaStub
+
+CASES = ("transcribe", "clean", "structure", "summarize", "api")
+
+_WORDS = (
+    "wir besprechen das budget fuer das naechste quartal und die planung der aufgaben im team "
+    "anna uebernimmt den entwurf bis freitag tom klaert die lizenzen mit dem einkauf "
+    "die entscheidung ueber den launch faellt in der naechsten sitzung risiken sehen wir bei der hardware"
+).split()
+
+
+def _peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _sentences(count: int, seed: int = 0) -> list[str]:
+    rng = random.Random(seed)
+    texts = []
+    for _ in range(count):
+        words = rng.choices(_WORDS, k=rng.randint(2, 16))
+        if rng.random() < 0.05:
+            words.append("#§%")
+        texts.append(" ".join(words) + rng.choice([".", " .", "?", " ,", ""]))
+    return texts
+
+
+def _timings(samples: list[float]) -> dict[str, float]:
+    ordered = sorted(samples)
+    return {
+        "p50_ms": round(statistics.median(ordered) * 1000, 3),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 3),
+    }
+
+
+def bench_transcribe(workdir: Path, minutes: list[float], model: str | None) -> list[dict[str, Any]]:
+    from app.services.transcribe import get_model, transcribe_file
+
+    get_model(model)
+    results = []
+    for length in minutes:
+        path = workdir / f"fixture_{length:g}min.raw"
+        if not path.exists():
+            write_synthetic_pcm(path, length)
+        started = time.perf_counter()
+        result = asyncio.run(transcribe_file(path, language="de", model_profile=model))
+        elapsed = time.perf_counter() - started
+        results.append(
+            {
+                "case": "transcribe_file",
+                "variant": f"{length:g}min",
+                "seconds": round(elapsed, 3),
+                "realtime_factor": round(length * 60 / elapsed, 2),
+                "segments": len(result["segments"]),
+                "speech_ratio": round(1.0 - result.get("vad", {}).get("trimmed_ratio", 0.0), 3),
+            }
+        )
+    return results
+
+
+def bench_clean(counts: list[int]) -> list[dict[str, Any]]:
+    from app.services.postprocess import clean_transcript
+
+    from .postprocess import quality, synthetic_segments
+
+    results = []
+    for count in counts:
+        segments = synthetic_segments(count)
+        samples = []
+        for _ in range(5):
+            started = time.perf_counter()
+            clean_transcript(segments, "de")
+            samples.append(time.perf_counter() - started)
+        best = min(samples)
+        results.append(
+            {
+                "case": "clean_transcript",
+                "variant": f"{count}",
+                "seconds": round(best, 5),
+                "segments_per_second": round(count / best),
+            }
+        )
+    fixtures = [item for item in quality() if item["variant"].endswith("/postprocess")]
+    results.append(
+        {
+            "case": "clean_quality",
+            "variant": "fixtures",
+            "passed": f"{sum(item['passed'] for item in fixtures)}/{len(fixtures)}",
+        }
+    )
+    return results
+
+
+def bench_structure(iterations: int) -> list[dict[str, Any]]:
+    from app.schemas import SettingsPayload
+    from app.services.summarizer import get_template
+
+    session_settings = SettingsPayload().model_dump()
+    started = time.perf_counter()
+    for _ in range(iterations):
+        get_template(session_settings).structure(SUMMARY_TEXT).structured()
+    elapsed = time.perf_counter() - started
+    return [
+        {
+            "case": "structure_summary",
+            "variant": f"{iterations}x",
+            "seconds": round(elapsed, 4),
+            "ops_per_second": round(iterations / elapsed),
+        }
+    ]
+
+
+def bench_summarize(minutes: list[float]) -> list[dict[str, Any]]:
+    from app.schemas import SettingsPayload
+    from app.services.summarizer import close_http_client, summarize
+
+    async def _run(transcript: str) -> tuple[float, dict[str, Any]]:
+        try:
+            started = time.perf_counter()
+            summary = await summarize(transcript, SettingsPayload().model_dump())
+            return time.perf_counter() - started, summary
+        finally:
+            await close_http_client()
+
+    results = []
+    for length in minutes:
+        words = int(length * 130)
+        transcript = " ".join(_sentences(words // 9, seed=int(length)))
+        elapsed, summary = asyncio.run(_run(transcript))
+        timings = summary.get("timings", {})
+        results.append(
+            {
+                "case": "summarize",
+                "variant": f"{length:g}min",
+                "seconds": round(elapsed, 3),
+                "mode": timings.get("mode", "fallback"),
+                "chunks": timings.get("chunks", 0),
+                "prompt_tokens_estimate": timings.get("prompt_tokens_estimate", 0),
+            }
+        )
+    return results
+
+
+def _seed_sessions(count: int) -> list[str]:
+    from sqlalchemy import func, insert, select
+
+    from app.database import SessionLocal, engine
+    from app.migrations import migrate
+    from app.models import RecordingSession
+    from app.services.search import build_search_text, ensure_search_schema
+
+    migrate()
+    with SessionLocal() as db:
+        existing = db.scalar(select(func.count()).select_from(RecordingSession)) or 0
+        if existing < count:
+            rng = random.Random(42)
+            now = dt.datetime.utcnow()
+            rows = []
+            for index in range(existing, count):
+                transcript = " ".join(_sentences(60, seed=index))
+                summary = {"sections": {"Entscheidungen": transcript[:200]}, "highlights": [], "raw": transcript[:400]}
+                rows.append(
+                    {
+                        "id": str(uuid.UUID(int=rng.getrandbits(128))),
+                        "created_at": now - dt.timedelta(minutes=index),
+                        "updated_at": now - dt.timedelta(minutes=index),
+                        "status": "completed",
+                        "title": f"Sitzung {index}",
+                        "language": "de",
+                        "transcript_text": transcript,
+                        "transcript_json": {"segments": [], "text": transcript},
+                        "summary_json": summary,
+                        "settings_snapshot": {},
+                        "search_text": build_search_text(transcript, summary),
+                    }
+                )
+                if len(rows) == 1000:
+                    db.execute(insert(RecordingSession), rows)
+                    rows = []
+            if rows:
+                db.execute(insert(RecordingSession), rows)
+            db.commit()
+            with engine.begin() as connection:
+                ensure_search_schema(connection)
+        return list(db.scalars(select(RecordingSession.id).limit(500)))
+
+
+def _measure_requests(call: Callable[[], Any], count: int) -> list[float]:
+    samples = []
+    for _ in range(count):
+        started = time.perf_counter()
+        call()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def bench_api(sessions: int, requests: int) -> list[dict[str, Any]]:
+    from fastapi.testclient import TestClient
+
+    import main
+
+    started = time.perf_counter()
+    ids = _seed_sessions(sessions)
+    seed_seconds = time.perf_counter() - started
+    client = TestClient(main.app)
+    rng = random.Random(7)
+    cursor: list[str | None] = [None]
+
+    def _list_page() -> None:
+        params = {"limit": 50}
+        if cursor[0]:
+            params["cursor"] = cursor[0]
+        page = client.get("/api/sessions", params=params).json()
+        cursor[0] = page.get("next_cursor")
+
+    cases = {
+        "list_first_page": lambda: client.get("/api/sessions", params={"limit": 50}),
+        "list_walk": _list_page,
+        "detail": lambda: client.get(f"/api/sessions/{rng.choice(ids)}"),
+        "search": lambda: client.get("/api/sessions/search", params={"q": rng.choice(_WORDS)}),
+    }
+    results = []
+    for name, call in cases.items():
+        samples = _measure_requests(call, requests)
+        results.append(
+            {
+                "case": f"api_{name}",
+                "variant": f"{sessions}",
+                "requests_per_second": round(len(samples) / sum(samples), 1),
+                **_timings(samples),
+            }
+        )
+    results[0]["seed_seconds"] = round(seed_seconds, 2)
+    return results
+
+
+def _child(case: str, options: dict[str, Any], queue: Any) -> None:
+    baseline = _peak_rss_mb()
+    try:
+        if case == "transcribe":
+            results = bench_transcribe(Path(options["workdir"]), options["minutes"], options["model"])
+        elif case == "clean":
+            results = bench_clean(options["segments"])
+        elif case == "structure":
+            results = bench_structure(options["iterations"])
+        elif case == "summarize":
+            results = bench_summarize(options["summary_minutes"])
+        else:
+            results = bench_api(options["sessions"], options["requests"])
+    except Exception as exc:
+        results = [{"case": case, "error": f"{type(exc).__name__}: {exc}"}]
+    peak = _peak_rss_mb()
+    for result in results:
+        result["peak_rss_mb"] = round(peak, 1)
+        result["rss_growth_mb"] = round(peak - baseline, 1)
+    queue.put(results)
+
+
+def _git_revision() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _compare(results: list[dict[str, Any]], baseline_path: Path) -> None:
+    baseline = json.loads(baseline_path.read_text(encoding="utf-8"))
+    previous = {(item.get("case"), item.get("variant")): item for item in baseline.get("results", [])}
+    for result in results:
+        before = previous.get((result.get("case"), result.get("variant")))
+        if not before:
+            continue
+        for metric in ("seconds", "p50_ms", "p95_ms", "peak_rss_mb"):
+            if result.get(metric) and before.get(metric):
+                result.setdefault("vs_baseline", {})[metric] = round(result[metric] / before[metric], 3)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Reproduzierbare Benchmarks fuer die Finalisierungs-Pipeline.")
+    parser.add_argument("--cases", nargs="+", choices=CASES, default=list(CASES))
+    parser.add_argument("--minutes", type=float, nargs="+", default=[1, 5], help="Laenge der PCM-Fixtures")
+    parser.add_argument("--model", default=None, help="Whisper-Profil, z. B. base:int8")
+    parser.add_argument("--segments", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--summary-minutes", type=float, nargs="+", default=[10, 90])
+    parser.add_argument("--ollama-first-token", type=float, default=0.2)
+    parser.add_argument("--ollama-token-latency", type=float, default=0.002)
+    parser.add_argument("--sessions", type=int, default=10000)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--workdir", type=Path, default=None, help="Fixtures und Datenbank wiederverwenden")
+    parser.add_argument("--output", type=Path, default=None)
+    parser.add_argument("--baseline", type=Path, default=None, help="Frueheres Ergebnis zum Vergleich")
+    args = parser.parse_args()
+
+    temp_dir = None
+    workdir = args.workdir
+    if workdir is None:
+        temp_dir = tempfile.TemporaryDirectory()
+        workdir = Path(temp_dir.name)
+    workdir.mkdir(parents=True, exist_ok=True)
+
+    with OllamaStub(first_token_latency=args.ollama_first_token, token_latency=args.ollama_token_latency) as stub:
+        os.environ.update(
+            {
+                "DATABASE_URL": f"sqlite:///{workdir / 'bench.db'}",
+                "STORAGE_DIR": str(workdir / "storage"),
+                "OLLAMA_HOST": stub.url,
+                "RESULT_CACHE": "false",
+                "WHISPER_PRELOAD": "false",
+                "JOB_WORKERS": "0",
+            }
+        )
+        options = {
+            "workdir": str(workdir),
+            "minutes": args.minutes,
+            "model": args.model,
+            "segments": args.segments,
+            "iterations": args.iterations,
+            "summary_minutes": args.summary_minutes,
+            "sessions": args.sessions,
+            "requests": args.requests,
+        }
+        context = multiprocessing.get_context("spawn")
+        results: list[dict[str, Any]] = []
+        for case in args.cases:
+            queue = context.Queue()
+            process = context.Process(target=_child, args=(case, options, queue))
+            process.start()
+            results.extend(queue.get())
+            process.join()
+
+    from app.config import get_settings
+
+    settings = get_settings()
+    report = {
+        "meta": {
+            "timestamp": dt.datetime.utcnow().isoformat(timespec="seconds") + "Z",
+            "revision": _git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "whisper_model": args.model or settings.whisper_model,
+            "whisper_compute_type": settings.whisper_compute_type,
+            "summary_model": settings.summary_model,
+        },
+        "results": results,
+    }
+    if args.baseline:
+        _compare(results, args.baseline)
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        args.output.write_text(output, encoding="utf-8")
+    print(output)
+    if temp_dir is not None:
+        temp_dir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
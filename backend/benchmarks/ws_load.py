@@ -0,0 +1,157 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+import websockets
+
+FRAME_SAMPLES = 4096
+SAMPLE_RATE = 48000
+FRAME_BYTES = FRAME_SAMPLES * 2
+PING_INTERVAL = 0.25
+
+
+async def _client(base_url: str, session: dict, seconds: float, burst: bool, results: list[dict]) -> None:
+    ws_url = base_url.replace("http", "ws", 1) + session["websocket_url"]
+    frame = os.urandom(FRAME_BYTES)
+    frame_interval = FRAME_SAMPLES / SAMPLE_RATE
+    sent = 0
+    acks = 0
+    received = 0
+    latencies: list[float] = []
+    pending_pings: list[float] = []
+
+    async with websockets.connect(ws_url, max_size=None) as ws:
+
+        async def _reader() -> None:
+            nonlocal acks, received
+            async for raw in ws:
+                payload = json.loads(raw)
+                if payload.get("event") == "stopped":
+                    received = payload.get("bytes", 0)
+                    return
+                if "bytes" in payload:
+                    acks += 1
+                elif payload.get("ok") and pending_pings:
+                    latencies.append(time.perf_counter() - pending_pings.pop(0))
+
+        reader = asyncio.create_task(_reader())
+        started = time.perf_counter()
+        next_ping = started
+        while time.perf_counter() - started < seconds:
+            await ws.send(frame)
+            sent += 1
+            now = time.perf_counter()
+            if now >= next_ping:
+                pending_pings.append(now)
+                await ws.send("ping")
+                next_ping = now + PING_INTERVAL
+            if not burst:
+                await asyncio.sleep(max(0.0, started + sent * frame_interval - time.perf_counter()))
+        await ws.send("stop")
+        await asyncio.wait_for(reader, timeout=120)
+        elapsed = time.perf_counter() - started
+
+    results.append(
+        {
+            "session_id": session["id"],
+            "frames": received // FRAME_BYTES,
+            "elapsed": elapsed,
+            "acks": acks,
+            "latencies": latencies,
+        }
+    )
+
+
+def _percentile(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def run(base_url: str, clients: int, seconds: float, burst: bool) -> dict:
+    results: list[dict] = []
+    async with httpx.AsyncClient(base_url=base_url, timeout=30) as http:
+        sessions = [(await http.post("/api/sessions")).json() for _ in range(clients)]
+    await asyncio.gather(*(_client(base_url, session, seconds, burst, results) for session in sessions))
+    total_frames = sum(r["frames"] for r in results)
+    wall = max(r["elapsed"] for r in results)
+    latencies = [value * 1000 for r in results for value in r["latencies"]]
+    return {
+        "clients": clients,
+        "seconds": round(wall, 2),
+        "burst": burst,
+        "frames": total_frames,
+        "frames_per_second": round(total_frames / wall, 1),
+        "megabytes_per_second": round(total_frames * FRAME_BYTES / wall / 1_000_000, 2),
+        "acks_per_client": round(statistics.mean(r["acks"] for r in results), 1),
+        "loop_latency_ms": {
+            "p50": round(_percentile(latencies, 0.5), 2),
+            "p95": round(_percentile(latencies, 0.95), 2),
+            "max": round(max(latencies, default=0.0), 2),
+        },
+    }
+
+
+def _spawn_server(port: int, workdir: Path) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "DATABASE_URL": f"sqlite:///{workdir / 'load.db'}",
+        "STORAGE_DIR": str(workdir / "storage"),
+        "LIVE_TRANSCRIPTION": "false",
+        "API_JOB_WORKERS": "false",
+    }
+    backend_dir = Path(__file__).resolve().parent.parent
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=backend_dir,
+        env=env,
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/api/health", timeout=1)
+            return process
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("Server nicht erreichbar")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Simuliert parallele Aufnahme-Clients gegen den WebSocket-Ingest.")
+    parser.add_argument("--url", default=None, help="Basis-URL eines laufenden Servers, sonst wird einer gestartet")
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--burst", action="store_true", help="Frames maximal schnell statt im Echtzeittakt senden")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    process = None
+    with tempfile.TemporaryDirectory() as workdir:
+        base_url = args.url
+        if base_url is None:
+            process = _spawn_server(args.port, Path(workdir))
+            base_url = f"http://127.0.0.1:{args.port}"
+        try:
+            reports = [asyncio.run(run(base_url, count, args.seconds, args.burst)) for count in args.clients]
+        finally:
+            if process is not None:
+                process.terminate()
+                process.wait(timeout=10)
+    print(json.dumps(reports, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+from __future__ import annotations
+
+import argparse
+import logging
+import sys
+
+from app.config import get_settings
+from app.services.inference import InferenceError
+from app.services.transcribe import serve_inference
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Startet den gemeinsamen Whisper-Inferenzdienst fuer API und Worker.")
+    parser.add_argument("--address", help="unix:/pfad/zum/socket oder host:port (Standard: INFERENCE_ADDRESS)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    address = args.address or get_settings().inference_address
+    if not address:
+        parser.error("INFERENCE_ADDRESS oder --address muss gesetzt sein")
+    try:
+        serve_inference(address)
+    except InferenceError as exc:
+        parser.error(str(exc))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
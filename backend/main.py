@@ -1,35 +1,50 @@
 ﻿from __future__ import annotations
 
-from fastapi import FastAPI
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Any
+
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy import inspect, text
 
 from app.config import get_settings
-from app.database import Base, engine
-from app.routers import sessions, settings as settings_router
+from app.database import async_engine
+from app.migrations import migrate, pending_migrations
+from app.routers import batches, jobs, metrics, sessions, settings as settings_router
+from app.services.inference import close_connections
+from app.services.jobs import start_workers, stop_workers
+from app.services.metrics import snapshot_loop, write_snapshot
+from app.services.summarizer import close_http_client
+from app.services.transcribe import model_status, preload_models, shutdown_chunk_pool, startup_profiles
 
 settings = get_settings()
-Base.metadata.create_all(bind=engine)
+logger = logging.getLogger(__name__)
 
 
-def _ensure_schema() -> None:
-    inspector = inspect(engine)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if settings.db_auto_migrate:
+        await asyncio.to_thread(migrate)
+    elif await asyncio.to_thread(pending_migrations):
+        logger.warning("Ausstehende Datenbank-Migrationen, bitte python -m app.migrations ausfuehren")
+    app.state.preload = asyncio.create_task(asyncio.to_thread(preload_models, startup_profiles()))
+    if settings.api_job_workers:
+        start_workers()
+    snapshots = asyncio.create_task(snapshot_loop())
     try:
-        columns = {column["name"] for column in inspector.get_columns("recording_sessions")}
-    except Exception:
-        columns = set()
-    if "title" not in columns:
-        try:
-            with engine.connect() as connection:
-                connection.execute(text("ALTER TABLE recording_sessions ADD COLUMN title VARCHAR(255)"))
-                connection.commit()
-        except Exception:
-            pass
-
+        yield
+    finally:
+        snapshots.cancel()
+        await stop_workers()
+        write_snapshot()
+        await close_http_client()
+        shutdown_chunk_pool()
+        close_connections()
+        await async_engine.dispose()
 
-_ensure_schema()
 
-app = FastAPI(title=settings.app_name)
+app = FastAPI(title=settings.app_name, lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -37,13 +52,26 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "Accept-Ranges", "Content-Range", "Content-Length"],
 )
 
 app.include_router(settings_router.router)
 app.include_router(sessions.router)
+app.include_router(jobs.router)
+app.include_router(batches.router)
+app.include_router(metrics.router)
 
 
 @app.get("/api/health")
-def health() -> dict[str, str]:
-    return {"status": "bereit"}
+def health(response: Response) -> dict[str, Any]:
+    models = model_status()
+    states = set(models.values())
+    if states & {"ausstehend", "laedt"}:
+        status = "startet"
+        response.status_code = 503
+    elif "fehler" in states:
+        status = "eingeschraenkt"
+    else:
+        status = "bereit"
+    return {"status": status, "models": models}
 
@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import signal
+import sys
+
+from app.config import get_settings
+from app.migrations import migrate
+from app.services.inference import close_connections
+from app.services.jobs import start_workers, stop_workers
+from app.services.summarizer import close_http_client
+from app.services.transcribe import shutdown_chunk_pool
+
+
+async def _run() -> None:
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(signum, stop.set)
+        except NotImplementedError:
+            pass
+    start_workers()
+    try:
+        await stop.wait()
+    finally:
+        await stop_workers()
+        await close_http_client()
+        shutdown_chunk_pool()
+        close_connections()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Arbeitet Finalisierungs- und Stapelauftraege ohne API-Prozess ab.")
+    parser.add_argument("--workers", type=int, help="Anzahl Worker-Prozesse (Standard: JOB_WORKERS)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    settings = get_settings()
+    if args.workers is not None:
+        settings.job_workers = args.workers
+    if settings.db_auto_migrate:
+        migrate()
+    asyncio.run(_run())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
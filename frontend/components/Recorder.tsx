@@ -1,11 +1,56 @@
 ﻿"use client";
 
 import { useCallback, useEffect, useRef, useState } from "react";
-import { createSession, finalizeSession } from "@/lib/api";
+import { createSession, fetchJob, fetchTranscript, finalizeSession, jobEventsUrl, type Job } from "@/lib/api";
 
 const apiBase = process.env.NEXT_PUBLIC_API_BASE ?? "http://localhost:8000";
 const wsBase = (process.env.NEXT_PUBLIC_WS_BASE ?? apiBase).replace("http", "ws");
 
+const JOB_POLL_INTERVAL_MS = 1500;
+const FRAME_HEADER_BYTES = 8;
+const RECONNECT_MAX_DELAY_MS = 8000;
+const STOP_TIMEOUT_MS = 10000;
+const PCM_FORMAT = "pcm_s16le";
+const MEDIA_FORMATS: Record<string, string> = {
+  webm_opus: "audio/webm;codecs=opus",
+  ogg_opus: "audio/ogg;codecs=opus",
+};
+const OPUS_BITS_PER_SECOND = 32000;
+const RECORDER_TIMESLICE_MS = 250;
+
+type PendingFrame = { offset: number; size: number; frame: ArrayBuffer };
+
+const wait = (ms: number) => new Promise((resolve) => setTimeout(resolve, ms));
+
+const streamJob = (
+  jobId: string,
+  onProgress: (progress: Pick<Job, "status" | "progress" | "stage">) => void,
+  onSection: (section: string, text: string) => void,
+) =>
+  new Promise<boolean>((resolve) => {
+    if (typeof EventSource === "undefined") {
+      resolve(false);
+      return;
+    }
+    const source = new EventSource(jobEventsUrl(jobId));
+    const finish = (done: boolean) => {
+      source.close();
+      resolve(done);
+    };
+    source.addEventListener("progress", (event) => onProgress(JSON.parse((event as MessageEvent).data)));
+    source.addEventListener("section", (event) => {
+      const { section, text } = JSON.parse((event as MessageEvent).data);
+      onSection(section, text);
+    });
+    source.addEventListener("done", () => finish(true));
+    source.onerror = () => finish(false);
+  });
+
+const mediaFormats = () =>
+  typeof MediaRecorder === "undefined"
+    ? []
+    : Object.keys(MEDIA_FORMATS).filter((format) => MediaRecorder.isTypeSupported(MEDIA_FORMATS[format]));
+
 const formatTimer = (ms: number) => {
   const total = Math.max(0, Math.floor(ms / 1000));
   const mm = String(Math.floor(total / 60)).padStart(2, "0");
@@ -17,14 +62,26 @@ export function Recorder() {
   const [sessionId, setSessionId] = useState<string | null>(null);
   const [timer, setTimer] = useState("00:00");
   const [status, setStatus] = useState("Bereit");
+  const [warning, setWarning] = useState<string | null>(null);
   const [summary, setSummary] = useState<any | null>(null);
   const [transcript, setTranscript] = useState<string | null>(null);
+  const [liveText, setLiveText] = useState<string[]>([]);
   const timerRef = useRef<NodeJS.Timeout | null>(null);
   const wsRef = useRef<WebSocket | null>(null);
   const audioContextRef = useRef<AudioContext | null>(null);
   const processorRef = useRef<ScriptProcessorNode | null>(null);
+  const mediaRecorderRef = useRef<MediaRecorder | null>(null);
+  const chunkChainRef = useRef<Promise<void>>(Promise.resolve());
+  const formatRef = useRef<string>(PCM_FORMAT);
   const streamRef = useRef<MediaStream | null>(null);
   const startRef = useRef<number>(0);
+  const streamUrlRef = useRef<string | null>(null);
+  const pendingRef = useRef<PendingFrame[]>([]);
+  const offsetRef = useRef<number>(0);
+  const reconnectRef = useRef<{ attempts: number; timer: NodeJS.Timeout | null }>({ attempts: 0, timer: null });
+  const stopResolverRef = useRef<(() => void) | null>(null);
+  const resumedRef = useRef(false);
+  const readyResolverRef = useRef<(() => void) | null>(null);
 
   const startTimer = () => {
     startRef.current = Date.now();
@@ -41,6 +98,17 @@ export function Recorder() {
   };
 
   const cleanupAudio = useCallback(async () => {
+    const mediaRecorder = mediaRecorderRef.current;
+    if (mediaRecorder) {
+      mediaRecorderRef.current = null;
+      if (mediaRecorder.state !== "inactive") {
+        await new Promise<void>((resolve) => {
+          mediaRecorder.onstop = () => resolve();
+          mediaRecorder.stop();
+        });
+      }
+      await chunkChainRef.current;
+    }
     if (processorRef.current) {
       processorRef.current.disconnect();
       processorRef.current.onaudioprocess = null;
@@ -61,6 +129,9 @@ export function Recorder() {
   }, []);
 
   const closeWebSocket = useCallback(async () => {
+    streamUrlRef.current = null;
+    reconnectRef.current.timer && clearTimeout(reconnectRef.current.timer);
+    reconnectRef.current = { attempts: 0, timer: null };
     const ws = wsRef.current;
     if (!ws) return;
     wsRef.current = null;
@@ -70,48 +141,171 @@ export function Recorder() {
     }
   }, []);
 
-  const handleAudioProcess = useCallback((event: AudioProcessingEvent) => {
+  const acknowledge = (committed: number) => {
+    const pending = pendingRef.current;
+    let index = 0;
+    while (index < pending.length && pending[index].offset + pending[index].size <= committed) index += 1;
+    if (index > 0) pendingRef.current = pending.slice(index);
+  };
+
+  const resend = (ws: WebSocket, committed: number) => {
+    acknowledge(committed);
+    pendingRef.current.forEach((item) => ws.send(item.frame));
+  };
+
+  const connect = useCallback(() => {
+    const url = streamUrlRef.current;
+    if (!url) return;
+    const ws = new WebSocket(`${wsBase}${url}?protocol=framed&audio_format=${formatRef.current}`);
+    wsRef.current = ws;
+    resumedRef.current = false;
+    ws.binaryType = "arraybuffer";
+    ws.onmessage = (event) => {
+      try {
+        const payload = JSON.parse(event.data);
+        if (payload?.event === "segments" && Array.isArray(payload.segments)) {
+          const texts = payload.segments.map((segment: { text: string }) => segment.text).filter(Boolean);
+          setLiveText((previous) => [...previous, ...texts]);
+          return;
+        }
+        if (payload?.event === "resume") {
+          reconnectRef.current.attempts = 0;
+          resend(ws, payload.offset);
+          resumedRef.current = true;
+          readyResolverRef.current?.();
+          return;
+        }
+        if (payload?.event === "gap") {
+          resend(ws, payload.expected);
+          return;
+        }
+        if (typeof payload?.committed === "number") {
+          acknowledge(payload.committed);
+        }
+        if (payload?.event === "stopped") {
+          stopResolverRef.current?.();
+          return;
+        }
+        if (payload?.bytes) {
+          setStatus(`Aufnahme läuft … (${(payload.bytes / 1024).toFixed(1)} kB)`);
+        }
+      } catch {
+        /* noop */
+      }
+    };
+    ws.onerror = () => setStatus("WebSocket-Fehler");
+    ws.onclose = () => {
+      if (wsRef.current !== ws || !streamUrlRef.current) return;
+      wsRef.current = null;
+      resumedRef.current = false;
+      const state = reconnectRef.current;
+      const delay = Math.min(500 * 2 ** state.attempts, RECONNECT_MAX_DELAY_MS);
+      state.attempts += 1;
+      setStatus("Verbindung unterbrochen – neuer Versuch …");
+      state.timer = setTimeout(connect, delay);
+    };
+  }, []);
+
+  const pushFrame = (frame: ArrayBuffer) => {
+    const size = frame.byteLength - FRAME_HEADER_BYTES;
+    const offset = offsetRef.current;
+    const view = new DataView(frame);
+    view.setUint32(0, offset % 2 ** 32, true);
+    view.setUint32(4, Math.floor(offset / 2 ** 32), true);
+    offsetRef.current = offset + size;
+    pendingRef.current.push({ offset, size, frame });
     const ws = wsRef.current;
-    if (!ws || ws.readyState !== WebSocket.OPEN) return;
+    if (ws && ws.readyState === WebSocket.OPEN) ws.send(frame);
+  };
+
+  const handleAudioProcess = useCallback((event: AudioProcessingEvent) => {
+    if (!streamUrlRef.current) return;
     const input = event.inputBuffer.getChannelData(0);
-    const buffer = new ArrayBuffer(input.length * 2);
-    const view = new DataView(buffer);
+    const frame = new ArrayBuffer(FRAME_HEADER_BYTES + input.length * 2);
+    const view = new DataView(frame);
     for (let i = 0; i < input.length; i += 1) {
       let sample = input[i];
       if (sample > 1) sample = 1;
       if (sample < -1) sample = -1;
-      view.setInt16(i * 2, sample < 0 ? sample * 0x8000 : sample * 0x7fff, true);
+      view.setInt16(FRAME_HEADER_BYTES + i * 2, sample < 0 ? sample * 0x8000 : sample * 0x7fff, true);
     }
-    ws.send(buffer);
+    pushFrame(frame);
+  }, []);
+
+  const handleMediaChunk = useCallback((event: BlobEvent) => {
+    if (!event.data.size) return;
+    chunkChainRef.current = chunkChainRef.current.then(async () => {
+      const payload = new Uint8Array(await event.data.arrayBuffer());
+      const frame = new Uint8Array(FRAME_HEADER_BYTES + payload.length);
+      frame.set(payload, FRAME_HEADER_BYTES);
+      pushFrame(frame.buffer);
+    });
   }, []);
 
+  const flushStream = useCallback(async () => {
+    const deadline = Date.now() + STOP_TIMEOUT_MS;
+    if (!resumedRef.current && pendingRef.current.length > 0) {
+      const state = reconnectRef.current;
+      if (!wsRef.current) {
+        state.timer && clearTimeout(state.timer);
+        state.attempts = 0;
+        state.timer = null;
+        connect();
+      }
+      await new Promise<void>((resolve) => {
+        const timeout = setTimeout(resolve, STOP_TIMEOUT_MS);
+        readyResolverRef.current = () => {
+          clearTimeout(timeout);
+          resolve();
+        };
+      });
+      readyResolverRef.current = null;
+    }
+    const ws = wsRef.current;
+    if (!ws || ws.readyState !== WebSocket.OPEN || !resumedRef.current) return pendingRef.current.length === 0;
+    await new Promise<void>((resolve) => {
+      const timeout = setTimeout(resolve, Math.max(0, deadline - Date.now()));
+      stopResolverRef.current = () => {
+        clearTimeout(timeout);
+        resolve();
+      };
+      ws.send("stop");
+    });
+    stopResolverRef.current = null;
+    return pendingRef.current.length === 0;
+  }, [connect]);
+
   const startRecording = useCallback(async () => {
     try {
       setSummary(null);
       setTranscript(null);
+      setLiveText([]);
+      setWarning(null);
       setStatus("Sitzung wird vorbereitet …");
-      const session = await createSession();
+      const session = await createSession(mediaFormats());
       setSessionId(session.id);
-      const ws = new WebSocket(`${wsBase}${session.websocket_url}`);
-      wsRef.current = ws;
-      ws.binaryType = "arraybuffer";
-      ws.onopen = () => setStatus("Mikrofon wird vorbereitet …");
-      ws.onmessage = (event) => {
-        try {
-          const payload = JSON.parse(event.data);
-          if (payload?.bytes) {
-            setStatus(`Aufnahme läuft … (${(payload.bytes / 1024).toFixed(1)} kB)`);
-          }
-        } catch {
-          /* noop */
-        }
-      };
-      ws.onerror = () => setStatus("WebSocket-Fehler");
+      pendingRef.current = [];
+      offsetRef.current = 0;
+      formatRef.current = session.audio_format ?? PCM_FORMAT;
+      streamUrlRef.current = session.websocket_url;
+      connect();
+      setStatus("Mikrofon wird vorbereitet …");
 
       const stream = await navigator.mediaDevices.getUserMedia({
         audio: { channelCount: 1, sampleRate: 48000, echoCancellation: true },
       });
       streamRef.current = stream;
+      const mimeType = MEDIA_FORMATS[formatRef.current];
+      if (mimeType) {
+        const mediaRecorder = new MediaRecorder(stream, { mimeType, audioBitsPerSecond: OPUS_BITS_PER_SECOND });
+        mediaRecorderRef.current = mediaRecorder;
+        chunkChainRef.current = Promise.resolve();
+        mediaRecorder.ondataavailable = handleMediaChunk;
+        mediaRecorder.start(RECORDER_TIMESLICE_MS);
+        startTimer();
+        setStatus("Aufnahme läuft …");
+        return;
+      }
       const audioContext = new AudioContext({ sampleRate: 48000 });
       audioContextRef.current = audioContext;
       const source = audioContext.createMediaStreamSource(stream);
@@ -134,16 +328,39 @@ export function Recorder() {
       setSessionId(null);
       stopTimer();
     }
-  }, [cleanupAudio, closeWebSocket, handleAudioProcess]);
+  }, [cleanupAudio, closeWebSocket, connect, handleAudioProcess, handleMediaChunk]);
 
   const stopRecording = useCallback(async () => {
     if (!sessionId) return;
     setStatus("Verarbeitung läuft …");
     stopTimer(false);
     await cleanupAudio();
+    if (!(await flushStream())) {
+      setWarning("Nicht alle Audiodaten konnten übertragen werden – das Protokoll ist unvollständig.");
+    }
     await closeWebSocket();
     try {
-      const data = await finalizeSession(sessionId);
+      let job = await finalizeSession(sessionId);
+      setSummary(null);
+      setTranscript(null);
+      const streamed = await streamJob(
+        job.id,
+        (progress) => setStatus(`Verarbeitung läuft … (${Math.round(progress.progress * 100)} %)`),
+        (section, text) =>
+          setSummary((current: any) => ({ ...current, sections: { ...current?.sections, [section]: text } })),
+      );
+      if (streamed) {
+        job = await fetchJob(job.id);
+      }
+      while (job.status === "queued" || job.status === "running") {
+        setStatus(`Verarbeitung läuft … (${Math.round(job.progress * 100)} %)`);
+        await wait(JOB_POLL_INTERVAL_MS);
+        job = await fetchJob(job.id);
+      }
+      if (job.status !== "completed") {
+        throw new Error(job.error ?? "Verarbeitung fehlgeschlagen");
+      }
+      const data = await fetchTranscript(sessionId);
       setSummary(data.summary);
       setTranscript(data.transcript);
       setStatus("Bereit");
@@ -154,7 +371,7 @@ export function Recorder() {
       setSessionId(null);
       stopTimer();
     }
-  }, [cleanupAudio, closeWebSocket, sessionId]);
+  }, [cleanupAudio, closeWebSocket, flushStream, sessionId]);
 
   useEffect(() => {
     return () => {
@@ -172,6 +389,7 @@ export function Recorder() {
         <div>
           <h2 className="text-xl font-semibold">Aufnahme</h2>
           <p className="text-sm text-slate-300">Status: {status}</p>
+          {warning && <p className="text-sm text-amber-300">{warning}</p>}
         </div>
         <div className="flex items-center gap-3 text-lg font-mono">
           <span className={`h-3 w-3 rounded-full ${recording ? "bg-red-500 animate-pulse" : "bg-slate-500"}`} />
@@ -196,6 +414,12 @@ export function Recorder() {
           </button>
         )}
       </div>
+      {!transcript && liveText.length > 0 && (
+        <div className="rounded-md border border-white/10 bg-black/30 p-4">
+          <h3 className="text-lg font-semibold">Live-Transkript</h3>
+          <p className="mt-2 whitespace-pre-wrap text-sm text-slate-300">{liveText.join(" ")}</p>
+        </div>
+      )}
       {transcript && (
         <div className="rounded-md border border-white/10 bg-black/30 p-4">
           <h3 className="text-lg font-semibold">Transkript</h3>
@@ -1,12 +1,31 @@
 ﻿"use client";
 
+import { useState } from "react";
 import useSWR from "swr";
-import { listSessions, Session } from "@/lib/api";
+import useSWRInfinite from "swr/infinite";
+import { audioUrl, listSessions, searchSessions, Session, SessionPage, SessionSearchHit } from "@/lib/api";
 
-const fetcher = async () => listSessions();
+const pageKey = (index: number, previous: SessionPage | null) => {
+  if (previous && !previous.next_cursor) return null;
+  return ["sessions", index === 0 ? null : previous?.next_cursor ?? null];
+};
+
+const pageFetcher = async ([, cursor]: [string, string | null]) => listSessions(cursor);
 
 export function SessionHistory() {
-  const { data, error, isLoading, mutate } = useSWR("sessions", fetcher, { refreshInterval: 10000 });
+  const [query, setQuery] = useState("");
+  const trimmedQuery = query.trim();
+  const { data: pages, error, isLoading, mutate, size, setSize } = useSWRInfinite(pageKey, pageFetcher, {
+    refreshInterval: 10000,
+  });
+  const { data: searchResult } = useSWR(trimmedQuery ? ["search", trimmedQuery] : null, ([, q]: [string, string]) =>
+    searchSessions(q),
+  );
+  const sessions: (Session | SessionSearchHit)[] = trimmedQuery
+    ? searchResult?.items ?? []
+    : pages?.flatMap((page) => page.items) ?? [];
+  const data = trimmedQuery && !searchResult ? undefined : sessions;
+  const hasMore = !trimmedQuery && Boolean(pages?.[pages.length - 1]?.next_cursor);
 
   return (
     <div className="space-y-4 rounded-xl border border-white/10 bg-slate-900/60 p-6 shadow-lg">
@@ -22,10 +41,17 @@ export function SessionHistory() {
           Aktualisieren
         </button>
       </div>
+      <input
+        type="search"
+        value={query}
+        onChange={(event) => setQuery(event.target.value)}
+        placeholder="Transkripte und Protokolle durchsuchen …"
+        className="w-full rounded-md border border-white/10 bg-black/30 px-3 py-2 text-sm text-slate-100 placeholder:text-slate-500"
+      />
       {isLoading && <p className="text-sm text-slate-300">Lade...</p>}
       {error && <p className="text-sm text-rose-400">Fehler beim Laden</p>}
       <div className="space-y-3">
-        {data?.map((session: Session) => (
+        {data?.map((session) => (
           <div key={session.id} className="rounded-md border border-white/10 bg-black/30 p-4">
             <div className="flex flex-wrap items-center justify-between gap-2">
               <div>
@@ -48,9 +74,27 @@ export function SessionHistory() {
               <p>Aktualisiert: {session.updated_at ? new Date(session.updated_at).toLocaleString() : "-"}</p>
               <p>Transkript: {session.has_transcript ? "ja" : "nein"}</p>
             </div>
+            {session.status === "completed" && (
+              <audio className="mt-3 w-full" controls preload="none" src={audioUrl(session.id)} />
+            )}
+            {"snippet" in session && session.snippet && (
+              <p className="mt-2 text-xs italic text-slate-300">{session.snippet}</p>
+            )}
           </div>
         ))}
-        {data && data.length === 0 && <p className="text-sm text-slate-400">Noch keine Sitzungen vorhanden.</p>}
+        {data && data.length === 0 && (
+          <p className="text-sm text-slate-400">
+            {trimmedQuery ? "Keine Treffer." : "Noch keine Sitzungen vorhanden."}
+          </p>
+        )}
+        {hasMore && (
+          <button
+            onClick={() => setSize(size + 1)}
+            className="w-full rounded-md bg-white/10 px-3 py-2 text-sm text-slate-200 hover:bg-white/20"
+          >
+            Weitere laden
+          </button>
+        )}
       </div>
     </div>
   );
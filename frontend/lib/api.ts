@@ -13,34 +13,83 @@ export type Session = {
   title?: string;
 };
 
-export async function createSession() {
-  const { data } = await api.post("/api/sessions");
-  return data as { id: string; websocket_url: string; created_at: string };
+export async function createSession(audioFormats: string[] = []) {
+  const { data } = await api.post("/api/sessions", { audio_formats: audioFormats });
+  return data as { id: string; websocket_url: string; created_at: string; audio_format: string; audio_formats: string[] };
 }
 
+export type Job = {
+  id: string;
+  session_id: string;
+  kind: string;
+  status: string;
+  progress: number;
+  stage?: string | null;
+  error?: string | null;
+};
+
 export async function finalizeSession(id: string) {
   const { data } = await api.post(`/api/sessions/${id}/finalize`);
-  return data as {
-    id: string;
-    status: string;
-    transcript: string;
-    summary: Record<string, unknown>;
-    title?: string;
-  };
+  return data as Job;
+}
+
+export async function fetchJob(id: string) {
+  const { data } = await api.get(`/api/jobs/${id}`);
+  return data as Job;
+}
+
+export function jobEventsUrl(id: string) {
+  return `${api.defaults.baseURL}/api/jobs/${id}/events`;
+}
+
+export function audioUrl(id: string, range?: { segment?: number; start?: number; end?: number }) {
+  const params = new URLSearchParams();
+  Object.entries(range ?? {}).forEach(([key, value]) => value !== undefined && params.set(key, String(value)));
+  const query = params.toString();
+  return `${api.defaults.baseURL}/api/sessions/${id}/audio${query ? `?${query}` : ""}`;
 }
 
-export async function listSessions() {
-  const { data } = await api.get("/api/sessions");
-  return data as Session[];
+export async function fetchTranscript(id: string) {
+  const { data } = await api.get(`/api/sessions/${id}/transcript`);
+  return data as { transcript: string; summary: Record<string, unknown> };
 }
 
+export type SessionPage = {
+  items: Session[];
+  next_cursor?: string | null;
+};
+
+export type SessionSearchHit = Session & { rank: number; snippet?: string | null };
+
+export async function listSessions(cursor?: string | null, limit = 50) {
+  const { data } = await api.get("/api/sessions", { params: { limit, cursor: cursor ?? undefined } });
+  return data as SessionPage;
+}
+
+export async function searchSessions(query: string, limit = 20) {
+  const { data } = await api.get("/api/sessions/search", { params: { q: query, limit } });
+  return data as { query: string; items: SessionSearchHit[] };
+}
+
+let settingsCache: { etag: string; data: { data: any } } | null = null;
+
 export async function fetchSettings() {
-  const { data } = await api.get("/api/settings");
-  return data as { data: any };
+  const response = await api.get("/api/settings", {
+    headers: settingsCache ? { "If-None-Match": settingsCache.etag } : undefined,
+    validateStatus: (status) => (status >= 200 && status < 300) || status === 304,
+  });
+  if (response.status === 304 && settingsCache) {
+    return settingsCache.data;
+  }
+  const etag = response.headers["etag"];
+  settingsCache = etag ? { etag, data: response.data } : null;
+  return response.data as { data: any };
 }
 
 export async function updateSettings(payload: any) {
-  const { data } = await api.put("/api/settings", payload);
-  return data as { data: any };
+  const response = await api.put("/api/settings", payload);
+  const etag = response.headers["etag"];
+  settingsCache = etag ? { etag, data: response.data } : null;
+  return response.data as { data: any };
 }
 